@@ -0,0 +1,173 @@
+'''
+Asset Pack
+----------
+At startup the game used to open every image it uses as a separate file (dozens of PNGs and JPGs from images/ and
+Assets/), decode each one, and then scale and flip many of them. An asset pack is all of that done ahead of time: every
+image variant the game asks the asset cache for (see resources.py), already scaled and flipped, packed side by side
+into one big image (the atlas), and saved in a single file with an index of where every variant is in the atlas.
+
+Loading a pack is one read of one file, however many images the game uses: the atlas is stored uncompressed, in the
+same pixel format as the surfaces convert_alpha() makes, so the bytes that were read are used as the atlas's pixels
+as they are (without decoding or converting them). Every variant is then handed to the asset cache as a subsurface of the atlas (a view of part
+of it, without copying), so asset_cache.get() never needs to touch the disk for them. The one exception is a variant
+that is bigger than its image file (the backgrounds, scaled up to fill the screen): the pack holds the original image
+instead, and the variant is scaled up from it when the pack is loaded, which is quicker than reading and decompressing
+all of its pixels.
+
+File format:
+    header (see header below): magic b'APAK', format version, atlas width and height, index size, pixel data size
+    index       --> JSON: a list of [path, [width, height] or null, flip, x, y, width, height] (one per variant), where
+                    the last four are the variant's place in the atlas (if the width and height there are smaller than
+                    the variant's size, the variant is that part of the atlas scaled up)
+    pixel data  --> the atlas as BGRA bytes (blue, green, red, alpha: 32-bit ARGB pixels on a little-endian machine),
+                    row by row
+
+Build the pack (after changing any image, or the images the game uses) with:
+    python assetpack.py [--output assets.pack] [--check]
+main.py loads assets.pack at startup if it exists, and loads the image files one by one if it doesn't.
+'''
+
+import argparse
+import json
+import os
+import struct
+import sys
+import time
+
+import pygame
+
+magic = b'APAK'  # the first 4 bytes of every asset pack
+version = 1  # the version of the format written by save_pack()
+header = struct.Struct('<4sHHHII')  # magic, version, atlas width, atlas height, index size, pixel data size
+pack_filename = 'assets.pack'  # the pack main.py looks for
+atlas_width = 1024  # the width of the atlas (variants are packed in rows, left to right), unless an image is wider
+pixel_format = 'BGRA'  # the byte order of the atlas's pixels
+padding = 1  # empty pixels between variants
+
+
+def pack_rects(sizes, width=atlas_width):
+    '''
+    Place rectangles in an atlas `width` pixels wide, in shelves: the tallest rectangles first, left to right, starting
+    a new shelf when a row is full. Returns the (x, y) of every size (in the order given), and the atlas's width and
+    height.
+    '''
+    width = max([width] + [size[0] for size in sizes])  # (at least as wide as the widest rectangle)
+    order = sorted(range(len(sizes)), key=lambda index: (-sizes[index][1], -sizes[index][0]))
+    positions = [None] * len(sizes)
+    x = y = shelf_height = 0
+    for index in order:
+        size_x, size_y = sizes[index]
+        if x + size_x > width:  # this row is full: start a new shelf under it
+            x, y = 0, y + shelf_height + padding
+            shelf_height = 0
+        positions[index] = (x, y)
+        x += size_x + padding
+        shelf_height = max(shelf_height, size_y)
+    return positions, width, y + shelf_height
+
+
+def save_pack(filename, surfaces, originals=None):
+    '''
+    Save a dictionary of (path, size, flip) --> surface as an asset pack. originals is a dictionary of path --> the
+    original image, for the variants that are scaled up (those are stored at the original size instead).
+    '''
+    originals = originals or {}
+    keys = sorted(surfaces, key=lambda key: (key[0], key[1] or (0, 0), key[2]))
+    stored = []  # the surface actually put in the atlas for every key
+    for path, size, flip in keys:
+        original = originals.get(path)
+        scaled_up = (size is not None and not flip and original is not None
+                     and size[0] * size[1] > original.get_width() * original.get_height())
+        stored.append(original if scaled_up else surfaces[(path, size, flip)])
+    sizes = [surface.get_size() for surface in stored]
+    positions, width, height = pack_rects(sizes)
+    atlas = pygame.Surface((width, max(1, height)), pygame.SRCALPHA)
+    atlas.fill((0, 0, 0, 0))
+    index = []
+    for key, surface, size, position in zip(keys, stored, sizes, positions):
+        # BLEND_RGBA_MAX onto transparent black copies every pixel (with its alpha) exactly, instead of blending it
+        atlas.blit(surface, position, special_flags=pygame.BLEND_RGBA_MAX)
+        path, scale, flip = key
+        index.append([path, list(scale) if scale is not None else None, flip, position[0], position[1], *size])
+    index_data = json.dumps(index).encode()
+    pixels = pygame.image.tobytes(atlas, pixel_format)
+    with open(filename + '.tmp', 'wb') as pack_file:  # (a temporary file first, so a crash can't leave half a pack)
+        pack_file.write(header.pack(magic, version, atlas.get_width(), atlas.get_height(), len(index_data),
+                                    len(pixels)))
+        pack_file.write(index_data)
+        pack_file.write(pixels)
+    os.replace(filename + '.tmp', filename)
+    return atlas.get_size(), len(index)
+
+
+def load_pack(filename):
+    '''
+    Read an asset pack with a single read, and return a dictionary of (path, size, flip) --> surface, where every
+    surface is a subsurface of the atlas. The display must have been created first (in case the atlas has to be
+    converted to its pixel format).
+    '''
+    with open(filename, 'rb') as pack_file:
+        data = bytearray(os.fstat(pack_file.fileno()).st_size)  # (writable, so the atlas can use it as its pixels)
+        pack_file.readinto(data)
+    if len(data) < header.size:
+        raise ValueError(f'{filename}: too short to be an asset pack')
+    file_magic, file_version, width, height, index_size, pixels_size = header.unpack_from(data)
+    if file_magic != magic:
+        raise ValueError(f'{filename}: not an asset pack')
+    if file_version != version:
+        raise ValueError(f'{filename}: unsupported asset pack version {file_version}')
+    if len(data) < header.size + index_size + pixels_size:
+        raise ValueError(f'{filename}: truncated')
+    index = json.loads(bytes(data[header.size:header.size + index_size]))
+    pixels = memoryview(data)[header.size + index_size:header.size + index_size + pixels_size]
+    atlas = pygame.image.frombuffer(pixels, (width, height), pixel_format)  # the pixels where they were read
+    if atlas.get_masks() != atlas.subsurface((0, 0, 1, 1)).convert_alpha().get_masks():
+        atlas = atlas.convert_alpha()  # the screen uses a different pixel format: convert the atlas (a copy) to it
+    surfaces = {}
+    for path, size, flip, x, y, size_x, size_y in index:
+        surface = atlas.subsurface((x, y, size_x, size_y))
+        if size is not None and tuple(size) != (size_x, size_y):  # stored at its original size: scale it up
+            surface = pygame.transform.scale(surface, size)
+        surfaces[(path, tuple(size) if size is not None else None, flip)] = surface
+    return surfaces
+
+
+def same_pixels(first, second):  # whether two surfaces hold exactly the same RGBA pixels
+    return (first.get_size() == second.get_size()
+            and pygame.image.tobytes(first, 'RGBA') == pygame.image.tobytes(second, 'RGBA'))
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description='Pack every image variant the game uses into one asset pack.')
+    parser.add_argument('--output', default=pack_filename, help=f'the pack to write (default: {pack_filename})')
+    parser.add_argument('--check', action='store_true', help='load the pack back and compare it with the image files')
+    args = parser.parse_args()
+
+    import headless  # selects the dummy video and audio drivers before the game is imported
+    import main
+    from resources import asset_cache
+
+    # ask for every image the game uses: main.py loads the menu images and backgrounds when it is imported, and
+    # building every level (and a player) loads the rest
+    main.Player(0, 0)
+    for level in range(1, main.max_levels + 1):
+        main.build_world(level).tile_grid.all_tiles()
+    surfaces = {key: asset_cache.variant(key) for key in asset_cache.requested}
+    originals = {path: asset_cache.variant((path, None, False)) for path, size, flip in surfaces}
+    (width, height), count = save_pack(args.output, surfaces, originals)
+    print(f'packed {count} images into a {width}x{height} atlas: {args.output}')
+
+    start = time.perf_counter()
+    packed = load_pack(args.output)
+    print(f'loaded the pack ({os.path.getsize(args.output)} bytes) in {(time.perf_counter() - start) * 1000:.1f}ms')
+    if args.check:
+        mismatches = [key for key in surfaces if not same_pixels(surfaces[key], packed[key])]
+        for key in mismatches:
+            print(f'    {key} does not match')
+        print(f'checked {len(surfaces)} images: {"ok" if not mismatches else f"{len(mismatches)} mismatches"}')
+        return 1 if mismatches else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main_cli())
@@ -0,0 +1,146 @@
+'''
+Audio Manager
+-------------
+The game used to switch music by calling pygame.mixer.music.load() on the main thread whenever a new level range
+started, which stalls that frame, and crashes the game if the music file is missing (sounds/cake_sound.mp3 and
+sounds/Forest_Music.wav aren't in the repository). Sound effects were played with Sound.play() on whatever channel
+was free, so a burst of coins could use up every channel.
+
+AudioManager fixes all three:
+    - Music tracks are decoded into Sound objects on a background thread (pygame releases the GIL while decoding), and
+      played on two channels reserved for music, so switching tracks is a crossfade between those two channels: the
+      old track fades out while the new one fades in, and the main thread never waits for a file. A few decoded
+      tracks are kept, so going back and forth between levels doesn't decode them again.
+    - Sound effects play on a fixed pool of reserved channels, and every effect has a limit on how many copies of it
+      can play at once. When an effect is at its limit (or the pool is full), the copy that has been playing the
+      longest is cut off and its channel is reused.
+    - A missing or unreadable file is replaced by a short silent sound (with a warning printed once), so the game
+      keeps running without it.
+If the mixer couldn't be started at all (no audio device), every method does nothing.
+'''
+
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pygame
+
+music_channels = 2  # channels reserved for music (the playing track and the one fading in or out)
+effect_channels = 6  # channels reserved for sound effects
+crossfade_ms = 2000  # how long a music crossfade takes
+decoded_tracks = 3  # how many decoded music tracks to keep
+
+
+class AudioManager():
+    def __init__(self, effect_pool=effect_channels, keep_tracks=decoded_tracks):
+        self.enabled = pygame.mixer.get_init() is not None  # without a mixer, the audio manager does nothing
+        self.tracks = {}  # music tracks by name: (file, volume)
+        self.decoded = OrderedDict()  # decoded music tracks by name, least recently used first
+        self.keep_tracks = keep_tracks  # how many decoded tracks to keep
+        self.decoding = {}  # music tracks being decoded in the background, by name (futures)
+        self.effects = {}  # sound effects by name: (Sound, voice limit)
+        self.voices = {}  # the (start time, channel) of the copies of every effect that may still be playing
+        self.current = None  # the name of the music track that is playing (or about to)
+        self.wanted = None  # the name of the music track that should be playing (it may still be decoding)
+        self.music = []  # the channels reserved for music
+        self.pool = []  # the channels reserved for sound effects
+        self.warned = set()  # the missing files we have warned about
+        self.silence = None  # the substitute for missing sounds
+
+        if self.enabled:
+            total = music_channels + effect_pool
+            pygame.mixer.set_num_channels(max(total, pygame.mixer.get_num_channels()))
+            pygame.mixer.set_reserved(total)  # keep our channels away from Sound.play() and find_channel()
+            self.music = [pygame.mixer.Channel(number) for number in range(music_channels)]
+            self.pool = [pygame.mixer.Channel(number) for number in range(music_channels, total)]
+            self.silence = pygame.mixer.Sound(buffer=bytes(4096))  # a few milliseconds of silence
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='audio')  # decodes the music
+
+    def load_sound(self, filename):  # load a sound file, or the silent substitute if it can't be loaded
+        try:
+            return pygame.mixer.Sound(filename)
+        except (pygame.error, FileNotFoundError) as error:
+            if filename not in self.warned:
+                self.warned.add(filename)
+                print(f'audio: using silence instead of {filename} ({error})')
+            return self.silence
+
+    # sound effects
+
+    def add_effect(self, name, filename, volume=1.0, limit=1):  # load a sound effect, with its volume and voice limit
+        if not self.enabled:
+            return
+        sound = self.load_sound(filename)
+        if sound is not self.silence:
+            sound.set_volume(volume)
+        self.effects[name] = (sound, limit)
+        self.voices[name] = []
+
+    def play_effect(self, name):  # play a sound effect on the channel pool
+        if not self.enabled:
+            return
+        sound, limit = self.effects[name]
+        # forget the copies of this effect that have finished (or whose channel was taken by another effect)
+        voices = [(start, channel) for start, channel in self.voices[name]
+                  if channel.get_busy() and channel.get_sound() is sound]
+        if len(voices) >= limit:  # at the limit: cut off the oldest copy of this effect
+            channel = voices.pop(0)[1]
+        else:
+            channel = self.free_channel()
+        channel.play(sound)
+        voices.append((time.perf_counter(), channel))
+        self.voices[name] = voices
+
+    def free_channel(self):  # an idle channel of the pool, or the one that has been playing the longest
+        for channel in self.pool:
+            if not channel.get_busy():
+                return channel
+        playing = [voice for voices in self.voices.values() for voice in voices if voice[1].get_busy()]
+        return min(playing, key=lambda voice: voice[0])[1] if playing else self.pool[0]
+
+    # music
+
+    def add_track(self, name, filename, volume=1.0):  # register a music track (it is only decoded when needed)
+        self.tracks[name] = (filename, volume)
+
+    def preload(self, name):  # start decoding a music track in the background, if it isn't decoded already
+        if not self.enabled or name in self.decoded or name in self.decoding:
+            return
+        self.decoding[name] = self.executor.submit(self.load_sound, self.tracks[name][0])
+
+    def play_music(self, name):  # crossfade to a music track, as soon as it has been decoded (never waits)
+        if not self.enabled or name == self.wanted:
+            return
+        self.wanted = name
+        self.preload(name)
+        self.update()
+
+    def update(self):  # call once a frame: finishes decoding and starts the wanted track once it is ready
+        if not self.enabled:
+            return
+        for name, future in list(self.decoding.items()):
+            if future.done():
+                del self.decoding[name]
+                self.decoded[name] = future.result()
+                unused = [name for name in self.decoded if name not in (self.wanted, self.current)]
+                for oldest in unused[:max(0, len(self.decoded) - self.keep_tracks)]:  # forget the least recently used
+                    del self.decoded[oldest]
+        if self.wanted != self.current and self.wanted in self.decoded:
+            self.crossfade(self.wanted)
+
+    def crossfade(self, name):  # fade the playing track out while the new one fades in on the other music channel
+        sound = self.decoded[name]
+        self.decoded.move_to_end(name)  # the track was just used
+        old, new = self.music  # the channel of the track that is playing goes first
+        old.fadeout(crossfade_ms)
+        new.stop()
+        new.set_volume(self.tracks[name][1])
+        new.play(sound, loops=-1, fade_ms=crossfade_ms)
+        self.music = [new, old]  # the playing track's channel goes first
+        self.current = name
+
+    def stop(self):  # stop everything and the decoding thread (when the game closes)
+        if self.enabled:
+            for channel in self.music + self.pool:
+                channel.stop()
+            self.executor.shutdown(wait=False, cancel_futures=True)
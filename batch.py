@@ -0,0 +1,175 @@
+'''
+Batch Simulation
+----------------
+Checking every level by hand after changing Player.update or a level file is slow, so this runner plays lots of
+headless games at once, spread over a pool of worker processes (one per CPU core by default). Every worker is a
+separate process started with 'spawn', so each one imports pygame and the game on its own and has its own pygame
+state, and the runs are spread over the cores instead of sharing one interpreter.
+
+Every run plays one level with either an input script (see headless.py) or random input (holding random keys for
+random lengths of time, from a seed, so a run can be repeated), restarting the level whenever the player dies. A run
+ends when the player reaches the exit, or after the maximum number of frames. For every run we record:
+    deaths          --> how many times the player died
+    coins           --> how many coins were collected (over every attempt)
+    exit_frame      --> the frame the exit was reached on (None if it never was)
+    stuck           --> True if the player stopped moving for stuck_frames frames in a row while alive
+    error           --> the exception, if the run crashed
+and the report adds them up for every level.
+
+Usage:
+    python batch.py [--levels 1 2 ...] [--runs N] [--scripts FILE ...] [--frames N] [--workers N] [--output FILE]
+'''
+
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import random
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+import headless  # selects the dummy video and audio drivers before the game is imported
+import main
+
+script_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks', 'scripts')  # default scripts
+stuck_frames = 600  # a living player that hasn't moved for this many frames (10 seconds) is stuck
+
+
+def random_keys(seed):  # yield random KeyStates forever: random key combinations held for random lengths of time
+    rng = random.Random(seed)
+    left, right, space = headless.key_names['left'], headless.key_names['right'], headless.key_names['space']
+    while True:
+        pressed = []
+        if rng.random() < 0.7:  # mostly run right, towards the exit
+            pressed.append(right)
+        elif rng.random() < 0.5:
+            pressed.append(left)
+        if rng.random() < 0.4:
+            pressed.append(space)
+        key = headless.KeyState(pressed)
+        for _ in range(rng.randint(1, 40)):
+            yield key
+
+
+def run_job(job):  # play one run (in a worker process) and return its results
+    result = {'level': job['level'], 'input': job['input'], 'seed': job.get('seed'), 'frames': 0, 'deaths': 0,
+              'coins': 0, 'exit_frame': None, 'stuck': False, 'error': None}
+    try:
+        if job['input'] == 'random':
+            keys = random_keys(job['seed'])
+        else:
+            keys = headless.script_keys(headless.load_script(job['input']), loop=True)
+        game = main.Game(job['level'], prefetch=False)
+        last_position = game.player.rect.topleft
+        still = 0  # frames the player hasn't moved for
+        score = 0
+        for frame in range(1, job['frames'] + 1):
+            game.update(next(keys))
+            result['frames'] = frame
+            result['coins'] += max(0, game.score - score)  # coins collected this frame
+            score = game.score
+
+            if game.level != job['level'] or game.game_over == 1:  # the exit was reached
+                result['exit_frame'] = frame
+                break
+            if game.game_over == -1:  # the player died: restart the level
+                result['deaths'] += 1
+                game.restart()
+                score = 0
+                last_position = game.player.rect.topleft
+                still = 0
+                continue
+
+            position = game.player.rect.topleft
+            still = still + 1 if position == last_position else 0
+            last_position = position
+            if still >= stuck_frames:
+                result['stuck'] = True
+                break
+    except Exception:
+        result['error'] = traceback.format_exc()
+    return result
+
+
+def make_jobs(levels, scripts, runs, frames, seed):  # every script, plus `runs` random runs, on every level
+    jobs = []
+    for level in levels:
+        for script in scripts:
+            jobs.append({'level': level, 'input': script, 'frames': frames})
+        for run in range(runs):
+            jobs.append({'level': level, 'input': 'random', 'seed': seed * 1000003 + level * 1009 + run,
+                         'frames': frames})
+    return jobs
+
+
+def run_batch(jobs, workers):  # run the jobs on a pool of spawned worker processes, and return (results, seconds)
+    start = time.perf_counter()
+    if workers <= 1:
+        results = [run_job(job) for job in jobs]  # no pool: run them here
+    else:
+        context = multiprocessing.get_context('spawn')  # fresh processes, each with its own pygame state
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            results = list(pool.map(run_job, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+    return results, time.perf_counter() - start
+
+
+def summarise(results):  # add up the results of every level
+    levels = {}
+    for result in results:
+        summary = levels.setdefault(result['level'], {'runs': 0, 'exits': 0, 'deaths': 0, 'coins': 0, 'stuck': 0,
+                                                       'errors': 0, 'frames': 0, 'exit_frames': []})
+        summary['runs'] += 1
+        summary['deaths'] += result['deaths']
+        summary['coins'] += result['coins']
+        summary['frames'] += result['frames']
+        summary['stuck'] += result['stuck']
+        summary['errors'] += result['error'] is not None
+        if result['exit_frame'] is not None:
+            summary['exits'] += 1
+            summary['exit_frames'].append(result['exit_frame'])
+    return levels
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description='Play many headless games in parallel and report on every level.')
+    parser.add_argument('--levels', type=int, nargs='+', default=list(range(1, main.max_levels + 1)),
+                        help='levels to play (default: all)')
+    parser.add_argument('--runs', type=int, default=8, help='random-input runs per level (default: 8)')
+    parser.add_argument('--scripts', nargs='*', help='input scripts to play on every level '
+                                                     '(default: benchmarks/scripts/*.txt)')
+    parser.add_argument('--frames', type=int, default=3600, help='most frames per run (default: 3600, one minute)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='worker processes (default: one per CPU core, 1 to run without a pool)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random-input runs (default: 0)')
+    parser.add_argument('--output', help='save every result and the summary to this JSON file')
+    args = parser.parse_args()
+
+    scripts = args.scripts if args.scripts is not None else sorted(glob.glob(os.path.join(script_dir, '*.txt')))
+    jobs = make_jobs(args.levels, scripts, args.runs, args.frames, args.seed)
+    results, seconds = run_batch(jobs, args.workers)
+    levels = summarise(results)
+
+    print(f'{"level":>5} {"runs":>5} {"exits":>6} {"fastest":>8} {"deaths":>7} {"coins":>6} {"stuck":>6} '
+          f'{"errors":>7}')
+    for level, summary in sorted(levels.items()):
+        fastest = min(summary['exit_frames']) if summary['exit_frames'] else '-'
+        print(f'{level:>5} {summary["runs"]:>5} {summary["exits"]:>6} {fastest:>8} {summary["deaths"]:>7} '
+              f'{summary["coins"]:>6} {summary["stuck"]:>6} {summary["errors"]:>7}')
+    total_frames = sum(result['frames'] for result in results)
+    print(f'{len(jobs)} runs, {total_frames} frames in {seconds:.2f}s on {args.workers} worker(s) '
+          f'({total_frames / seconds:.0f} frames per second)')
+    for result in results:
+        if result['error'] is not None:
+            print(f'level {result["level"]} ({result["input"]}, seed {result["seed"]}) crashed:\n{result["error"]}')
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump({'seconds': seconds, 'workers': args.workers, 'results': results,
+                       'levels': {str(level): summary for level, summary in levels.items()}}, output_file, indent=2)
+        print(f'saved results to {args.output}')
+
+
+if __name__ == '__main__':
+    main_cli()
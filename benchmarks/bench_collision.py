@@ -0,0 +1,77 @@
+'''
+Tile Collision Benchmark
+------------------------
+Compares the old way of checking player/tile collisions (testing every tile in world.tile_list) against the collision
+check the game runs (TileGrid.collide_step, which Player.update calls, on the TileMap every World uses), on levels of
+the same height but growing widths. The scan gets slower as the level grows, while the grid lookup should stay flat
+because it only ever looks at the cells around the player. Every chunk of the level is built before the checks are
+timed (the game only builds the chunks near the player, see tilemap.py).
+
+Run from the repository root with:
+    python benchmarks/bench_collision.py
+'''
+
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # make the game modules importable
+
+import pygame
+from tilemap import TileMap
+
+tile_size = 50  # the same tile size the game uses
+rows = 20  # every benchmark level is as tall as the game's levels
+widths = [20, 200, 2000, 20000]  # level widths (in tiles) to benchmark
+player_width = 45  # the size of the player's collision rectangle
+player_height = 70
+checks = 2000  # number of collision checks timed per level
+
+
+def make_level(columns):  # build a random level with a solid floor and some floating blocks (1 is a dirt tile)
+    return [[1 if row == rows - 1 or random.random() < 0.15 else 0 for column in range(columns)] for row in range(rows)]
+
+
+def scan(tiles, rect, dx, dy, vel_y):  # the original collision check, over every tile in the level
+    for tile in tiles:
+        if tile.colliderect(rect.x + dx, rect.y, rect.width, rect.height):
+            dx = 0
+        if tile.colliderect(rect.x, rect.y + dy, rect.width, rect.height):
+            if vel_y < 0:
+                dy = tile.bottom - rect.top
+                vel_y = 0
+            elif vel_y >= 0:
+                dy = tile.top - rect.bottom
+                vel_y = 0
+    return dx, dy
+
+
+def grid(tile_map, rect, dx, dy, vel_y):  # the game's collision check (as in Player.update)
+    dx, dy, vel_y, landed = tile_map.collide_step(rect, dx, dy, vel_y)
+    return dx, dy
+
+
+def main():
+    random.seed(0)  # the same levels every run
+    print(f'{"level":>12} {"tiles":>8} {"scan us/check":>14} {"grid us/check":>14}')
+    for columns in widths:
+        tile_map = TileMap(make_level(columns), {1: pygame.Surface((tile_size, tile_size))}, tile_size)
+        tiles = [rect for image, rect in tile_map.all_tiles()]  # (this builds every chunk)
+        players = [(pygame.Rect(random.randrange(columns * tile_size), random.randrange(rows * tile_size),
+                                player_width, player_height), random.choice((-5, 0, 5)), random.randint(-14, 10))
+                   for _ in range(checks)]
+
+        for rect, dx, vel_y in players:  # both checks must agree before we time them
+            assert scan(tiles, rect, dx, vel_y, vel_y) == grid(tile_map, rect, dx, vel_y, vel_y)
+
+        # the scan is very slow on big levels, so time fewer checks there and scale the result
+        scan_players = players[:max(10, checks * 20 // columns)]
+        scan_time = timeit.timeit(lambda: [scan(tiles, r, dx, vy, vy) for r, dx, vy in scan_players], number=1)
+        grid_time = timeit.timeit(lambda: [grid(tile_map, r, dx, vy, vy) for r, dx, vy in players], number=1)
+        print(f'{columns:>6}x{rows:<5} {len(tiles):>8} {scan_time / len(scan_players) * 1e6:>14.2f} '
+              f'{grid_time / len(players) * 1e6:>14.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+'''
+Dirty Rectangle Benchmark
+-------------------------
+Plays every level with an input script (see benchmarks/scripts) twice: once redrawing the whole screen and updating
+the whole display every frame (RenderQueue.submit() and pygame.display.update(), what the game does by default), and
+once with RenderQueue.submit_dirty() and pygame.display.update(rects) (what `python main.py --dirty-rects` does).
+For both it reports the average wall-clock and CPU time of drawing and presenting a frame, and for the dirty
+rectangles also how much of the screen was redrawn on average and how many frames fell back to a full update.
+
+Only the drawing is timed (the game is stepped outside the timer). The benchmark runs with the dummy video driver,
+where updating the display doesn't copy anything to a real window, so on a real display the difference between a full
+update and a few small rectangles is bigger than what is measured here.
+
+Run from the repository root with:
+    python benchmarks/bench_dirty_rects.py [script]
+'''
+
+import os
+import sys
+import time
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # the repository root
+sys.path.insert(0, root)  # make the game modules importable
+os.chdir(root)  # the game loads its images relative to the repository root
+
+import headless  # selects the dummy video and audio drivers before the game is imported
+import pygame
+import main
+
+frames = 600  # frames timed per level and mode
+default_script = os.path.join('benchmarks', 'scripts', 'explore.txt')
+
+
+def bench(level, script, dirty):  # play a level with the script, and time drawing and presenting every frame
+    game = main.Game(level, prefetch=False)
+    queue = main.render_queue
+    queue.invalidate()
+    queue.full_updates = queue.dirty_updates = 0
+    keys = headless.script_keys(script, loop=True)
+    wall = cpu = 0.0
+    area = 0
+    for _ in range(frames):
+        game.update(next(keys))
+        if game.game_over != 0 or game.level != level:  # keep the benchmark on this level
+            game.level = level
+            game.restart()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        game.draw_static()
+        game.draw()
+        if dirty:
+            rects = queue.submit_dirty(main.screen)
+            if rects is None:
+                pygame.display.update()
+            elif rects:
+                pygame.display.update(rects)
+            area += queue.dirty_area
+        else:
+            queue.submit(main.screen)
+            pygame.display.update()
+        wall += time.perf_counter() - wall_start
+        cpu += time.process_time() - cpu_start
+    screen_area = main.screen_width * main.screen_height
+    return {'frame_ms': wall / frames * 1000, 'cpu_ms': cpu / frames * 1000,
+            'redrawn': area / frames / screen_area * 100, 'full_updates': queue.full_updates}
+
+
+if __name__ == '__main__':
+    script = headless.load_script(sys.argv[1] if len(sys.argv) > 1 else default_script)
+    print(f'{"level":>5} {"full ms":>8} {"full cpu":>9} {"dirty ms":>9} {"dirty cpu":>10} {"redrawn %":>10} '
+          f'{"full updates":>13}')
+    for level in range(1, main.max_levels + 1):
+        full = bench(level, script, False)
+        dirty = bench(level, script, True)
+        print(f'{level:>5} {full["frame_ms"]:>8.3f} {full["cpu_ms"]:>9.3f} {dirty["frame_ms"]:>9.3f} '
+              f'{dirty["cpu_ms"]:>10.3f} {dirty["redrawn"]:>10.1f} {dirty["full_updates"]:>13}')
+    pygame.quit()
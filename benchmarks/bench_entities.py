@@ -0,0 +1,117 @@
+'''
+Patrol Entity Benchmark
+-----------------------
+Compares moving N patrolling entities (slimes and platforms) the old way, with one Python update() per sprite, against
+the PatrolStore, which moves all of them with a few NumPy operations. It then compares finding the platforms near the
+player by checking every entity in the store (what Player.update used to do) against the sweep and prune of
+KinematicBodies, and times whole game steps (Game.update) on made-up levels packed with thousands of slimes and moving
+platforms, to check they stay well inside the 16.7ms a frame has at 60 FPS.
+
+Run from the repository root with:
+    python benchmarks/bench_entities.py
+'''
+
+import os
+import sys
+import time
+import timeit
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # the repository root
+sys.path.insert(0, root)  # make the game modules importable
+os.chdir(root)  # the game loads its images relative to the repository root
+
+import headless  # selects the dummy video and audio drivers before the game is imported
+import numpy
+import pygame
+import main
+from entities import PatrolStore, KinematicBodies, enemy_kind, platform_kind, ice_platform_kind
+
+counts = [100, 1000, 5000, 20000]  # numbers of entities to benchmark
+steps = 200  # steps timed per benchmark
+
+
+class OldEnemy():  # the per-sprite patrol movement the game used before the PatrolStore
+    def __init__(self, x, y):
+        self.rect = pygame.Rect(x, y, 50, 35)
+        self.move_direction = 1
+        self.move_counter = 0
+
+    def update(self):
+        self.rect.x += self.move_direction
+        self.move_counter += 1
+        if abs(self.move_counter) > 50:
+            self.move_direction *= -1
+            self.move_counter *= -1
+
+
+def bench_movement():
+    print(f'{"entities":>9} {"per-sprite us/step":>19} {"store us/step":>14}')
+    for count in counts:
+        old = [OldEnemy(index * 7, 100) for index in range(count)]
+        store = PatrolStore()
+        for index in range(count):
+            store.add(None, index * 7, 100, 50, 35, 1, 0, enemy_kind)
+
+        old_time = timeit.timeit(lambda: [enemy.update() for enemy in old], number=steps) / steps
+        store_time = timeit.timeit(store.update, number=steps) / steps
+        print(f'{count:>9} {old_time * 1e6:>19.1f} {store_time * 1e6:>14.1f}')
+
+
+def bench_platform_lookup():
+    print(f'\n{"platforms":>9} {"scan us/step":>13} {"sweep and prune us/step":>24}')
+    rng = numpy.random.default_rng(0)
+    for count in [100, 1000, 10000]:
+        store = PatrolStore()
+        for index in range(count):  # platforms and ice platforms (and slimes in between) spread over a wide level
+            kind = platform_kind if index % 3 else ice_platform_kind
+            store.add(None, int(rng.integers(0, 200 * count)), int(rng.integers(0, 1000)), 50, 25,
+                      index % 2, 1 - index % 2, kind)
+            store.add(None, int(rng.integers(0, 200 * count)), int(rng.integers(0, 1000)), 50, 35, 1, 0, enemy_kind)
+        store.sprites = [pygame.sprite.Sprite() for _ in range(store.count)]
+        bodies = KinematicBodies(store)
+        players = [pygame.Rect(int(rng.integers(0, 200 * count)), int(rng.integers(0, 1000)), 45, 70).inflate(200, 200)
+                   for _ in range(steps)]
+
+        scan_time = sweep_time = 0.0
+        for nearby in players:  # every step: move everything, then look up the platforms near a player both ways
+            store.update()
+            start = time.perf_counter()
+            scanned = store.colliding(nearby, platform_kind) + store.colliding(nearby, ice_platform_kind)
+            scan_time += time.perf_counter() - start
+            start = time.perf_counter()
+            swept = bodies.query(nearby)
+            sweep_time += time.perf_counter() - start
+            assert swept == scanned  # both must find the same platforms, in the same order
+        scan_time /= steps
+        sweep_time /= steps
+        print(f'{count:>9} {scan_time * 1e6:>13.1f} {sweep_time * 1e6:>24.1f}')
+
+
+def crowded_level(columns, rows=20):  # a level with a floor, and slimes and moving platforms everywhere else
+    data = []
+    for row in range(rows):
+        if row == rows - 1:
+            data.append([1] * columns)  # dirt floor
+        elif row % 3 == 0:
+            data.append([4 if column % 4 == 0 else 0 for column in range(columns)])  # moving platforms
+        else:
+            data.append([3 if (column + row) % 2 == 0 else 0 for column in range(columns)])  # slimes
+    return data
+
+
+def bench_game_steps():
+    print(f'\n{"level":>9} {"slimes":>7} {"platforms":>10} {"Game.update ms":>15}')
+    still = headless.KeyState()  # the player stands still so every step does the same work
+    for columns in [20, 100, 400]:
+        game = main.Game(1, prefetch=False)
+        game.world = main.World(crowded_level(columns))
+        game.player.rect.topleft = (-200, -200)  # keep the player out of the way so the level isn't restarted
+        step_time = timeit.timeit(lambda: game.update(still), number=steps) / steps
+        print(f'{columns:>6}x20 {len(game.world.blob_group):>7} {len(game.world.platform_group):>10} '
+              f'{step_time * 1000:>15.3f}')
+
+
+if __name__ == '__main__':
+    bench_movement()
+    bench_platform_lookup()
+    bench_game_steps()
@@ -0,0 +1,225 @@
+'''
+Level Benchmark Suite
+---------------------
+Plays the input scripts in benchmarks/scripts/ through every level (level1_data to level10_data) without a window,
+timing each part of a frame separately so we can tell whether a change made the game slower, and where:
+    world      --> building the World from the level data (World(data))
+    reset      --> restarting the level (Game.reset_level, building its world: the benchmark doesn't prefetch worlds)
+    sprites    --> updating the sprite groups and collecting coins (Game.update_sprites)
+    player     --> updating the player (Game.update_player / Player.update)
+    draw       --> queueing the static layer and the moving parts of the game and drawing them (headless.render)
+    display    --> pushing the frame to the display (pygame.display.update)
+
+Frame times are reported as the 50th, 95th and 99th percentile (p50/p95/p99) in microseconds. Allocations are measured
+in a second, untimed pass with tracemalloc (which slows everything down a lot): for every frame we record how many bytes
+were allocated at the peak of the frame and how many memory blocks were still allocated at the end of it.
+
+The results are saved as JSON, and a previous results file can be compared against to flag regressions:
+    python benchmarks/bench_levels.py --output before.json
+    (make a change)
+    python benchmarks/bench_levels.py --output after.json --compare before.json
+The comparison exits with status 1 if anything got slower than the threshold (10% and at least 5us by default).
+'''
+
+import argparse
+import glob
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # the repository root
+sys.path.insert(0, root)  # make the game modules importable
+os.chdir(root)  # the game loads its images, sounds and levels relative to the repository root
+
+import headless  # selects the dummy video and audio drivers before the game is imported
+import pygame
+import main
+
+script_dir = os.path.join(root, 'benchmarks', 'scripts')  # where the input scripts live
+phases = ['sprites', 'player', 'draw', 'display']  # the per-frame phases, in the order they run
+
+
+def percentiles(samples):  # summarise a list of timings (in seconds) as microsecond percentiles
+    if not samples:
+        return {'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0}
+    ordered = sorted(samples)
+
+    def pick(fraction):  # nearest-rank percentile
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1e6
+
+    return {'mean': sum(ordered) / len(ordered) * 1e6, 'p50': pick(0.50), 'p95': pick(0.95), 'p99': pick(0.99),
+            'max': ordered[-1] * 1e6}
+
+
+def play(game, level, keys, frames, timings=None):  # play frames of a script on one level, restarting as needed
+    clock = time.perf_counter
+    for _ in range(frames):
+        key = next(keys)
+
+        start = clock()
+        game.update_sprites()
+        after_sprites = clock()
+        game.update_player(key)
+        after_player = clock()
+        headless.render(game)
+        after_draw = clock()
+        pygame.display.update()
+        after_display = clock()
+
+        if timings is not None:
+            timings['sprites'].append(after_sprites - start)
+            timings['player'].append(after_player - after_sprites)
+            timings['draw'].append(after_draw - after_player)
+            timings['display'].append(after_display - after_draw)
+            timings['frame'].append(after_display - start)
+            timings['blits'].append(main.render_queue.blits)
+
+        if game.game_over != 0 or game.level != level:  # the player died or finished the level: play it again
+            game.level = level
+            reset_start = clock()
+            game.reset_level()
+            game.score = 0
+            if timings is not None:
+                timings['reset'].append(clock() - reset_start)
+
+
+def measure_allocations(level, script, frames):  # untimed pass that records the memory allocated by every frame
+    game = main.Game(level, prefetch=False)  # (no background thread building worlds while frames are timed)
+    keys = headless.script_keys(script, loop=True)
+    peaks = []
+    blocks = []
+    tracemalloc.start()
+    for _ in range(frames):
+        tracemalloc.reset_peak()
+        start_size = tracemalloc.get_traced_memory()[0]
+        start_blocks = sys.getallocatedblocks()
+        play(game, level, keys, 1)
+        peaks.append(tracemalloc.get_traced_memory()[1] - start_size)
+        blocks.append(sys.getallocatedblocks() - start_blocks)
+    tracemalloc.stop()
+    peaks.sort()
+    return {'peak_bytes_p50': peaks[len(peaks) // 2], 'peak_bytes_max': peaks[-1],
+            'net_blocks_mean': sum(blocks) / len(blocks)}
+
+
+def bench_level(level, scripts, frames, warmup, allocation_frames):  # benchmark one level with every script
+    data = main.load_level_data(level)
+    world_times = []
+    for _ in range(5):  # time building the World a few times
+        start = time.perf_counter()
+        main.World(data)
+        world_times.append(time.perf_counter() - start)
+
+    timings = {name: [] for name in phases + ['frame', 'reset', 'blits']}
+    for script in scripts.values():
+        game = main.Game(level, prefetch=False)  # (no background thread building worlds while frames are timed)
+        keys = headless.script_keys(script, loop=True)
+        play(game, level, keys, warmup)  # warm up the caches before timing
+        play(game, level, keys, frames, timings)
+
+        start = time.perf_counter()  # always time at least one reset, even if the player never died
+        game.reset_level()
+        timings['reset'].append(time.perf_counter() - start)
+
+    result = {
+        'frames': len(timings['frame']),
+        'world': percentiles(world_times),
+        'reset': percentiles(timings['reset']),
+        'frame': percentiles(timings['frame']),
+        'phases': {name: percentiles(timings[name]) for name in phases},
+        'blits_per_frame': sum(timings['blits']) / len(timings['blits']) if timings['blits'] else 0.0,
+    }
+    if allocation_frames:
+        result['allocations'] = measure_allocations(level, next(iter(scripts.values())), allocation_frames)
+    return result
+
+
+# the metrics compared between two runs (as paths into a level's results)
+compared_metrics = [('frame', 'p50'), ('frame', 'p95'), ('frame', 'p99'), ('world', 'p50'), ('reset', 'p50')] + \
+                   [('phases', name, 'p95') for name in phases]
+
+
+def lookup(results, metric_path):  # follow a metric path into a level's results
+    for part in metric_path:
+        results = results[part]
+    return results
+
+
+def compare(current, baseline, threshold, min_delta):  # print how every metric changed and return the regressions
+    regressions = []
+    for level, level_results in current['levels'].items():
+        if level not in baseline['levels']:
+            continue
+        for metric_path in compared_metrics:
+            new = lookup(level_results, metric_path)
+            old = lookup(baseline['levels'][level], metric_path)
+            if old <= 0:
+                continue
+            change = new / old - 1
+            name = '.'.join(metric_path)
+            flag = ''
+            if change > threshold and new - old > min_delta:  # tiny phases are too noisy to flag on ratio alone
+                flag = '  <-- REGRESSION'
+                regressions.append((level, name, change))
+            print(f'level {level:>2} {name:<18} {old:>10.1f}us -> {new:>10.1f}us {change:>+8.1%}{flag}')
+    return regressions
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description='Benchmark every level with scripted input.')
+    parser.add_argument('--levels', type=int, nargs='*', default=list(range(1, main.max_levels + 1)),
+                        help='levels to benchmark (default: all)')
+    parser.add_argument('--frames', type=int, default=600, help='timed frames per level and script (default: 600)')
+    parser.add_argument('--warmup', type=int, default=60, help='untimed frames before timing (default: 60)')
+    parser.add_argument('--allocation-frames', type=int, default=120,
+                        help='frames per level for the allocation pass (default: 120, 0 to skip)')
+    parser.add_argument('--output', help='save the results to this JSON file')
+    parser.add_argument('--compare', help='compare against a previous JSON results file')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='relative slowdown that counts as a regression (default: 0.10)')
+    parser.add_argument('--min-delta', type=float, default=5.0,
+                        help='smallest slowdown in microseconds that counts as a regression (default: 5)')
+    args = parser.parse_args()
+
+    scripts = {os.path.basename(filename): headless.load_script(filename)
+               for filename in sorted(glob.glob(os.path.join(script_dir, '*.txt')))}
+
+    results = {
+        'meta': {'python': platform.python_version(), 'pygame': pygame.version.ver, 'platform': platform.platform(),
+                 'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'scripts': list(scripts), 'frames': args.frames},
+        'levels': {},
+    }
+
+    print(f'{"level":>5} {"world p50":>10} {"reset p50":>10} {"frame p50":>10} {"p95":>8} {"p99":>8}  '
+          + ' '.join(f'{name + " p95":>12}' for name in phases) + f' {"alloc p50":>10} {"blits":>6}')
+    for level in args.levels:
+        level_results = bench_level(level, scripts, args.frames, args.warmup, args.allocation_frames)
+        results['levels'][str(level)] = level_results
+        frame = level_results['frame']
+        allocations = level_results.get('allocations', {}).get('peak_bytes_p50', 0)
+        print(f'{level:>5} {level_results["world"]["p50"]:>10.0f} {level_results["reset"]["p50"]:>10.0f} '
+              f'{frame["p50"]:>10.0f} {frame["p95"]:>8.0f} {frame["p99"]:>8.0f}  '
+              + ' '.join(f'{level_results["phases"][name]["p95"]:>12.0f}' for name in phases)
+              + f' {allocations:>9}B {level_results["blits_per_frame"]:>6.0f}')
+    print('(times in microseconds)')
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+        print(f'saved results to {args.output}')
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(results, baseline, args.threshold, args.min_delta)
+        if regressions:
+            print(f'{len(regressions)} regression(s) over {args.threshold:.0%}')
+            sys.exit(1)
+        print('no regressions')
+
+
+if __name__ == '__main__':
+    main_cli()
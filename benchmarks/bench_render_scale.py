@@ -0,0 +1,75 @@
+'''
+Render Scale Benchmark
+----------------------
+Plays every level with an input script (see benchmarks/scripts) once for every render scale (render_scales): at 1 the
+frame is drawn at the full size of the window with RenderQueue.submit() (what the game does by default), and below 1
+it is drawn with RenderQueue.submit_scaled() onto a surface the size of the smaller display that
+`python main.py --render-scale S` opens. For every scale it reports the average wall-clock and CPU time of drawing a
+frame, per level and over all levels.
+
+Only the drawing is timed (the game is stepped outside the timer), after a few frames to fill the RenderScale's cache
+of scaled images. The benchmark runs with the dummy video driver, which can't open a SCALED display, so the part SDL
+does on the graphics card (scaling the smaller frame up to the window and showing it) isn't measured: what is measured
+is the filling the CPU saves, and on a real display sending a smaller frame to the window saves more on top of it.
+
+Run from the repository root with:
+    python benchmarks/bench_render_scale.py [script]
+'''
+
+import os
+import sys
+import time
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # the repository root
+sys.path.insert(0, root)  # make the game modules importable
+os.chdir(root)  # the game loads its images relative to the repository root
+
+import headless  # selects the dummy video and audio drivers before the game is imported
+import pygame
+import main
+from render import RenderScale, render_scales
+
+frames = 600  # frames timed per level and scale
+warmup = 10  # frames drawn before timing (to scale the images of the level)
+scales = render_scales  # the render scales compared
+default_script = os.path.join('benchmarks', 'scripts', 'explore.txt')
+
+
+def bench(level, script, scale):  # play a level with the script, and time drawing every frame
+    game = main.Game(level, prefetch=False)
+    render_scale = RenderScale(scale, main.screen_size) if scale < 1 else None
+    display = pygame.Surface(render_scale.size).convert() if render_scale is not None else main.screen
+    keys = headless.script_keys(script, loop=True)
+    wall = cpu = 0.0
+    for frame in range(warmup + frames):
+        game.update(next(keys))
+        if game.game_over != 0 or game.level != level:  # keep the benchmark on this level
+            game.level = level
+            game.restart()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        game.draw_static()
+        game.draw()
+        if render_scale is not None:
+            main.render_queue.submit_scaled(display, render_scale)
+        else:
+            main.render_queue.submit(display)
+        if frame >= warmup:
+            wall += time.perf_counter() - wall_start
+            cpu += time.process_time() - cpu_start
+    return {'frame_ms': wall / frames * 1000, 'cpu_ms': cpu / frames * 1000}
+
+
+if __name__ == '__main__':
+    script = headless.load_script(sys.argv[1] if len(sys.argv) > 1 else default_script)
+    print(f'{"level":>5} ' + ' '.join(f'{f"{scale:g} ms":>9} {f"{scale:g} cpu":>9}' for scale in scales))
+    totals = {scale: {'frame_ms': 0.0, 'cpu_ms': 0.0} for scale in scales}
+    for level in range(1, main.max_levels + 1):
+        results = {scale: bench(level, script, scale) for scale in scales}
+        for scale, result in results.items():
+            for key in result:
+                totals[scale][key] += result[key] / main.max_levels
+        print(f'{level:>5} ' + ' '.join(f'{results[scale]["frame_ms"]:>9.3f} {results[scale]["cpu_ms"]:>9.3f}'
+                                        for scale in scales))
+    print(f'{"all":>5} ' + ' '.join(f'{totals[scale]["frame_ms"]:>9.3f} {totals[scale]["cpu_ms"]:>9.3f}'
+                                    for scale in scales))
+    pygame.quit()
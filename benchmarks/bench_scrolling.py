@@ -0,0 +1,83 @@
+'''
+Scrolling Level Benchmark
+-------------------------
+Builds long made-up levels (40 rows, from 100 up to 20000 columns) and runs the player to the right through them with
+the camera following, timing how long it takes to build the World and how long a frame takes (updating the game,
+drawing the static scene and the sprites, and the batched blit). With the chunked tile map and culling, the frame time
+should stay about the same however long the level is, and only a few chunks should ever be built at once.
+
+Run from the repository root with:
+    python benchmarks/bench_scrolling.py
+'''
+
+import os
+import sys
+import time
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # the repository root
+sys.path.insert(0, root)  # make the game modules importable
+os.chdir(root)  # the game loads its images relative to the repository root
+
+import headless  # selects the dummy video and audio drivers before the game is imported
+import pygame
+import main
+from levels import LevelData, encode_level, header
+
+widths = [100, 2000, 20000]  # numbers of columns of the levels to benchmark
+rows = 40  # number of rows of every level
+frames = 600  # frames timed per level
+run_right = headless.parse_script('12 right\n1 right+space\n')  # run right, hopping over the bumps
+
+
+def long_level(columns):  # a level with a floor, bumps to hop over, coins, and slimes and platforms up in the sky
+    data = [[0] * columns for _ in range(rows)]
+    for column in range(columns):
+        data[rows - 1][column] = 1  # dirt floor
+        data[rows - 2][column] = 2  # grass on top of it
+        if column % 16 == 15:
+            data[rows - 3][column] = 2  # a bump to hop over
+        if column % 4 == 2:
+            data[rows - 4][column] = 7  # a coin
+        if column % 12 == 0:
+            data[10][column] = 3  # a slime, far above the player
+            data[11][column] = 2  # standing on a block
+        if column % 24 == 6:
+            data[16][column] = 4  # a moving platform
+    data[0] = [1] * columns  # a ceiling, so every chunk row has some tiles
+    return LevelData(encode_level(data), columns, rows, header.size)
+
+
+def bench(columns):
+    data = long_level(columns)
+    start = time.perf_counter()
+    world = main.World(data)
+    build_time = time.perf_counter() - start
+
+    game = main.Game(1, prefetch=False)
+    game.world = world
+    game.player.reset(100, world.pixel_height - 130)
+    keys = headless.script_keys(run_right, loop=True)
+    most_chunks = 0
+    times = []
+    for _ in range(frames):
+        start = time.perf_counter()
+        game.update(next(keys))
+        headless.render(game)
+        times.append(time.perf_counter() - start)
+        most_chunks = max(most_chunks, len(world.tile_grid.chunks))
+        if game.game_over != 0 or game.world is not world:  # shouldn't happen, but keep the benchmark on this level
+            break
+    times.sort()
+    return {'build_ms': build_time * 1000, 'frame_ms': sum(times) / len(times) * 1000,
+            'p95_ms': times[int(len(times) * 0.95)] * 1000, 'chunks': most_chunks, 'builds': world.tile_grid.builds,
+            'blits': main.render_queue.blits, 'player_x': game.player.rect.x}
+
+
+if __name__ == '__main__':
+    print(f'{"level":>9} {"build ms":>9} {"frame ms":>9} {"p95 ms":>7} {"chunks":>7} {"builds":>7} {"blits":>6} '
+          f'{"player x":>9}')
+    for columns in widths:
+        result = bench(columns)
+        print(f'{columns:>6}x{rows} {result["build_ms"]:>9.1f} {result["frame_ms"]:>9.3f} {result["p95_ms"]:>7.3f} '
+              f'{result["chunks"]:>7} {result["builds"]:>7} {result["blits"]:>6} {result["player_x"]:>9}')
+    pygame.quit()
@@ -0,0 +1,71 @@
+'''
+Snapshot Benchmark
+------------------
+Plays every level with an input script (see benchmarks/scripts) and takes a snapshot of the game after every step,
+like the main game loop does for rewinding, then rewinds all of it. It reports how big a snapshot of the level is, how
+long taking one and adding it to the RewindBuffer takes, how many bytes the buffer needs per step (the compressed
+difference from the step before), how many seconds of play fit in the buffer, and how long rewinding one step takes.
+Everything per step should stay far below the 16.7ms a frame has at 60 FPS, so snapshots can be taken every frame.
+
+Run from the repository root with:
+    python benchmarks/bench_snapshots.py [script]
+'''
+
+import os
+import sys
+import time
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # the repository root
+sys.path.insert(0, root)  # make the game modules importable
+os.chdir(root)  # the game loads its images relative to the repository root
+
+import headless  # selects the dummy video and audio drivers before the game is imported
+import pygame
+import main
+from snapshots import RewindBuffer
+
+steps = 1800  # steps played (and rewound) per level: 30 seconds of play
+default_script = os.path.join('benchmarks', 'scripts', 'explore.txt')
+
+
+def bench(level, script):
+    game = main.Game(level, prefetch=False)
+    rewind = RewindBuffer()
+    keys = headless.script_keys(script, loop=True)
+    take_time = push_time = 0.0
+    for _ in range(steps):
+        game.update(next(keys))
+        if game.game_over != 0 or game.level != level:  # keep the benchmark on this level
+            game.level = level
+            game.restart()
+        start = time.perf_counter()
+        snapshot = game.save_snapshot()
+        take_time += time.perf_counter() - start
+        start = time.perf_counter()
+        rewind.push(snapshot)
+        push_time += time.perf_counter() - start
+    stored = rewind.size / len(rewind)  # bytes per step in the buffer
+
+    start = time.perf_counter()
+    rewound = 0
+    while True:  # rewind every step
+        snapshot = rewind.pop()
+        if snapshot is None:
+            break
+        game.load_snapshot(snapshot)
+        rewound += 1
+    rewind_time = time.perf_counter() - start
+    return {'bytes': len(rewind.current), 'take_us': take_time / steps * 1e6,
+            'push_us': push_time / steps * 1e6, 'stored': stored, 'seconds': rewind.max_bytes / stored / main.sim_rate,
+            'rewind_us': rewind_time / max(1, rewound) * 1e6}
+
+
+if __name__ == '__main__':
+    script = headless.load_script(sys.argv[1] if len(sys.argv) > 1 else default_script)
+    print(f'{"level":>5} {"snapshot B":>11} {"take us":>8} {"push us":>8} {"B/step":>7} {"buffer s":>9} '
+          f'{"rewind us":>10}')
+    for level in range(1, main.max_levels + 1):
+        result = bench(level, script)
+        print(f'{level:>5} {result["bytes"]:>11} {result["take_us"]:>8.1f} {result["push_us"]:>8.1f} '
+              f'{result["stored"]:>7.1f} {result["seconds"]:>9.0f} {result["rewind_us"]:>10.1f}')
+    pygame.quit()
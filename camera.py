@@ -0,0 +1,33 @@
+'''
+Camera
+------
+Levels used to be exactly one screen (20x20 tiles in a 1000x1000 window), so everything was drawn where it was in the
+level. Levels can now be bigger than the screen, so the camera decides which part of the level is shown: it keeps the
+player in the middle of the screen, but never shows anything outside the level. For a level that fits on the screen
+the camera never moves (its offset stays (0, 0)), so those levels look exactly like they always did.
+
+Everything in the level (tiles, sprites and the player) is positioned in level coordinates, and drawn at its level
+position minus the camera's offset. Text, buttons and the HUD are drawn in screen coordinates and don't move.
+'''
+
+import pygame
+
+
+class Camera():
+    def __init__(self, width, height):  # constructor function with the size of the screen the camera shows
+        self.width = width  # width of the area shown on the screen
+        self.height = height  # height of the area shown on the screen
+        self.x = 0  # the level coordinates of the top left corner of the screen
+        self.y = 0
+
+    def follow(self, x, y, level_width, level_height):  # centre the camera on a point, without leaving the level
+        self.x = max(0, min(x - self.width // 2, level_width - self.width))
+        self.y = max(0, min(y - self.height // 2, level_height - self.height))
+
+    @property
+    def offset(self):  # how far the screen is scrolled into the level
+        return self.x, self.y
+
+    @property
+    def view(self):  # the part of the level shown on the screen, in level coordinates
+        return pygame.Rect(self.x, self.y, self.width, self.height)
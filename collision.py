@@ -0,0 +1,90 @@
+'''
+Collision Helpers
+-----------------
+The level data is a regular grid of tile_size cells, so instead of testing the player against every tile in the level
+(world.tile_list) we can keep the tiles in a spatial index and only look at the few cells the player is overlapping.
+
+TileGrid stores the collision rectangle of every solid tile under its (column, row) cell. Asking for the tiles around
+a rectangle then only costs as much as the number of cells that rectangle covers, which depends on the size of the
+player and not on the size of the level.
+
+collide_step() is the player's whole collision check against the tiles for one step (Player.update calls it, and so
+does benchmarks/bench_collision.py, so the benchmark always times the code the game runs).
+'''
+
+import pygame
+
+
+class TileGrid():
+    def __init__(self, cell_size, rects=()):  # constructor function with the cell size and (optionally) tile rects
+        self.cell_size = cell_size  # width and height of one cell in pixels (tile_size)
+        self.cells = {}  # dictionary that maps (column, row) to the collision rectangle of the tile in that cell
+        for rect in rects:  # add any tiles we were given
+            self.add(rect)
+
+    def add(self, rect):  # add a tile's collision rectangle to the cell it sits in
+        self.cells[(rect.x // self.cell_size, rect.y // self.cell_size)] = rect
+
+    def remove(self, column, row):  # remove the tile in a cell (if there is one)
+        self.cells.pop((column, row), None)
+
+    def row_at(self, y):  # the row a y coordinate falls into
+        return y // self.cell_size
+
+    def columns(self, left, width):  # the range of columns that a horizontal span [left, left + width) overlaps
+        return range(left // self.cell_size, (left + width - 1) // self.cell_size + 1)
+
+    def rows(self, top, height):  # the range of rows that a vertical span [top, top + height) overlaps
+        return range(top // self.cell_size, (top + height - 1) // self.cell_size + 1)
+
+    def row_tiles(self, row, left, width):  # the tiles in one row under a horizontal span, from left to right
+        tiles = []
+        for column in self.columns(left, width):
+            rect = self.cells.get((column, row))
+            if rect is not None:
+                tiles.append(rect)
+        return tiles
+
+    def tiles_in(self, rect):  # the tiles in every cell a rectangle overlaps, in row-major order (like tile_list)
+        rect = pygame.Rect(rect)
+        tiles = []
+        for row in self.rows(rect.y, rect.height):
+            tiles.extend(self.row_tiles(row, rect.x, rect.width))
+        return tiles
+
+    def collides(self, rect):  # True if any tile collides with the rectangle
+        rect = pygame.Rect(rect)
+        for tile_rect in self.tiles_in(rect):
+            if tile_rect.colliderect(rect):
+                return True
+        return False
+
+    def collide_step(self, rect, dx, dy, vel_y):
+        '''
+        Stop a rectangle (the player) moving by (dx, dy) with vertical velocity vel_y from going into any tile.
+        Returns (dx, dy, vel_y, landed), where landed is True if it came down onto a tile.
+
+        The x-axis is checked first, at the rectangle's current height. The y-axis is then checked row by row,
+        starting at the top of the projected position. The tiles are checked in the same order as world.tile_list
+        (top to bottom, left to right), and a collision changes dy for the tiles checked after it, so we keep going
+        until we pass the bottom of the (possibly changed) projected position.
+        '''
+        x, y, width, height = rect
+        landed = False
+        if self.collides((x + dx, y, width, height)):  # check for x-axis collisions
+            dx = 0
+
+        row = self.row_at(y + dy)  # the first row the projected position overlaps
+        while row * self.cell_size < y + dy + height:  # while the row is above the projected bottom
+            for tile_rect in self.row_tiles(row, x, width):
+                if tile_rect.colliderect(x, y + dy, width, height):
+                    # if there is a vertical collision, stop the rectangle at the collision point
+                    if vel_y < 0:  # jumping into the tile from below
+                        dy = tile_rect.bottom - y
+                        vel_y = 0
+                    elif vel_y >= 0:  # falling (or resting) onto the tile
+                        dy = tile_rect.top - (y + height)
+                        vel_y = 0
+                        landed = True
+            row += 1  # move on to the next row down
+        return dx, dy, vel_y, landed
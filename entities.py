@@ -0,0 +1,206 @@
+'''
+Patrol Entity Store
+-------------------
+Slimes, platforms and ice platforms all move the same way: every step they move one pixel along their axis (x or y)
+in their current direction, count the step, and once the count goes past 50 they turn around. Running that as one
+Python update() per sprite gets slow on levels with thousands of them, so instead the PatrolStore keeps the state of
+every patrolling entity in a level in NumPy arrays (one array per field, one slot per entity) and moves all of them
+at once with a handful of array operations per step.
+
+The sprites themselves (Enemy, Platform and IcePlatform in main.py) are PatrolSprites, which don't store their own
+position: their rect, image and movement fields are read from the store when they are used. A sprite's rect is only
+brought up to date when something asks for it, so entities that nothing looks at during a step cost nothing.
+Positions must therefore only be changed through the store, never by moving a sprite's rect directly.
+
+Kinematic Bodies
+----------------
+Platforms and ice platforms are kinematic bodies: they aren't pushed around by anything, but the player stands on
+them, bumps into them and is carried along by them. Player.update used to have one copy of the collision code for
+each kind of platform, and looked for nearby platforms by checking every entity in the store. KinematicBodies finds
+them with sweep and prune instead. A body never leaves its moving bounds: the area it patrols, turn_after + 1 pixels
+either side of where it started along its axis. Those bounds never change, so the bodies are sorted by the left edge
+of their bounds once (when the level is built), and the bodies that can overlap a rectangle are then one slice of the
+sorted list, found with two binary searches (the sweep). Only the few bodies in that slice are checked against the
+rectangle, first by their bounds and then by where they are now (the prune), whatever the number of bodies in the
+level, and nothing has to be done when they move.
+
+Any kind added to kinematic_kinds is collided with the same way, in the order of that list (and in the order the
+bodies were added within a kind), which is the order Player.update used to check the platform groups in.
+'''
+
+import numpy
+import pygame
+
+turn_after = 50  # a patrolling entity turns around once its move counter goes past this many steps
+
+# the kinds of patrolling entity (so e.g. only slimes are checked when looking for enemies touching the player)
+enemy_kind = 0
+platform_kind = 1
+ice_platform_kind = 2
+removed_kind = -1  # an entity that was taken out of the level (its slot stays, so the other slots don't change)
+
+# the kinds the player collides with, stands on and is carried by (in the order they are collided with)
+kinematic_kinds = [platform_kind, ice_platform_kind]
+
+# the fields of the store: one NumPy array each, with one slot per entity
+fields = ['x', 'y', 'previous_x', 'previous_y', 'width', 'height', 'direction', 'counter', 'move_x', 'move_y', 'kind']
+
+
+class PatrolStore():
+    def __init__(self, capacity=64):  # constructor function with the number of slots to start with
+        self.count = 0  # number of entities in the store
+        self.sprites = []  # the sprite of every entity, by slot
+        self.steps = 0  # number of times the positions have changed (used to tell when a sprite's rect is stale)
+        for field in fields:
+            setattr(self, field, numpy.zeros(capacity, dtype=numpy.int32))
+
+    def add(self, sprite, x, y, width, height, move_x, move_y, kind):  # add an entity, and return its slot
+        if self.count == len(self.x):  # out of slots: double the size of every array
+            for field in fields:
+                array = getattr(self, field)
+                grown = numpy.zeros(len(array) * 2, dtype=array.dtype)
+                grown[:self.count] = array[:self.count]
+                setattr(self, field, grown)
+        index = self.count
+        self.x[index] = self.previous_x[index] = x
+        self.y[index] = self.previous_y[index] = y
+        self.width[index] = width
+        self.height[index] = height
+        self.direction[index] = 1  # every entity starts off moving right (or down)
+        self.counter[index] = 0
+        self.move_x[index] = move_x
+        self.move_y[index] = move_y
+        self.kind[index] = kind
+        self.sprites.append(sprite)
+        self.count += 1
+        return index
+
+    def remove(self, index):  # take an entity out of the level (it stops moving and is never found again)
+        self.kind[index] = removed_kind
+        self.move_x[index] = 0
+        self.move_y[index] = 0
+        self.sprites[index] = None
+        self.touch()
+
+    def update(self):  # move every entity one step, exactly like the old per-sprite update() methods did
+        n = self.count
+        x, y = self.x[:n], self.y[:n]
+        direction, counter = self.direction[:n], self.counter[:n]
+
+        self.previous_x[:n] = x  # remember where everything was before moving (for interpolation)
+        self.previous_y[:n] = y
+        x += direction * self.move_x[:n]  # move along the entity's axis in its current direction
+        y += direction * self.move_y[:n]
+        counter += 1  # count the step
+        turned = numpy.abs(counter) > turn_after  # the entities that have gone far enough turn around
+        numpy.negative(direction, out=direction, where=turned)
+        numpy.negative(counter, out=counter, where=turned)
+        self.touch()
+
+    def touch(self):  # mark every sprite's rect as out of date (after changing positions in the arrays)
+        self.steps += 1
+
+    def colliding(self, rect, kind):  # the sprites of one kind whose rectangles overlap rect (like colliderect)
+        n = self.count
+        x, y = self.x[:n], self.y[:n]
+        hits = ((self.kind[:n] == kind) & (x < rect.right) & (x + self.width[:n] > rect.left)
+                & (y < rect.bottom) & (y + self.height[:n] > rect.top))
+        return [self.sprites[index] for index in numpy.flatnonzero(hits)]
+
+
+class PatrolSprite(pygame.sprite.Sprite):
+    def __init__(self, store, x, y, width, height, move_x, move_y, kind):  # add the sprite to a store
+        pygame.sprite.Sprite.__init__(self)
+        self.store = store  # the store holding this sprite's state
+        self.index = store.add(self, x, y, width, height, move_x, move_y, kind)  # this sprite's slot in the store
+        self._rect = pygame.Rect(x, y, width, height)  # the rect handed out by .rect, moved to the store's position
+        self._rect_step = store.steps  # the store step the rect was last brought up to date on
+
+    @property
+    def rect(self):  # the sprite's collision rectangle, at its current position in the store
+        if self._rect_step != self.store.steps:
+            self._rect.x = int(self.store.x[self.index])
+            self._rect.y = int(self.store.y[self.index])
+            self._rect_step = self.store.steps
+        return self._rect
+
+    @property
+    def move_direction(self):  # 1 when moving right (or down), -1 when moving left (or up)
+        return int(self.store.direction[self.index])
+
+    @property
+    def move_counter(self):  # steps counted since the last turn (negative right after turning)
+        return int(self.store.counter[self.index])
+
+    @property
+    def move_x(self):  # 1 if the entity moves along the x-axis, otherwise 0
+        return int(self.store.move_x[self.index])
+
+    @property
+    def move_y(self):  # 1 if the entity moves along the y-axis, otherwise 0
+        return int(self.store.move_y[self.index])
+
+    @property
+    def previous_position(self):  # where the entity was before the last step (used for interpolation)
+        return int(self.store.previous_x[self.index]), int(self.store.previous_y[self.index])
+
+
+
+class KinematicBodies():
+    def __init__(self, store, kinds=kinematic_kinds):  # constructor function with the store and the kinds of body
+        self.store = store  # the store holding the bodies' positions
+        self.kinds = list(kinds)  # the kinds of entity that are bodies, in collision order
+        self.count = -1  # the number of entities in the store when the bodies were last sorted
+        self.sorts = 0  # number of times the bodies were sorted
+
+    def sort(self):  # find the bodies in the store and sort them by the left edge of their moving bounds
+        store = self.store
+        n = store.count
+        kinds = store.kind[:n]
+        ranks = numpy.zeros(n, dtype=numpy.intp)
+        for rank, kind in enumerate(self.kinds):
+            ranks[kinds == kind] = rank
+        slots = numpy.flatnonzero(numpy.isin(kinds, self.kinds))
+
+        # where every body started patrolling from (the store moves it `counter` steps away from there), and how far
+        # it can get from there in either direction before turning around
+        direction, counter = store.direction[slots], store.counter[slots]
+        move_x, move_y = store.move_x[slots], store.move_y[slots]
+        reach = turn_after + 1
+        left = store.x[slots] - direction * counter * move_x - reach * move_x
+        top = store.y[slots] - direction * counter * move_y - reach * move_y
+
+        order = numpy.argsort(left, kind='stable')
+        self.slots = slots[order]  # the bodies' slots, sorted by the left edge of their moving bounds
+        # (64-bit, like Python's ints, so searchsorted() doesn't convert the whole array on every query)
+        self.left = left[order].astype(numpy.int64)
+        self.right = self.left + store.width[self.slots] + 2 * reach * move_x[order]
+        self.top = top[order]
+        self.bottom = self.top + store.height[self.slots] + 2 * reach * move_y[order]
+        self.widest = int((self.right - self.left).max()) if len(slots) else 0  # the widest moving bounds
+        self.ranks = ranks[self.slots] * max(1, n) + self.slots  # collision order: by kind, then by slot
+        self.count = n
+        self.sorts += 1
+
+    def invalidate(self):  # sort the bodies again before the next query (after their positions were overwritten)
+        self.count = -1
+
+    def query(self, rect):  # the bodies whose rectangles overlap rect (like colliderect), in collision order
+        if self.count != self.store.count:  # entities were added: find and sort the bodies again
+            self.sort()
+        # sweep: the moving bounds that can overlap rect start less than `widest` left of it, and left of its right
+        start = numpy.searchsorted(self.left, rect.left - self.widest, side='right')
+        end = numpy.searchsorted(self.left, rect.right, side='left')
+        if start >= end:
+            return []
+        # prune: the bodies in that slice whose moving bounds overlap rect, and then whose rectangles really do
+        candidates = numpy.flatnonzero((self.right[start:end] > rect.left) & (self.top[start:end] < rect.bottom)
+                                       & (self.bottom[start:end] > rect.top)) + start
+        store = self.store
+        slots = self.slots[candidates]
+        x, y = store.x[slots], store.y[slots]
+        hits = ((x < rect.right) & (x + store.width[slots] > rect.left) & (y < rect.bottom)
+                & (y + store.height[slots] > rect.top))
+        candidates = candidates[hits]
+        sprites = store.sprites
+        return [sprites[slot] for slot in self.slots[candidates[numpy.argsort(self.ranks[candidates])]]]
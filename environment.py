@@ -0,0 +1,186 @@
+'''
+Reinforcement Learning Environment
+----------------------------------
+A Gym-style interface to the game for training and evaluating agents, without a window and without the 60 FPS limit
+of the main game loop. PlatformerEnv wraps one Game, and VectorEnv steps many of them together in one process.
+
+    env = PlatformerEnv(level=1)
+    observation = env.reset()
+    observation, reward, done, info = env.step(action)
+
+Actions are the keys held down for a step, as the bits used by recordings (see recording.py): 1 left, 2 right,
+4 jump, so e.g. 6 is right + jump and 0 is no keys (8 actions in total).
+
+Rewards:
+    +1   for every coin collected
+    +10  for reaching the exit (the episode ends)
+    -1   for dying (the episode ends)
+An episode also ends (with info['truncated'] set) after max_steps steps.
+
+Observations are a dictionary of NumPy arrays that are read straight from the game without copying anything:
+    tiles       --> the level's tile numbers, (rows, columns) uint8 (World.cells, memory-mapped from the level file)
+    entities    --> the slimes and platforms: a dictionary of x, y, direction and kind arrays, one slot per entity
+                    (views of the PatrolStore's arrays, see entities.py)
+    coins       --> the position of every coin, (coins, 2) int32, and coins_left, which of them are still there
+    player      --> x, y, vertical velocity, in_air and game_over, int32 (filled in place every step)
+Because they are views of the game's own state, they change as the game is stepped: copy them to keep them (see
+copy_observation). The observation step() returns at the end of an episode is a copy already: the terminal state, read
+before the game moves on to the next level, that a reset can't overwrite.
+
+Run this file to measure how many steps per second a number of environments can be stepped at:
+    python environment.py [--envs N] [--steps N] [--level N]
+'''
+
+import argparse
+import time
+
+import numpy
+
+import headless  # selects the dummy video and audio drivers before the game is imported
+import pygame
+import main
+from recording import mask_keys
+
+actions = 8  # every combination of left, right and jump
+coin_reward = 1.0
+exit_reward = 10.0
+death_reward = -1.0
+
+
+def copy_observation(observation):  # a copy of an observation that doesn't change when the game is stepped
+    return {name: copy_observation(value) if isinstance(value, dict) else value.copy()
+            for name, value in observation.items()}
+
+
+class PlatformerEnv():
+    def __init__(self, level=1, max_steps=3600):  # constructor function with the level to play and the episode limit
+        self.level = level  # the level every episode plays
+        self.max_steps = max_steps  # the most steps in one episode
+        self.game = main.Game(level, prefetch=False)  # the game (the world is rebuilt for every episode)
+        self.keys = [headless.KeyState(mask_keys(action)) for action in range(actions)]  # the keys of every action
+        self.player = numpy.zeros(5, dtype=numpy.int32)  # the player's part of the observation, filled in place
+        self.steps = 0  # steps taken in the current episode
+        self.observation = None
+
+    def reset(self):  # start a new episode and return its first observation
+        self.game.level = self.level
+        self.game.restart()  # a fresh world, player and score
+        self.steps = 0
+        self.observation = self.observe()
+        return self.observation
+
+    def observe(self):  # the observation of the current world (views, see the top of the file)
+        world = self.game.world
+        store = world.patrols
+        count = store.count
+        self.fill_player()
+        return {
+            'tiles': world.cells,
+            'entities': {'x': store.x[:count], 'y': store.y[:count], 'direction': store.direction[:count],
+                         'kind': store.kind[:count]},
+            'coins': world.coin_positions,
+            'coins_left': world.coins_left,
+            'player': self.player,
+        }
+
+    def fill_player(self):  # copy the player's state into the player array
+        player = self.game.player
+        self.player[0] = player.rect.x
+        self.player[1] = player.rect.y
+        self.player[2] = player.vel_y
+        self.player[3] = player.in_air
+        self.player[4] = self.game.game_over
+
+    def step(self, action):  # run one step with an action, and return (observation, reward, done, info)
+        game = self.game
+        score = game.score
+        game.update_sprites()  # (Game.update(), with the level switch held back until the final state is read)
+        game.move_player(self.keys[action])
+        self.steps += 1
+
+        reward = (game.score - score) * coin_reward
+        info = {'score': game.score, 'truncated': False}
+        done = False
+        if game.game_over == 1:  # reached the exit (the game moves on to the next level below)
+            reward += exit_reward
+            done = True
+        elif game.game_over == -1:  # died
+            reward += death_reward
+            done = True
+        elif self.steps >= self.max_steps:
+            info['truncated'] = True
+            done = True
+
+        self.fill_player()  # the observation's arrays are views, only the player array needs updating
+        final = copy_observation(self.observation) if done else None  # (the final state, before anything changes)
+        game.advance_level()
+        if game.level != self.level:
+            self.observation = self.observe()  # the game built the next level's world: point at its arrays
+        if final is not None:
+            return final, reward, done, info
+        return self.observation, reward, done, info
+
+
+class VectorEnv():
+    def __init__(self, count, level=1, max_steps=3600):  # constructor function with the number of environments
+        levels = level if isinstance(level, (list, tuple)) else [level] * count  # one level, or one per environment
+        self.envs = [PlatformerEnv(levels[index], max_steps) for index in range(count)]
+        self.rewards = numpy.zeros(count, dtype=numpy.float32)  # the rewards of the last step
+        self.dones = numpy.zeros(count, dtype=bool)  # which environments finished an episode on the last step
+        self.total_steps = 0  # steps taken by every environment together
+        self.seconds = 0.0  # time spent stepping
+
+    def reset(self):  # reset every environment and return their observations
+        return [env.reset() for env in self.envs]
+
+    def step(self, actions):
+        '''
+        Step every environment with its action. Environments that finish an episode are reset straight away (the
+        observation returned for them is the first of the new episode, and their info has 'final_observation', a copy
+        of the episode's last state).
+        Returns (observations, rewards, dones, infos).
+        '''
+        start = time.perf_counter()
+        observations = []
+        infos = []
+        for index, env in enumerate(self.envs):
+            observation, reward, done, info = env.step(int(actions[index]))
+            if done:
+                info['final_observation'] = observation
+                observation = env.reset()
+            self.rewards[index] = reward
+            self.dones[index] = done
+            observations.append(observation)
+            infos.append(info)
+        self.total_steps += len(self.envs)
+        self.seconds += time.perf_counter() - start
+        return observations, self.rewards, self.dones, infos
+
+    @property
+    def steps_per_second(self):  # how many environment steps per second have been run so far
+        return self.total_steps / self.seconds if self.seconds > 0 else 0.0
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description='Step environments with random actions and report steps per second.')
+    parser.add_argument('--envs', type=int, default=16, help='number of environments (default: 16)')
+    parser.add_argument('--steps', type=int, default=1000, help='steps to take in every environment (default: 1000)')
+    parser.add_argument('--level', type=int, default=1, help='level to play (default: 1)')
+    args = parser.parse_args()
+
+    envs = VectorEnv(args.envs, args.level)
+    envs.reset()
+    rng = numpy.random.default_rng(0)
+    episodes = 0
+    total_reward = 0.0
+    for _ in range(args.steps):
+        observations, rewards, dones, infos = envs.step(rng.integers(0, actions, args.envs))
+        episodes += int(dones.sum())
+        total_reward += float(rewards.sum())
+    print(f'{envs.total_steps} steps in {envs.seconds:.2f}s ({envs.steps_per_second:.0f} steps per second), '
+          f'{episodes} episodes finished, total reward {total_reward:.1f}')
+    pygame.quit()
+
+
+if __name__ == '__main__':
+    main_cli()
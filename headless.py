@@ -0,0 +1,160 @@
+'''
+Headless Simulation
+-------------------
+Runs the game without a window, without sound and without a frame cap, reading the keys to press from a script
+instead of the keyboard. The simulation is stepped as fast as the CPU allows, which lets us measure how many frames
+per second the game logic can run at, and exercise the levels automatically (for example in CI).
+
+SDL's 'dummy' video and audio drivers are selected before pygame is imported, so no window is opened and no sound is
+played. The Game class from main.py is then stepped frame after frame with the scripted keys.
+
+Input scripts are plain text with one instruction per line:
+    <frames> <keys>
+where <keys> is a '+' separated list of left, right and space, or '-' for no keys. For example:
+    30 right         --> hold the right arrow key for 30 frames
+    1 right+space    --> hold right and jump for one frame
+    10 -             --> press nothing for 10 frames
+Blank lines and lines starting with '#' are ignored.
+
+Usage:
+    python headless.py [--script FILE] [--level N] [--frames N] [--render] [--no-prefetch]
+'''
+
+import argparse
+import os
+import time
+
+# select the dummy drivers before pygame (and the game) are imported, so no window or audio device is opened
+os.environ['SDL_VIDEODRIVER'] = 'dummy'
+os.environ['SDL_AUDIODRIVER'] = 'dummy'
+
+import pygame
+import main
+
+# the keys a script can press, by name
+key_names = {'left': pygame.K_LEFT, 'right': pygame.K_RIGHT, 'space': pygame.K_SPACE}
+
+# the script used when none is given: run right and jump every so often
+default_script = '20 right\n1 right+space\n'
+
+
+class KeyState():  # stands in for the result of pygame.key.get_pressed()
+    def __init__(self, pressed=()):  # constructor function with the keys being pressed
+        self.pressed = frozenset(pressed)  # the set of pygame key codes being pressed
+
+    def __getitem__(self, key):  # key_state[pygame.K_...] is True if that key is being pressed
+        return key in self.pressed
+
+
+def parse_script(text):  # turn the text of an input script into a list of (frames, KeyState) instructions
+    script = []
+    for number, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if line == '' or line.startswith('#'):  # skip blank lines and comments
+            continue
+        parts = line.split()
+        if len(parts) != 2:
+            raise ValueError(f'line {number}: expected "<frames> <keys>", got {line!r}')
+        frames = int(parts[0])
+        pressed = []
+        if parts[1] != '-':
+            for name in parts[1].split('+'):
+                if name not in key_names:
+                    raise ValueError(f'line {number}: unknown key {name!r}')
+                pressed.append(key_names[name])
+        script.append((frames, KeyState(pressed)))
+    return script
+
+
+def load_script(filename):  # read and parse an input script file
+    with open(filename) as script_file:
+        return parse_script(script_file.read())
+
+
+def script_keys(script, loop=False):  # yield the KeyState for every frame of a script (forever if loop is True)
+    while True:
+        for frames, key in script:
+            for _ in range(frames):
+                yield key
+        if not loop:
+            return
+
+
+def render(game):  # draw one frame of the game to the (dummy) screen, like the main game loop does
+    game.draw_static()
+    game.draw()
+    main.render_queue.submit(main.screen)
+
+
+def run(script, level=1, max_frames=None, draw=False, restart_on_death=True, prefetch=True):
+    '''
+    Simulate the game from the start of a level with the scripted keys, as fast as possible.
+    The script is repeated until max_frames frames have been simulated (or played once if max_frames is None).
+    The simulation stops early when every level is finished, or when the player dies and restart_on_death is False
+    (otherwise the level is restarted straight away, just like clicking the restart button).
+    prefetch builds the next level in the background, like the game does (turn it off to compare transition times).
+    Returns a dictionary with the results, the number of simulated frames per second and the level transition times.
+    '''
+    game = main.Game(level, prefetch)  # a fresh game starting at the given level
+    frames = 0  # number of frames simulated
+    deaths = 0  # number of times the player died
+
+    start = time.perf_counter()
+    for key in script_keys(script, loop=max_frames is not None):
+        if max_frames is not None and frames >= max_frames:
+            break
+        game.update(key)  # run one frame of the game
+        if draw:
+            render(game)
+        frames += 1
+
+        if game.game_over == -1:  # the player died
+            deaths += 1
+            if not restart_on_death:
+                break
+            game.restart()  # restart the level, like clicking the restart button
+        elif game.game_over == 1:  # every level has been finished
+            break
+    seconds = time.perf_counter() - start
+    transitions = game.transition_times  # how long every level switch or restart took
+
+    return {
+        'frames': frames,
+        'seconds': seconds,
+        'fps': frames / seconds if seconds > 0 else 0.0,
+        'start_level': level,
+        'level': game.level,
+        'score': game.score,
+        'deaths': deaths,
+        'game_over': game.game_over,
+        'player': (game.player.rect.x, game.player.rect.y),
+        'transitions': len(transitions),
+        'transition_ms_mean': sum(transitions) / len(transitions) * 1000 if transitions else 0.0,
+        'transition_ms_max': max(transitions, default=0.0) * 1000,
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description='Run the game without a window as fast as possible.')
+    parser.add_argument('--script', help='input script to play (default: run right and jump)')
+    parser.add_argument('--level', type=int, default=1, help='level to start on (default: 1)')
+    parser.add_argument('--frames', type=int, help='number of frames to simulate, repeating the script as needed')
+    parser.add_argument('--render', action='store_true', help='also draw every frame to an off-screen surface')
+    parser.add_argument('--no-prefetch', action='store_true', help="don't build the next level in the background")
+    args = parser.parse_args()
+
+    script = load_script(args.script) if args.script else parse_script(default_script)
+    if args.frames is None and not args.script:  # the default script is short, so give it something to do
+        args.frames = 10000
+    result = run(script, args.level, args.frames, args.render, prefetch=not args.no_prefetch)
+
+    print(f'simulated {result["frames"]} frames in {result["seconds"]:.3f}s ({result["fps"]:.0f} frames per second)')
+    print(f'level {result["start_level"]} -> {result["level"]}, score {result["score"]}, deaths {result["deaths"]}, '
+          f'game_over {result["game_over"]}, player at {result["player"]}')
+    print(f'level transitions: {result["transitions"]}, average {result["transition_ms_mean"]:.2f}ms, '
+          f'slowest {result["transition_ms_max"]:.2f}ms')
+    pygame.quit()
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,43 @@
+'''
+Text Cache
+----------
+draw_text() used to call font.render() every frame for the score, and for the GAME OVER and YOU WIN banners for as
+long as they were on the screen, even though the text almost never changes from one frame to the next. Rendering text
+means rasterizing every glyph again, which is one of the slowest things a frame did.
+
+The TextCache keeps the surfaces it has rendered, keyed by (font, text, colour), so text is only rendered the first
+time it is needed (e.g. when the score changes) and every frame after that reuses the same surface. The cache only
+keeps the `capacity` most recently used surfaces, so a score that keeps going up can't fill the memory with surfaces
+that will never be drawn again.
+
+Like the surfaces of the asset cache, the cached surfaces are shared and must only ever be blitted, never drawn on.
+'''
+
+from collections import OrderedDict
+
+
+class TextCache():
+    def __init__(self, capacity=64):  # constructor function with the most surfaces to keep
+        self.capacity = capacity  # how many rendered surfaces to keep
+        self.surfaces = OrderedDict()  # (font, text, colour, antialias) --> surface, least recently used first
+        self.hits = 0  # number of texts that were already rendered
+        self.renders = 0  # number of texts that had to be rendered
+
+    def render(self, font, text, colour, antialias=True):  # the rendered surface of a text (like font.render())
+        key = (font, text, tuple(colour), antialias)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)  # the text was just used
+            return surface
+        self.renders += 1
+        surface = self.surfaces[key] = font.render(text, antialias, colour)
+        if len(self.surfaces) > self.capacity:  # forget the text that hasn't been drawn for the longest
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):  # forget every rendered surface
+        self.surfaces.clear()
+
+    def stats(self):  # summary of how well the cache is doing
+        return {'entries': len(self.surfaces), 'hits': self.hits, 'renders': self.renders}
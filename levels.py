@@ -0,0 +1,194 @@
+'''
+Level Files
+-----------
+The levels used to be stored as pickled Python lists of lists (level1_data ... level10_data). Pickle files are slow to
+read for big maps, turn every cell into a Python object, and can run any code when they are loaded. This module stores
+levels in a small binary format instead, and reads them by memory-mapping the file, so the cells are read straight from
+the file (by the operating system, only when they are used) without being parsed.
+
+File format (all numbers little-endian):
+    offset 0   4 bytes  magic number b'PLVL'
+    offset 4   uint16   format version (currently 1)
+    offset 6   uint8    bytes per cell (currently always 1, so tile numbers go from 0 to 255)
+    offset 7   uint8    reserved (0)
+    offset 8   uint32   width (number of columns)
+    offset 12  uint32   height (number of rows)
+    offset 16  width * height cells, one byte each, row by row from the top left (the same order as the old lists)
+
+load_level() returns a LevelData that the World class can use just like the old list of lists (iterating over it gives
+the rows, and iterating over a row gives the tile numbers as ints). LevelData.array() gives the same cells as a NumPy
+array without copying them (NumPy is only needed for that).
+
+To convert the old pickle files (this is lossless, and every converted file is read back and checked):
+    python levels.py                   --> converts every levelN_data file in the current folder to levelN.lvl
+    python levels.py level3_data ...   --> converts the given files
+
+LevelWatcher checks whether any level file has changed since it last looked (by its modification time and size), for
+reloading levels while the game is running (python main.py --hot-reload). When a levelN_data pickle file changes and
+the level also has a levelN.lvl file (which the game reads instead), the pickle file is converted to levelN.lvl first,
+so editing either file works. A level file that is memory-mapped must not be rewritten while it is mapped (editors
+truncate the file when saving it, and reading the truncated part of the map then kills the game with a bus error), so
+with --hot-reload every world is built from own_level_data(), a copy of the cells, and the map is closed.
+'''
+
+import glob
+import mmap
+import os
+import pickle
+import re
+import struct
+import sys
+
+magic = b'PLVL'  # the first 4 bytes of every level file
+version = 1  # the version of the format written by save_level()
+header = struct.Struct('<4sHBBII')  # magic, version, bytes per cell, reserved, width, height
+
+
+def level_filename(level):  # the binary file of a level number
+    return f'level{level}.lvl'
+
+
+class LevelData():
+    def __init__(self, buffer, width, height, offset=header.size):  # a grid of cells stored in a bytes-like buffer
+        self.buffer = buffer  # the buffer holding the file (a memory map, or bytes)
+        self.width = width  # number of columns
+        self.height = height  # number of rows
+        self.offset = offset  # where the cells start in the buffer
+        self.cells = memoryview(buffer)[offset:offset + width * height]  # the cells, without copying them
+
+    def __len__(self):  # number of rows
+        return self.height
+
+    def __getitem__(self, row):  # one row of cells (iterating over it gives the tile numbers as ints)
+        if row < 0:
+            row += self.height
+        if not 0 <= row < self.height:
+            raise IndexError('level row out of range')
+        return self.cells[row * self.width:(row + 1) * self.width]
+
+    def __iter__(self):  # iterate over the rows, top to bottom
+        for row in range(self.height):
+            yield self.cells[row * self.width:(row + 1) * self.width]
+
+    def tolist(self):  # the level as the old list of lists
+        return [list(row) for row in self]
+
+    def array(self):  # the cells as a (height, width) NumPy array of uint8, sharing memory with the file
+        import numpy
+        return numpy.frombuffer(self.buffer, dtype=numpy.uint8, count=self.width * self.height,
+                                offset=self.offset).reshape(self.height, self.width)
+
+    def close(self):  # stop using the buffer (closes the memory map; the LevelData can't be used after this)
+        self.cells.release()
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+
+
+def load_level(filename):  # memory-map a level file and return its LevelData
+    with open(filename, 'rb') as level_file:
+        if os.fstat(level_file.fileno()).st_size < header.size:
+            raise ValueError(f'{filename}: too short to be a level file')
+        buffer = mmap.mmap(level_file.fileno(), 0, access=mmap.ACCESS_READ)  # the map stays valid after closing
+
+    file_magic, file_version, cell_bytes, _, width, height = header.unpack_from(buffer)
+    if file_magic != magic:
+        raise ValueError(f'{filename}: not a level file')
+    if file_version != version:
+        raise ValueError(f'{filename}: unsupported level format version {file_version}')
+    if cell_bytes != 1:
+        raise ValueError(f'{filename}: unsupported cell size {cell_bytes}')
+    if len(buffer) < header.size + width * height:
+        raise ValueError(f'{filename}: truncated ({len(buffer)} bytes for a {width}x{height} level)')
+    return LevelData(buffer, width, height)
+
+
+def own_level_data(data):
+    '''
+    A level's data that doesn't share any memory with the level file: a LevelData that is memory-mapped is copied and
+    its map is closed (so it must not be used after this). Other data (the old lists of lists, or a LevelData that
+    already holds its own copy) is returned as it is.
+    '''
+    if not isinstance(data, LevelData) or not isinstance(data.buffer, mmap.mmap):
+        return data
+    owned = LevelData(bytes(data.cells), data.width, data.height, offset=0)
+    data.close()
+    return owned
+
+
+def encode_level(data):  # turn a list of rows of tile numbers into the bytes of a level file
+    rows = [list(row) for row in data]
+    height = len(rows)
+    width = len(rows[0]) if rows else 0
+    for number, row in enumerate(rows):
+        if len(row) != width:
+            raise ValueError(f'row {number} has {len(row)} cells, expected {width}')
+        for tile in row:
+            if not 0 <= tile <= 255:
+                raise ValueError(f'row {number}: tile {tile} does not fit in one byte')
+    return header.pack(magic, version, 1, 0, width, height) + bytes(tile for row in rows for tile in row)
+
+
+def save_level(filename, data):  # write a level file (to a temporary file first, so a crash can't leave half a level)
+    contents = encode_level(data)
+    temporary = filename + '.tmp'
+    with open(temporary, 'wb') as level_file:
+        level_file.write(contents)
+    os.replace(temporary, filename)
+
+
+def convert(pickle_filename, level_filename):  # convert one of our own pickle level files (only use on trusted files)
+    with open(pickle_filename, 'rb') as pickle_in:
+        data = pickle.load(pickle_in)
+    save_level(level_filename, data)
+    if load_level(level_filename).tolist() != [list(row) for row in data]:  # check nothing was lost
+        raise ValueError(f'{level_filename} does not match {pickle_filename}')
+    return len(data[0]) if data else 0, len(data)
+
+
+def file_stamp(filename):  # the modification time and size of a file (None if there is no such file)
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class LevelWatcher():
+    def __init__(self, levels):  # constructor function with the level numbers to watch
+        self.stamps = {level: self.stamp(level) for level in levels}  # the files' stamps when we last looked
+
+    def stamp(self, level):  # the stamps of both files of a level
+        return file_stamp(level_filename(level)), file_stamp(f'level{level}_data')
+
+    def changed(self):  # the levels whose files changed since the last call (and converts edited pickle files)
+        levels = []
+        for level, (binary, pickled) in self.stamps.items():
+            stamp = self.stamp(level)
+            if stamp == (binary, pickled):
+                continue
+            if stamp[1] != pickled and stamp[1] is not None and stamp[0] is not None:
+                try:  # the pickle file was edited: convert it, so the game (which reads levelN.lvl) sees the change
+                    convert(f'level{level}_data', level_filename(level))
+                except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+                    continue  # (probably still being written: try again next time)
+                stamp = self.stamp(level)
+            self.stamps[level] = stamp
+            levels.append(level)
+        return levels
+
+
+def main_cli(filenames):
+    if not filenames:  # default to every pickled level in the current folder
+        filenames = sorted(glob.glob('level*_data'), key=lambda name: int(re.sub(r'\D', '', name) or 0))
+    for filename in filenames:
+        match = re.fullmatch(r'level(\d+)_data', os.path.basename(filename))
+        if match is None:
+            print(f'skipping {filename}: not a levelN_data file')
+            continue
+        output = os.path.join(os.path.dirname(filename), level_filename(match.group(1)))
+        width, height = convert(filename, output)
+        print(f'{filename} -> {output} ({width}x{height})')
+
+
+if __name__ == '__main__':
+    main_cli(sys.argv[1:])
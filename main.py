@@ -7,17 +7,57 @@ If we didn't include this line, everything we wanted to access a pygame method w
 
 Pickle is a library that allows one to convert objects such as lists into character streams. This allows us to store our
 levels in files such as level1_data, rather than having 10 large lists in our main.py file as it would be very messy.
+The levels have since been converted to binary level files (see levels.py), and pickle is only used as a fallback.
+
+argparse --> reads the launch options given on the command line (such as --fps).
+time --> imported first, to time how long the game takes to start (see --startup-stats).
+time and concurrent.futures --> used to build the next level on a background thread and time level transitions.
 
 The line 'from os import path' imports a library that allows us to verify that a level actually exists as a file before
 pickle calls on it to use in the game. This is important because if we call a nonexistant level, there will be no data
 for that level causing the game to crash.
+
+resources --> our own module (resources.py) with the shared asset cache, so every image is only read from the disk once,
+and the asset loader that loads the game's assets in the background while the main menu is showing.
+render --> our own module (render.py) with the static layer that bakes a level's backgrounds and tiles into one surface,
+and the render queue that draws a whole frame with one batched blit.
+audio --> our own module (audio.py) that loads the music in the background and plays the music and sound effects.
+recording --> our own module (recording.py) that records the keys pressed during a game, to replay it (replay.py).
+profiler --> our own module (profiler.py) that times every phase of a frame (press F3 in the game to see the timings).
+tilemap --> our own module (tilemap.py) that builds, draws and collides a level's tiles a chunk at a time, so levels can
+be much bigger than the screen.
+camera --> our own module (camera.py) with the camera that scrolls those bigger levels with the player.
+numpy --> used to find the sprites in a level's data quickly.
+levels --> our own module (levels.py) that reads the binary level files (levelN.lvl), which replace the pickle files.
+entities --> our own module (entities.py) that moves every slime and platform at once using NumPy arrays.
+snapshots --> our own module (snapshots.py) that packs the state of a game into bytes, for the save and load buttons and
+for rewinding (hold backspace).
 '''
 
+import time
+startup_start = time.perf_counter()  # when the game started loading (for --startup-stats)
+
 import pygame
 from pygame.locals import *
 from pygame import mixer
+import numpy
 import pickle
+import zlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 from os import path
+from resources import asset_cache, AssetLoader
+from assetpack import load_pack, pack_filename
+from hud import TextCache
+from render import StaticLayer, RenderQueue, RenderScale, render_scales
+from profiler import FrameProfiler, LevelProfiles
+from audio import AudioManager
+from recording import Recorder, restart_level, restart_game
+from tilemap import TileMap, SpriteIndex
+from camera import Camera
+from levels import load_level, level_filename, own_level_data, LevelWatcher
+from entities import PatrolStore, PatrolSprite, KinematicBodies, enemy_kind, platform_kind, ice_platform_kind
+from snapshots import Snapshot, take_snapshot, check_snapshot, restore_snapshot, RewindBuffer, quicksave_filename
 
 '''
 Loading music settings in pygame
@@ -28,35 +68,85 @@ We use the default values for the pre_init() method as they run perfectly for th
 Finally, run pygame.init() which initializes all pygame modules, many of which we'll be using later on in the program! 
 '''
 
-mixer.init()
+try:
+    mixer.init()
+except pygame.error:  # no audio device: the game runs without sound (the audio manager does nothing)
+    pass
 pygame.mixer.pre_init(44100, -16, 2, 512)
 pygame.init()
 
 # Setting up Frames-Per-Second limiter for the game
 clock = pygame.time.Clock()  # define variable clock to equal pygame's Clock() module to let our program recognize time.
-frame_rate = 60  # define variable frame_rate to equal 60 as this is a good frame rate for most games.
+frame_rate = 60  # define variable frame_rate to equal 60 as this is a good frame rate for most games (0 = no limit).
+
+'''
+Fixed Timestep
+--------------
+All of the movement in the game is counted in steps: gravity adds 1 to the player's velocity every step, the player
+walks 5 pixels every step, the enemies and platforms turn around every 50 steps. If one step was run per frame, the
+whole game would slow down whenever the game loop couldn't keep up with 60 frames per second, and would speed up on a
+faster display. Instead, the game is always simulated at sim_rate (60) steps per second, however fast the screen is
+redrawn:
+    the time since the last frame is added to an 'accumulator'
+    one step is run for every whole time step (1/60th of a second) in the accumulator
+    no more than max_steps steps are run per frame, so a very slow frame can't make the game fall further and further
+    behind (any time over that limit is dropped and the game briefly slows down instead)
+The time left in the accumulator, as a fraction of a step (alpha), can be used to draw the moving sprites part of the
+way between their last two positions (interpolation), which keeps movement smooth when frames and steps don't line up.
+'''
+sim_rate = 60  # number of simulation steps per second (the speed all of the movement in the game was designed for)
+max_steps = 5  # the most simulation steps that are run to catch up in one frame
+
+
+class FixedTimestep():
+    def __init__(self, rate, max_steps):  # constructor function with the steps per second and the catch-up limit
+        self.time_step = 1 / rate  # the length of one step in seconds
+        self.max_steps = max_steps  # the most steps to run in one frame
+        self.accumulator = 0.0  # time (in seconds) that has passed but has not been simulated yet
+        self.dropped = 0.0  # time (in seconds) that was skipped because the game couldn't keep up
+
+    def advance(self, elapsed):  # add the seconds since the last frame, and return how many steps to run now
+        self.accumulator += elapsed
+        steps = 0
+        while self.accumulator >= self.time_step and steps < self.max_steps:
+            self.accumulator -= self.time_step
+            steps += 1
+        if self.accumulator >= self.time_step:  # still behind after max_steps: drop the whole steps we can't run
+            self.dropped += self.accumulator - self.accumulator % self.time_step
+            self.accumulator %= self.time_step
+        return steps
+
+    def alpha(self):  # how far (0 to 1) we are between the last step and the next one
+        return self.accumulator / self.time_step
+
+    def reset(self):  # forget any time that has built up (e.g. while the main menu was showing)
+        self.accumulator = 0.0
 
 # Setting up screen
 screen_width = 1000  # set screen width to equal 1000 pixels
 screen_height = 1000  # set screen height to equal 1000 pixels
 screen = pygame.display.set_mode((screen_width, screen_height))  # create the display window and stores it in var screen
 pygame.display.set_caption('Platformer')  # sets a title for our game window
+render_scale = None  # draws the game on a smaller display that SDL scales up (with --render-scale, see render.py)
 
 '''
 Function to load images + convert them to the same pixel format as the screen. The images are loaded with .load()
 And converted to the screen format by .convert_alpha(). This prevents lag as images are pre-loaded and converted.
 This is very helpful as we load 20+ images in this game, and typing out 'pygame.image.load(imgname).convert_alpha()'
 everytime is inefficient coding, so this function helps us modularize our code saving a lot of time!
+The images are loaded through the asset cache, so asking for the same image twice returns the already-loaded surface.
 '''
 
 
 def loadify(imgname):
-    return pygame.image.load(imgname).convert_alpha()
+    return asset_cache.get(imgname)
 
 
 # load fonts
-font_score = pygame.font.SysFont('Bauhaus 93', 30)  # store Bauhaus 93 font in size 30 in variable 'font_score'
-font = pygame.font.SysFont('Bauhaus 93', 70)  # store Bauhaus 93 font in size 70 in variable 'font_score'
+def load_fonts():  # (looking for a system font can take a while, so this runs in the background, see below)
+    font_score = pygame.font.SysFont('Bauhaus 93', 30)  # store Bauhaus 93 font in size 30 in variable 'font_score'
+    font = pygame.font.SysFont('Bauhaus 93', 70)  # store Bauhaus 93 font in size 70 in variable 'font_score'
+    return font_score, font
 
 # define global variables
 tile_size = 50  # define variable tile_size as 50
@@ -64,101 +154,116 @@ game_over = 0  # define variable game_over as 0
 main_menu = True  # define variable main_menu as True
 level = 1  # define variable level as 1
 max_levels = 10  # define variable max_levels as 10
+sprite_tiles = [3, 4, 5, 6, 7, 8, 11, 12, 13, 18, 19, 20, 21, 22]  # the tile numbers that are sprites, not tiles
 score = 0  # # define variable score as 0
 display = 'original'  # define variable display as 'original'
-current_music = 'forest'  # define variable current_music as 'forest'
 
 # define colors for efficiency
 blue = (0, 0, 255)  # define variable blue as the color's RGB values
 red = (255, 0, 0)  # define variable red as the color's RGB values
 black = (0, 0, 0)  # define variable black as the color's RGB values
 
-# load images
-forest_img = loadify('images/forest3.png')  # pre-load and convert the forest levels' background image
-bg_img = loadify('Assets/Base_pack/bg.png')  # pre-load and convert the default sky background image
-restart_img = loadify('images/restart_btn.png')  # pre-load and convert the restart button image
+# load the asset pack, if it has been built: every image below is then already in the asset cache (see assetpack.py)
+if __name__ == '__main__' and path.exists(pack_filename):
+    asset_cache.preload(load_pack(pack_filename))
+
+'''
+Loading at Startup
+------------------
+The main menu only needs the sky and forest backgrounds and the start and exit buttons, so those are loaded straight
+away and the menu is shown as soon as they are ready. Everything else (the fonts, the other backgrounds and buttons,
+the sound effects, and the first level with the player, see the main game loop) is loaded by the asset loader on a
+pool of threads while the menu is showing. Clicking start calls finish_loading(), which only waits for whatever hasn't
+finished loading yet (usually nothing) and puts it in its global variable.
+'''
+# load the images the main menu needs (the backgrounds are scaled to fit the screen)
+screen_size = (screen_width, screen_height)
+forest_img = asset_cache.get('images/forest3.png', screen_size)  # the forest levels' background image
+bg_img = asset_cache.get('Assets/Base_pack/bg.png', screen_size)  # the default sky background image
 start_img = loadify('images/start_btn.png')  # pre-load and convert the start button image
 exit_img = loadify('images/exit_btn.png')  # pre-load and convert the exit button image
-arctic_img = loadify('images/arctic2.png')  # pre-load and convert the arctic levels' background image
-cake_img = loadify('images/cake-bg.jpg')  # pre-load and convert the cake levels' background image
-final_img = loadify('images/final_background.png')  # pre-load and convert the final level's background image
+
+# load everything else in the background
+asset_loader = AssetLoader()
+asset_loader.load('fonts', load_fonts)
+asset_loader.load('restart_img', loadify, 'images/restart_btn.png')  # the restart button image
+asset_loader.load('save_img', loadify, 'images/save_btn.png')  # the save button image
+asset_loader.load('load_img', loadify, 'images/load_btn.png')  # the load button image
+asset_loader.load('arctic_img', asset_cache.get, 'images/arctic2.png', screen_size)  # the arctic levels' background
+asset_loader.load('cake_img', asset_cache.get, 'images/cake-bg.jpg', screen_size)  # the cake levels' background
+asset_loader.load('final_img', asset_cache.get, 'images/final_background.png', screen_size)  # the final background
+asset_loader.load('display_coin', asset_cache.get, 'images/coin.png', (tile_size // 2, tile_size // 2))  # score coin
 
 
 # load sounds
+audio = AudioManager()  # plays the music and the sound effects (see audio.py)
+audio.add_track('forest', 'sounds/Forest_Music.wav', 1)  # the forest music, at max volume (1)
+audio.add_track('arctic', 'sounds/Arctic_Music.mp3', 1)  # the arctic music, at max volume (1)
+audio.add_track('cake', 'sounds/cake_sound.mp3', 0.8)  # the cake music, at 80% volume (0.8)
+audio.add_track('final', 'sounds/Final_Music.mp3', 1)  # the final level's music, at max volume (1)
+
+
+def level_music(level):  # the music track of a level (None if the level keeps the music that is already playing)
+    if level < 5:  # if the level is less than 5
+        return 'forest'
+    elif 4 < level < 8:  # if the level is between 4-8
+        return 'arctic'
+    elif 7 < level < 9:  # if the level is between 7-9
+        return 'cake'
+    elif level == 10:  # if the level is the final level
+        return 'final'
+    return None
+
+
+def change_music(level):  # define function change_music() which takes in the current level
+    '''
+    Crossfade to the level's music. The track is decoded in the background, so this never stalls the game: if the
+    track isn't ready yet, the music that is playing carries on until it is. The next level's track is decoded ahead of
+    time, so it is usually ready by the time it is needed.
+    '''
+    music = level_music(level)
+    if music is not None:
+        audio.play_music(music)
+    next_music = level_music(level + 1)
+    if next_music is not None:
+        audio.preload(next_music)
+
 
-def change_music():  # define function change_music()
-    global current_music  # make the current_music variable used in this function a global variable
-
-    if level < 5 and current_music != 'forest':  # if the level is less than 5 and the music is not already 'forest':
-        pygame.mixer.music.load('sounds/Forest_Music.wav')  # load the forest music file
-        pygame.mixer.music.set_volume(1)  # set the forest music to max volume (1)
-        pygame.mixer.music.play(-1, 0.0, 5000)  # play the forest music infinitely with a 5000 millisecond fade-in
-        current_music = 'forest'  # set variable 'current_music' to forest
-
-    elif 4 < level < 8 and current_music != 'arctic':  # if the level between 4-8 and the music is not already 'arctic':
-        pygame.mixer.music.load('sounds/Arctic_Music.mp3')  # load the forest music file
-        pygame.mixer.music.set_volume(1)  # set the forest music to max volume (1)
-        pygame.mixer.music.play(-1, 0.0, 5000)  # play the forest music infinitely with a 5000 millisecond fade-in
-        current_music = 'arctic'  # set variable 'current_music' to arctic
-
-    elif 7 < level < 9 and current_music != 'cake':  # if the level between 7-9 and the music is not already 'arctic':
-        pygame.mixer.music.load('sounds/cake_sound.mp3')
-        pygame.mixer.music.set_volume(0.8)  # set the forest music to 80% volume (0.8)
-        pygame.mixer.music.play(-1, 0.0, 5000)  # play the forest music infinitely with a 5000 millisecond fade-in
-        current_music = 'cake'  # set variable 'current_music' to cake
-
-    elif level == 10 and current_music != 'final':
-        pygame.mixer.music.load('sounds/Final_Music.mp3')
-        pygame.mixer.music.set_volume(1)  # set the forest music to max volume (1)
-        pygame.mixer.music.play(-1, 0.0, 5000)  # play the forest music infinitely with a 5000 millisecond fade-in
-        current_music = 'final'  # set variable 'current_music' to final
-
-
-# Set default music (in start menu)
-pygame.mixer.music.load('sounds/Forest_Music.wav')  # load the forest music file
-pygame.mixer.music.set_volume(1)  # set the forest music to max volume (1)
-pygame.mixer.music.play(-1, 0.0, 5000)  # play the forest music infinitely with a 5000 millisecond fade-in
-
-coin_fx = pygame.mixer.Sound('sounds/coin.wav')  # load the coin sound effect file
-coin_fx.set_volume(0.5)  # set the volume to half (0.5)
-jump_fx = pygame.mixer.Sound('sounds/jump.wav')  # load the jump sound effect file
-jump_fx.set_volume(0.5)  # set the volume to half (0.5)
-game_over_fx = pygame.mixer.Sound('sounds/game_over.wav')  # load the game over sound effect file
-game_over_fx.set_volume(0.5)  # set the volume to half (0.5)
-
-# Scale background images to fit the screen
-forest_img = pygame.transform.scale(forest_img, (screen_width, screen_height))  # scale forest background image
-arctic_img = pygame.transform.scale(arctic_img, (screen_width, screen_height))  # scale arctic background image
-bg_img = pygame.transform.scale(bg_img, (screen_width, screen_height))  # scale sky background image
-cake_img = pygame.transform.scale(cake_img, (screen_width, screen_height))  # scale cake background image
-final_img = pygame.transform.scale(final_img, (screen_width, screen_height))  # scale final background image
+# load the sound effects at half volume (0.5), with how many copies of each can play at once
+def load_effects():  # (in the background)
+    audio.add_effect('coin', 'sounds/coin.wav', 0.5, limit=3)  # coins can be collected quickly one after another
+    audio.add_effect('jump', 'sounds/jump.wav', 0.5, limit=1)
+    audio.add_effect('game_over', 'sounds/game_over.wav', 0.5, limit=1)
+
+
+asset_loader.load('effects', load_effects)
+
+
+# create the queue every draw of a frame goes through (it draws the whole frame at once, see render.py)
+render_queue = RenderQueue()
+
+
+# create the cache of rendered text (the score and the messages are only rendered again when they change)
+text_cache = TextCache()
 
 
 # Create function to draw text on screen
-def draw_text(text, font, text_col, x, y):  # take in multiple parameters for the text
-    img = font.render(text, True, text_col)  # render the font as an image based on the parameters given
-    screen.blit(img, (x, y))  # blit the image onto the screen at the given coordinate parameters
-
-
-# resetting level function
-def reset_level(level):  # take in the current level as a parameter
-    global current_music  # set current_music as a global variable when used inside this function
-    player.reset(100, screen_height - 130)  # reset the player by calling the Player() class' reset() function
-    blob_group.empty()  # delete all instances of enemy slimes
-    lava_group.empty()  # delete all instances of lava
-    exit_group.empty()  # delete all instances of exit gates
-    platform_group.empty()  # delete all instances of platforms
-    ice_platform_group.empty()  # delete all instances of ice platforms
-    coin_group.empty()  # delete all instances of coins
-    water_group.empty()  # delete all instances of water
+def draw_text(text, font, text_col, x, y, layer='message'):  # take in multiple parameters for the text
+    img = text_cache.render(font, text, text_col)  # the text as an image (only rendered the first time it is drawn)
+    render_queue.add(layer, img, (x, y))  # queue the image to be drawn at the given coordinate parameters
 
+
+# loading level data function
+def load_level_data(level):  # take in the level to load as a parameter
     # loading data for the levels / world
-    if path.exists(f'level{level}_data'):  # verify if the data file for the level exists
+    if path.exists(level_filename(level)):  # use the binary level file (levelN.lvl) if the level has one
+        world_data = load_level(level_filename(level))  # memory-map the level file, which World() can read directly
+    elif path.exists(f'level{level}_data'):  # otherwise fall back to the old pickle data file, if it exists
         pickle_in = open(f'level{level}_data', 'rb')  # process the data file | 'rb' stands for read binary
         world_data = pickle.load(pickle_in)  # save the processed data in variable 'world_data'
-    world = World(world_data)  # process world_data through class World() and store in variable 'world'.
+        pickle_in.close()  # close the data file now that it has been read
 
-    return world  # return the world_data inside variable 'world'
+    return world_data  # return the level's data so it can be processed by class World()
 
 
 # class for button
@@ -176,6 +281,8 @@ class Button():
 
         # getting position of cursor
         pos = pygame.mouse.get_pos()
+        if render_scale is not None:  # (the mouse is on the smaller display: put it back in window coordinates)
+            pos = render_scale.window_position(pos)
 
         # check if mouse is over the button and if it is clicked
         if self.rect.collidepoint(pos):
@@ -187,7 +294,7 @@ class Button():
         if pygame.mouse.get_pressed()[0] == 0:
             self.clicked = False
 
-        screen.blit(self.image, self.rect)  # drawing the button
+        render_queue.add('ui', self.image, self.rect)  # drawing the button
 
         return action  # return the action (clicked or not)
 
@@ -197,18 +304,21 @@ class Player():
     def __init__(self, x, y):  # constructor function with coordinate parameters (x, y)
         self.reset(x, y)  # run the reset function with the coordinate parameters (x, y)
 
-    def update(self, game_over):  # update function with 'game_over' parameter (global variable)
+    def update(self, game_over, world, key):  # update function with the game_over state, the world and the keys pressed
 
         # defining delta values
         dx = 0  # delta x = 0
         dy = 0  # delta y = 0
         walk_cooldown = 3  # walk animation speed limiter
         collision_threshold = 20  # collision predictor for platform movement
+        self.previous_position = self.rect.topleft  # remember where the player was before moving
 
         if game_over == 0:  # when the game is NOT over
 
-            # get key inputs
-            key = pygame.key.get_pressed()
+            '''
+            The keys being pressed are passed in as 'key' (pygame.key.get_pressed() in the main game loop, or a
+            scripted key state in the headless simulation), and can be checked with key[pygame.K_...] either way.
+            '''
 
             '''
             Player Jumping Movement: 
@@ -217,7 +327,7 @@ class Player():
             make them jump! If they are not pressing the spacebar, then set their 'jumped' status to False.
             '''
             if key[pygame.K_SPACE] and self.jumped == False and self.in_air == False:
-                jump_fx.play()
+                audio.play_effect('jump')
                 self.vel_y = -15
                 self.jumped = True
 
@@ -285,55 +395,47 @@ class Player():
             # checking collisions
 
             '''
-            iterate through all the tiles, and access their collision rectangles (tile[1]) and see if there would be
-            a collision with the player and the tile on either the x or y axis at the player's current velocity and 
-            projected movement.
+            Look up the tiles around the player in the world's tile grid, and access their collision rectangles to see
+            if there would be a collision with the player and the tile on either the x or y axis at the player's
+            current velocity and projected movement. Only the cells the player's projected position overlaps are
+            checked, so this costs the same no matter how many tiles the level has (see TileGrid.collide_step).
             '''
-            for tile in world.tile_list:
-
-                # check for x-axis collisions
-                if tile[1].colliderect(self.rect.x + dx, self.rect.y, self.width, self.height):
-                    dx = 0
-
-                # check for y-axis collisions
-                if tile[1].colliderect(self.rect.x, self.rect.y + dy, self.width, self.height):
-
-                    '''
-                    If there is a vertical collision, determine if it is from above or below and restrict player
-                    movement so that the player stops at the collision point.
-                    '''
-                    # check if the player is jumping or resting on a block
-                    if self.vel_y < 0:
-                        dy = tile[1].bottom - self.rect.top
-                        self.vel_y = 0
-
-                    # check if the player is falling
-                    elif self.vel_y >= 0:
-                        dy = tile[1].top - self.rect.bottom
-                        self.vel_y = 0
-                        self.in_air = False
+            player_rect = (self.rect.x, self.rect.y, self.width, self.height)  # where the player is now
+            dx, dy, self.vel_y, landed = world.tile_grid.collide_step(player_rect, dx, dy, self.vel_y)
+            if landed:  # the player came down onto a tile
+                self.in_air = False
 
-            # if there is a collision between the player and an enemy slime:
-            if pygame.sprite.spritecollide(self, blob_group, False):
+            # if there is a collision between the player and an enemy slime (checked against every slime at once):
+            if world.patrols.colliding(self.rect, enemy_kind):
                 game_over = -1  # set var game_over to -1 as the player dies and loses temporarily
-                game_over_fx.play()  # play the game_over sound effect
+                audio.play_effect('game_over')  # play the game_over sound effect
 
+            # lava, water and the exit gates are looked up around the player (see World.sprites_in), not all checked
             # if there is a collision between the player and lava:
-            if pygame.sprite.spritecollide(self, lava_group, False):
+            if world.sprites_in(world.lava_group, self.rect):
                 game_over = -1  # set var game_over to -1 as the player dies and loses temporarily
-                game_over_fx.play()  # play the game_over sound effect
+                audio.play_effect('game_over')  # play the game_over sound effect
 
             # if there is a collision between the player and water:
-            if pygame.sprite.spritecollide(self, water_group, False):
+            if world.sprites_in(world.water_group, self.rect):
                 game_over = -1  # set var game_over to -1 as the player dies and loses temporarily
-                game_over_fx.play()  # play the game_over sound effect
+                audio.play_effect('game_over')  # play the game_over sound effect
 
             # checking for collisions with exit door (next level)
-            if pygame.sprite.spritecollide(self, exit_group, False):
+            if world.sprites_in(world.exit_group, self.rect):
                 game_over = 1  # set var game_over to 1 meaning the player 'wins' that level
 
-            # checking for collisions with platforms
-            for platform in platform_group:
+            '''
+            Only the platforms near the player can collide with it, so they are looked up in an area a few tiles bigger
+            than the player (much further than the player or a platform can move in one step). Every kind of platform
+            is a kinematic body (see entities.py): they are found with sweep and prune, platforms first and then ice
+            platforms, in the order they were added, and collided with the same way. The rest of the level's platforms
+            would never collide anyway.
+            '''
+            nearby = self.rect.inflate(tile_size * 4, tile_size * 4)  # the area around the player to look in
+
+            # checking for collisions with platforms and ice-platforms
+            for platform in world.bodies.query(nearby):
                 # collision on the x-axis
                 if platform.rect.colliderect(self.rect.x + dx, self.rect.y, self.width, self.height):
                     dx = 0
@@ -342,12 +444,6 @@ class Player():
                 if platform.rect.colliderect(self.rect.x, self.rect.y + dy, self.width, self.height):
                     # collision if player is BELOW platform
                     '''
-                    (When player is BELOW platform) 
-                    Check if the players predicted position will overlap with the platforms predicted position, and if 
-                    it will then there will be a collision so stop player movement in that direction at the collision
-                    point. 
-                    
-                                    
                     (When player is BELOW platform) 
                     Check if the players predicted position will overlap with the platforms predicted position, and if 
                     it will then there will be a collision so stop player movement in that direction at the collision
@@ -369,67 +465,31 @@ class Player():
                     if platform.move_x != 0:  # if the platform is moving
                         self.rect.x += platform.move_direction  # add platform movement to player movement
 
-            # checking for collisions with ice-platforms
-            for ice_platform in ice_platform_group:
-                # collision on the x-axis
-                if ice_platform.rect.colliderect(self.rect.x + dx, self.rect.y, self.width, self.height):
-                    dx = 0
-
-                # collision on the y-axis
-                if ice_platform.rect.colliderect(self.rect.x, self.rect.y + dy, self.width, self.height):
-                    # collision if player is BELOW platform
-                    '''
-                    (When player is BELOW platform) 
-                    Check if the players predicted position will overlap with the platforms predicted position, and if 
-                    it will then there will be a collision so stop player movement in that direction at the collision
-                    point. 
-
-
-                    (When player is BELOW platform) 
-                    Check if the players predicted position will overlap with the platforms predicted position, and if 
-                    it will then there will be a collision so stop player movement in that direction at the collision
-                    point. 
-                    '''
-                    if abs((self.rect.top + dy) - ice_platform.rect.bottom) < collision_threshold:
-                        self.vel_y = 0
-                        dy = ice_platform.rect.bottom - self.rect.top + 1
-                        if ice_platform.rect.bottom > (tile_size + self.height):
-                            dy = 0
-
-                    # collision if player is ABOVE platform
-                    elif abs((self.rect.bottom + dy) - ice_platform.rect.top) < collision_threshold:
-                        dy = 0
-                        self.rect.bottom = ice_platform.rect.top - 1
-                        self.in_air = False
-
-                    # make player move with ice platform
-                    if ice_platform.move_x != 0:  # if the ice platform is moving
-                        self.rect.x += ice_platform.move_direction  # add ice platform movement to player movement
-
             # moving player
             self.rect.x += dx  # move the player's collision rectangle with the predicted delta x movement value
             self.rect.y += dy  # move the player's collision rectangle with the predicted delta y movement value
 
         elif game_over == -1:  # else if the game_over var is equal to -1 (aka player dead)
             self.image = self.dead_image  # replace the player image with the dead image file
-            draw_text('GAME OVER', font, red, (screen_width // 2) - 200, screen_height // 2)  # write GAME OVER screen
             if self.rect.y > 200:  # if the player is not 200 pixels off the ground
                 self.rect.y -= 5  # decrease their dead ghost's image position by 5 on the y-axis to make them float
 
-        screen.blit(self.image, self.rect)  # displaying player
-
         # return the game_over parameter's new value
         return game_over
 
+    def draw(self, alpha=None, offset=(0, 0)):  # draw function (alpha is the interpolation amount, or None)
+        x, y = self.rect.topleft if alpha is None else interpolate(self, alpha)  # where (or between where) to draw
+        render_queue.add('player', self.image, (x - offset[0], y - offset[1]))  # displaying player, under the camera
+
     def reset(self, x, y):  # player reset function
         self.images_right = []  # reset player right-facing sprites
         self.images_left = []  # reset player left-facing sprites
         self.index = 0  # reset index to 0
         self.counter = 0  # reset counter to 0
         for picture in range(1, 12):  # looping 11 times, starting at 1:
-            img_right = loadify(f'Assets/Base_pack/Player/p1_walk/PNG/p1_walk{picture}.png')  # load facing-right image
-            img_right = pygame.transform.scale(img_right, (45, 70))  # scale image to desired player size
-            img_left = pygame.transform.flip(img_right, True, False)  # flip image at y-axis and store as facing-left
+            picture_path = f'Assets/Base_pack/Player/p1_walk/PNG/p1_walk{picture}.png'  # path of this walk frame
+            img_right = asset_cache.get(picture_path, (45, 70))  # load facing-right image scaled to the player size
+            img_left = asset_cache.get(picture_path, (45, 70), flip=True)  # load the image flipped at the y-axis
             self.images_right.append(img_right)  # append the image to the image_right list
             self.images_left.append(img_left)  # append the image to the image_left list
         self.dead_image = loadify('images/ghost.png')  # load the player's death image
@@ -437,6 +497,7 @@ class Player():
         self.rect = self.image.get_rect()  # create a collision rectangle around player
         self.rect.x = x  # set x coordinate of rectangle to x coordinate of player
         self.rect.y = y  # set y coordinate of rectangle to y coordinate of player
+        self.previous_position = self.rect.topleft  # position before the last update (used for interpolation)
         self.width = self.image.get_width()  # get the width of the player
         self.height = self.image.get_height()  # get the height of the player
         self.vel_y = 0  # set player's vertical velocity to 0
@@ -448,234 +509,249 @@ class Player():
 # World class
 class World():
     def __init__(self, data):  # constructor function that takes parameter 'data'
-        self.tile_list = []  # create an empty list
+        # creating sprite groups for this level's game objects
+        self.blob_group = pygame.sprite.Group()  # create a sprite group for slime enemies
+        self.platform_group = pygame.sprite.Group()  # create a sprite group for platforms
+        self.ice_platform_group = pygame.sprite.Group()  # create a sprite group for ice platforms
+        self.lava_group = pygame.sprite.Group()  # create a sprite group for lava
+        self.water_group = pygame.sprite.Group()  # create a sprite group for water
+        self.coin_group = pygame.sprite.Group()  # create a sprite group for coins
+        self.exit_group = pygame.sprite.Group()  # create a sprite group for exit gates
+        self.patrols = PatrolStore()  # the positions and movement of every slime, platform and ice platform
+
+        # load world images (already scaled to tile_size, and shared by every tile through the asset cache)
+        tile_dimensions = (tile_size, tile_size)  # every tile image is a square of tile_size pixels
+        dirt_img = asset_cache.get('images/dirt.png', tile_dimensions)  # load dirt image
+        grass_img = asset_cache.get('images/grass.png', tile_dimensions)  # load grass image
+        tundra_img = asset_cache.get('images/tundra.png', tile_dimensions)  # load tundra image
+        blank_tundra_img = asset_cache.get('images/tundra_blank.png', tile_dimensions)  # load tundra_blank image
+        cake_img = asset_cache.get('images/cake.png', tile_dimensions)  # load cake image
+        blank_cake_img = asset_cache.get('images/cake_blank.png', tile_dimensions)  # load cake_blank image
+        choco_cake_img = asset_cache.get('images/choco_cake.png', tile_dimensions)  # load choco_cake image
+        blank_choco_cake_img = asset_cache.get('images/choco_cake_blank.png', tile_dimensions)  # load choco_cake_blank
 
-        # load world images
-        dirt_img = loadify('images/dirt.png')  # load dirt image
-        grass_img = loadify('images/grass.png')  # load grass image
-        tundra_img = loadify('images/tundra.png')  # load tundra image
-        blank_tundra_img = loadify('images/tundra_blank.png')  # load tundra_blank image
-        cake_img = loadify('images/cake.png')  # load cake image
-        blank_cake_img = loadify('images/cake_blank.png')  # load cake_blank image
-        choco_cake_img = loadify('images/choco_cake.png')  # load choco_cake image
-        blank_choco_cake_img = loadify('images/choco_cake_blank.png')  # load choco_cake_blank image
-
-        rows = 0  # create a rows variable and set to 0
+        '''
+        The solid tiles (dirt, grass, tundra, cake and choco cake) are not created here: the tile map (tilemap.py)
+        creates them a chunk at a time, only for the parts of the level the player touches or the camera shows.
+        It only needs to know which image every solid tile number uses.
+        '''
+        tile_images = {1: dirt_img, 2: grass_img, 9: tundra_img, 10: blank_tundra_img, 14: cake_img,
+                       15: blank_cake_img, 16: choco_cake_img, 17: blank_choco_cake_img}
+        if World.own_cells:  # (a copy, so the level file can be rewritten while the world is being played)
+            data = own_level_data(data)
+        self.tile_grid = TileMap(data, tile_images, tile_size)  # the level's tiles, by chunk and by grid cell
+        self.pixel_width = self.tile_grid.pixel_width  # size of the level in pixels
+        self.pixel_height = self.tile_grid.pixel_height
+        self.scrolls = self.pixel_width > screen_width or self.pixel_height > screen_height  # bigger than the screen?
 
         '''
-        This part of the code repeats 22 times. Instead of commenting each part individually, this block-comment will 
-        feature an explanation of all repetitions that are not individually commented below (anything but tiles)
-        This runs off a nested for loop as the world_data is contained within a nested list.
-        
-        if tile == x: --> depending on what the number in the tile_list is:
+        Everything else in the level is a sprite. Sprites are created up front for the whole level (slimes and
+        platforms keep moving when they are off the screen), but only the cells that hold one are visited: NumPy finds
+        them, in the same order as reading the level row by row, so the sprite groups are filled in the same order.
+
+        add_sprite() creates the sprite of one cell:
+        if tile == x: --> depending on what the number in the level data is:
             object = Class(columns * width, rows * height, 'parameter') --> generate an instance of an object with
             a specified size and any parameters (such as color)
             object_group.add(object) --> add this object to a group of other identical objects
-        
         '''
-        for row in data:  # iterating as many values in the variable 'data':
-            columns = 0  # set columns to equal 0
-            for tile in row:  # iterating for every tile per value in 'data':
-                if tile == 1:  # if the tile has a value of 1
-                    img = pygame.transform.scale(dirt_img, (tile_size, tile_size))  # scale the image to tile_size
-                    img_rect = img.get_rect()  # create a collision rectangle around the image
-                    img_rect.x = columns * tile_size  # set the rectangle's x coordinate to be at the column * tile_size
-                    img_rect.y = rows * tile_size  # set the rectangle's x coordinate to be at the row * tile_size
-                    tile = (img, img_rect)  # create the tile object with the image and the rectangle in a tuple
-                    self.tile_list.append(tile)  # append this tile to a list of tiles
-                if tile == 2:  # if the tile has a value of 2
-                    img = pygame.transform.scale(grass_img, (tile_size, tile_size))  # scale the image to tile_size
-                    img_rect = img.get_rect()  # create a collision rectangle around the image
-                    img_rect.x = columns * tile_size  # set the rectangle's x coordinate to be at the column * tile_size
-                    img_rect.y = rows * tile_size  # set the rectangle's x coordinate to be at the row * tile_size
-                    tile = (img, img_rect)  # create the tile object with the image and the rectangle in a tuple
-                    self.tile_list.append(tile)  # append this tile to a list of tiles
-                if tile == 3:
-                    blob = Enemy(columns * tile_size, rows * tile_size + 15, 'green')
-                    blob_group.add(blob)
-                if tile == 4:
-                    platform = Platform(columns * tile_size, rows * tile_size, 1, 0, 'dirt')
-                    platform_group.add(platform)
-                if tile == 5:
-                    platform = Platform(columns * tile_size, rows * tile_size, 0, 1, 'dirt')
-                    platform_group.add(platform)
-                if tile == 6:
-                    lava = Lava(columns * tile_size, rows * tile_size + (tile_size // 2))
-                    lava_group.add(lava)
-                if tile == 7:
-                    coin = Coin(columns * tile_size + (tile_size // 2), rows * tile_size + (tile_size // 2))
-                    coin_group.add(coin)
-                if tile == 8:
-                    exit = Exit(columns * tile_size, rows * tile_size - (tile_size // 2))
-                    exit_group.add(exit)
-                if tile == 9:
-                    img = pygame.transform.scale(tundra_img, (tile_size, tile_size))  # scale the image to tile_size
-                    img_rect = img.get_rect()  # create a collision rectangle around the image
-                    img_rect.x = columns * tile_size  # set the rectangle's x coordinate to be at the column * tile_size
-                    img_rect.y = rows * tile_size  # set the rectangle's x coordinate to be at the row * tile_size
-                    tile = (img, img_rect)  # create the tile object with the image and the rectangle in a tuple
-                    self.tile_list.append(tile)  # append this tile to a list of tiles
-                if tile == 10:
-                    img = pygame.transform.scale(blank_tundra_img, (tile_size, tile_size))  # scale the image to tile_size
-                    img_rect = img.get_rect()  # create a collision rectangle around the image
-                    img_rect.x = columns * tile_size  # set the rectangle's x coordinate to be at the column * tile_size
-                    img_rect.y = rows * tile_size  # set the rectangle's x coordinate to be at the row * tile_size
-                    tile = (img, img_rect)  # create the tile object with the image and the rectangle in a tuple
-                    self.tile_list.append(tile)  # append this tile to a list of tiles
-                if tile == 11:
-                    ice_platform = IcePlatform(columns * tile_size, rows * tile_size, 1, 0)
-                    ice_platform_group.add(ice_platform)
-                if tile == 12:
-                    ice_platform = IcePlatform(columns * tile_size, rows * tile_size, 0, 1)
-                    ice_platform_group.add(ice_platform)
-                if tile == 13:
-                    water = Water(columns * tile_size, rows * tile_size + (tile_size // 2))
-                    water_group.add(water)
-                if tile == 14:
-                    img = pygame.transform.scale(cake_img, (tile_size, tile_size))  # scale the image to tile_size
-                    img_rect = img.get_rect()  # create a collision rectangle around the image
-                    img_rect.x = columns * tile_size  # set the rectangle's x coordinate to be at the column * tile_size
-                    img_rect.y = rows * tile_size  # set the rectangle's x coordinate to be at the row * tile_size
-                    tile = (img, img_rect)  # create the tile object with the image and the rectangle in a tuple
-                    self.tile_list.append(tile)  # append this tile to a list of tiles
-                if tile == 15:
-                    img = pygame.transform.scale(blank_cake_img, (tile_size, tile_size))  # scale the image to tile_size
-                    img_rect = img.get_rect()  # create a collision rectangle around the image
-                    img_rect.x = columns * tile_size  # set the rectangle's x coordinate to be at the column * tile_size
-                    img_rect.y = rows * tile_size  # set the rectangle's x coordinate to be at the row * tile_size
-                    tile = (img, img_rect)  # create the tile object with the image and the rectangle in a tuple
-                    self.tile_list.append(tile)  # append this tile to a list of tiles
-                if tile == 16:
-                    img = pygame.transform.scale(choco_cake_img, (tile_size, tile_size))  # scale the image to tile_size
-                    img_rect = img.get_rect()  # create a collision rectangle around the image
-                    img_rect.x = columns * tile_size  # set the rectangle's x coordinate to be at the column * tile_size
-                    img_rect.y = rows * tile_size  # set the rectangle's x coordinate to be at the row * tile_size
-                    tile = (img, img_rect)  # create the tile object with the image and the rectangle in a tuple
-                    self.tile_list.append(tile)  # append this tile to a list of tiles
-                if tile == 17:
-                    img = pygame.transform.scale(blank_choco_cake_img, (tile_size, tile_size))  # scale the image to tile_size
-                    img_rect = img.get_rect()  # create a collision rectangle around the image
-                    img_rect.x = columns * tile_size  # set the rectangle's x coordinate to be at the column * tile_size
-                    img_rect.y = rows * tile_size  # set the rectangle's x coordinate to be at the row * tile_size
-                    tile = (img, img_rect)  # create the tile object with the image and the rectangle in a tuple
-                    self.tile_list.append(tile)  # append this tile to a list of tiles
-                if tile == 18:
-                    blob = Enemy(columns * tile_size, rows * tile_size + 15, 'blue')
-                    blob_group.add(blob)
-                if tile == 19:
-                    blob = Enemy(columns * tile_size, rows * tile_size + 15, 'purple')
-                    blob_group.add(blob)
-                if tile == 20:
-                    blob = Enemy(columns * tile_size, rows * tile_size + 15, 'red')
-                    blob_group.add(blob)
-                if tile == 21:
-                    platform = Platform(columns * tile_size, rows * tile_size, 1, 0, 'cake')
-                    platform_group.add(platform)
-                if tile == 22:
-                    platform = Platform(columns * tile_size, rows * tile_size, 0, 1, 'cake')
-                    platform_group.add(platform)
-                columns += 1  # every iteration, increase columns by 1
-            rows += 1  # every iteration, increase rows by 1
-
-    def draw(self): # draw() function
-        for tile in self.tile_list:  # iterate through all the tiles
-            screen.blit(tile[0], tile[1])  # draw all the tiles and their collision rectangles
+        # the level as a (rows, columns) array (sharing memory with the level file when it is a LevelData)
+        self.cells = cells = data.array() if hasattr(data, 'array') else numpy.array(data, dtype=numpy.uint8)
+        self.level_hash = zlib.crc32(cells.tobytes())  # (a snapshot can only be loaded into the same level)
+        sprite_cells = numpy.nonzero(numpy.isin(cells, sprite_tiles))  # the rows and columns of every sprite
+        self.cell_sprites = {}  # the sprite created for every (row, column) cell
+        for rows, columns in zip(sprite_cells[0].tolist(), sprite_cells[1].tolist()):
+            self.cell_sprites[(rows, columns)] = self.add_sprite(int(cells[rows, columns]), columns, rows)
+
+        self.coins = list(self.coin_group)  # every coin, collected or not (so a snapshot can put them back)
+        self.number_coins()
+
+        # the kind of patrolling entity in each moving group, and an index by chunk of each group that doesn't move
+        self.patrol_kinds = {self.blob_group: enemy_kind, self.platform_group: platform_kind,
+                             self.ice_platform_group: ice_platform_kind}
+        self.indexes = {}
+        for group in [self.lava_group, self.water_group, self.coin_group, self.exit_group]:
+            self.indexes[group] = SpriteIndex(self.tile_grid.chunk_size)
+            for sprite in group:
+                self.indexes[group].add(sprite)
+        self.bodies = KinematicBodies(self.patrols)  # the platforms the player collides with, by sweep and prune
+
+    own_cells = False  # copy the level's cells instead of sharing the level file's memory (set by --hot-reload)
+
+    def number_coins(self):  # where every coin is and which ones haven't been collected, as arrays (environment.py)
+        self.coin_positions = numpy.array([coin.rect.topleft for coin in self.coins], dtype=numpy.int32).reshape(-1, 2)
+        self.coins_left = numpy.array([coin.alive() for coin in self.coins], dtype=bool)
+        for number, coin in enumerate(self.coins):
+            coin.number = number  # the coin's row in coin_positions and coins_left
+
+    def reload(self, data):
+        '''
+        The level file was edited while this world is being played (--hot-reload): update the world to the new data,
+        only rebuilding what is in the cells that changed. The tile chunks with changed cells are dropped (and rebuilt
+        from the new data, collision rectangles and all, when they are next needed), the sprites of changed cells are
+        taken out of the level, and the new cells' sprites are created. Everything else (the player, the slimes and
+        platforms that weren't touched and the coins already collected) carries on where it was.
+        Returns the number of cells that changed, or None if the level changed size (it has to be built again).
+        '''
+        if World.own_cells:
+            data = own_level_data(data)
+        cells = data.array() if hasattr(data, 'array') else numpy.array(data, dtype=numpy.uint8)
+        if cells.shape != self.cells.shape:
+            return None
+        changed = numpy.argwhere(cells != self.cells).tolist()  # the (row, column) of every changed cell
+        self.cells = cells
+        self.level_hash = zlib.crc32(cells.tobytes())  # (snapshots taken before the change can't be loaded any more)
+        self.tile_grid.reload(data, changed)
+
+        coins_changed = False
+        for rows, columns in changed:
+            sprite = self.cell_sprites.pop((rows, columns), None)
+            if sprite is not None:  # take the old sprite out of the level
+                if isinstance(sprite, PatrolSprite):
+                    self.patrols.remove(sprite.index)
+                if isinstance(sprite, Coin):
+                    self.coins.remove(sprite)
+                    coins_changed = True
+                sprite.kill()
+            sprite = self.add_sprite(int(cells[rows, columns]), columns, rows)
+            if sprite is not None:  # the cell's new sprite
+                self.cell_sprites[(rows, columns)] = sprite
+                for group in sprite.groups():
+                    if group in self.indexes:
+                        self.indexes[group].add(sprite)
+                if isinstance(sprite, Coin):
+                    self.coins.append(sprite)
+                    coins_changed = True
+        if coins_changed:
+            self.number_coins()
+        self.bodies.invalidate()
+        return len(changed)
+
+    def add_sprite(self, tile, columns, rows):  # create the sprite of a tile number in a cell, and return it
+        if tile == 3:
+            blob = Enemy(columns * tile_size, rows * tile_size + 15, 'green', self.patrols)
+            self.blob_group.add(blob)
+            return blob
+        if tile == 4:
+            platform = Platform(columns * tile_size, rows * tile_size, 1, 0, 'dirt', self.patrols)
+            self.platform_group.add(platform)
+            return platform
+        if tile == 5:
+            platform = Platform(columns * tile_size, rows * tile_size, 0, 1, 'dirt', self.patrols)
+            self.platform_group.add(platform)
+            return platform
+        if tile == 6:
+            lava = Lava(columns * tile_size, rows * tile_size + (tile_size // 2))
+            self.lava_group.add(lava)
+            return lava
+        if tile == 7:
+            coin = Coin(columns * tile_size + (tile_size // 2), rows * tile_size + (tile_size // 2))
+            self.coin_group.add(coin)
+            return coin
+        if tile == 8:
+            exit = Exit(columns * tile_size, rows * tile_size - (tile_size // 2))
+            self.exit_group.add(exit)
+            return exit
+        if tile == 11:
+            ice_platform = IcePlatform(columns * tile_size, rows * tile_size, 1, 0, self.patrols)
+            self.ice_platform_group.add(ice_platform)
+            return ice_platform
+        if tile == 12:
+            ice_platform = IcePlatform(columns * tile_size, rows * tile_size, 0, 1, self.patrols)
+            self.ice_platform_group.add(ice_platform)
+            return ice_platform
+        if tile == 13:
+            water = Water(columns * tile_size, rows * tile_size + (tile_size // 2))
+            self.water_group.add(water)
+            return water
+        if tile == 18:
+            blob = Enemy(columns * tile_size, rows * tile_size + 15, 'blue', self.patrols)
+            self.blob_group.add(blob)
+            return blob
+        if tile == 19:
+            blob = Enemy(columns * tile_size, rows * tile_size + 15, 'purple', self.patrols)
+            self.blob_group.add(blob)
+            return blob
+        if tile == 20:
+            blob = Enemy(columns * tile_size, rows * tile_size + 15, 'red', self.patrols)
+            self.blob_group.add(blob)
+            return blob
+        if tile == 21:
+            platform = Platform(columns * tile_size, rows * tile_size, 1, 0, 'cake', self.patrols)
+            self.platform_group.add(platform)
+            return platform
+        if tile == 22:
+            platform = Platform(columns * tile_size, rows * tile_size, 0, 1, 'cake', self.patrols)
+            self.platform_group.add(platform)
+            return platform
+        return None  # (not a sprite)
+
+    @property
+    def tile_list(self):  # every tile of the level as (image, rect), row by row (builds the whole level)
+        return self.tile_grid.all_tiles()
+
+    def sprites_in(self, group, rect):  # the sprites of one of the world's groups that overlap rect, in group order
+        if group in self.patrol_kinds:  # moving sprites are found in the patrol store, all at once
+            return self.patrols.colliding(rect, self.patrol_kinds[group])
+        return self.indexes[group].query(rect)  # sprites that don't move are found through their chunk index
 
 
 # Enemy class (slimes)
-class Enemy(pygame.sprite.Sprite):  # identify this class as a sprite (pygame method)
-    def __init__(self, x, y, color):  # create constructor function with coordinate parameters (x, y)
-        pygame.sprite.Sprite.__init__(self)  # create a sprite (image) for every instance of this class
-
+'''
+Slimes, platforms and ice platforms all patrol back and forth. Their positions, directions and move counters are kept in
+the world's PatrolStore (entities.py), which moves every one of them at once each step, so these classes only set up
+the images and add the sprite to the store. Their rect (and move_direction, move_x, ...) are read from the store.
+'''
+class Enemy(PatrolSprite):  # identify this class as a patrolling sprite (see entities.py)
+    def __init__(self, x, y, color, store):  # constructor function with coordinates, color and the world's store
         if color == 'green':  # if the color parameter is 'green':
-            self.img_left = loadify('images/slimeGreen.png')  # load green slime image
+            img_path = 'images/slimeGreen.png'  # use the green slime image
         elif color == 'blue':  # if the color parameter is 'blue':
-            self.img_left = loadify('images/slimeBlue.png')  # load blue slime image
+            img_path = 'images/slimeBlue.png'  # use the blue slime image
         elif color == 'purple':  # if the color parameter is 'purple':
-            self.img_left = loadify('images/slimePurple.png')  # load purple slime image
+            img_path = 'images/slimePurple.png'  # use the purple slime image
         elif color == 'red':  # if the color parameter is 'red':
-            self.img_left = loadify('images/slimeRed.png')  # load red slime image
+            img_path = 'images/slimeRed.png'  # use the red slime image
+        self.img_left = asset_cache.get(img_path)  # load the slime image
         # flip the image across the y-axis and save as img_right
-        self.img_right = pygame.transform.flip(self.img_left, True, False)
-        self.image = self.img_right  # set default image facing right
-        self.rect = self.image.get_rect()  # create collision rectangle around image
-        self.rect.x = x  # set rectangle x position to equal the x position of the platform
-        self.rect.y = y  # set rectangle y position to equal the y position of the platform
-        self.move_direction = 1  # set move_direction to 1
-        self.move_counter = 0  # reset move_counter to 0
-        self.facing_right = 1  # set facing_right to 1 as the slime spawns facing_right
-
-    def update(self):  # update slime movement function
-        self.rect.x += self.move_direction  # update the rectangle position in the direction the slime is moving in
-        self.move_counter += 1  # increase move_counter by 1
-        if abs(self.move_counter) > 50:  # if the absolute value of the move_counter is greater than 50
-            self.move_direction *= -1  # move_direction = move_direction times -1 (swaps direction)
-            self.move_counter *= -1  # move_counter = move_counter times - 1 (swaps counter)
-            if self.facing_right == 1:  # if facing_right == 1 (face right)
-                self.facing_right = 0  # facing_right = 0 (face left)
-            else:
-                self.facing_right = 1  # facing_right = 1 (face right)
-        if self.facing_right == 1:  # if facing_right == 1 (face right)
-            self.image = self.img_right  # set the slime image to face right
-        else:  # else (meaning facing_right == 0 (left))
-            self.image = self.img_left  # set the slime image to face left
+        self.img_right = asset_cache.get(img_path, flip=True)
+        width, height = self.img_right.get_size()  # the collision rectangle is the size of the image
+        # add the slime to the store, moving along the x-axis (1, 0)
+        PatrolSprite.__init__(self, store, x, y, width, height, 1, 0, enemy_kind)
+
+    @property
+    def image(self):  # the slime faces the way it is moving
+        if self.move_direction == 1:  # if moving right
+            return self.img_right  # set the slime image to face right
+        return self.img_left  # otherwise set the slime image to face left
 
 
 # class for platform object
-class Platform(pygame.sprite.Sprite):  # identify this class as a sprite (pygame method)
-    def __init__(self, x, y, move_x, move_y, material):  # create constructor function with coordinate parameters (x, y)
-        pygame.sprite.Sprite.__init__(self)  # create a sprite (image) for every instance of this class
+class Platform(PatrolSprite):  # identify this class as a patrolling sprite (see entities.py)
+    def __init__(self, x, y, move_x, move_y, material, store):  # constructor function with coordinates + movement
         if material == 'dirt':  # if the material parameter is 'dirt':
-            img = loadify('images/platform.png')  # load the default platform image
+            img_path = 'images/platform.png'  # use the default platform image
         elif material == 'cake':  # if the material parameter is 'cake'
-            img = loadify('images/choco_platform.png')  # load the chocolate platform image
-        self.image = pygame.transform.scale(img, (tile_size, tile_size // 2))  # scale the platform image
-        self.rect = self.image.get_rect()  # create collision rectangle around image of platform
-        self.rect.x = x  # set rectangle x position to equal the x position of the platform
-        self.rect.y = y  # set rectangle y position to equal the y position of the platform
-        self.move_direction = 1  # set the move direction to 1 (right)
-        self.move_counter = 0  # set the move counter to 0
-        self.move_x = move_x  # set the move_x variable inside this function equal to the parameter given
-        self.move_y = move_y  # set the move_y variable inside this function equal to the parameter given
-
-    def update(self):  # function to update the position of the platform
-        self.rect.x += self.move_direction * self.move_x  # increase collision rectangle in x direction * pixels moved
-        self.rect.y += self.move_direction * self.move_y  # increase collision rectangle in y direction * pixels moved
-        self.move_counter += 1  # increase the move counter by 1
-        if abs(self.move_counter) > 50:  # if the absolute value of the move_counter is above 50
-            self.move_direction *= - 1  # set move_direction to move_direction * -1
-            self.move_counter *= -1  # set move_counter to move_counter * -1
+            img_path = 'images/choco_platform.png'  # use the chocolate platform image
+        self.image = asset_cache.get(img_path, (tile_size, tile_size // 2))  # load the scaled platform image
+        # add the platform to the store, moving along the axis given by (move_x, move_y)
+        PatrolSprite.__init__(self, store, x, y, tile_size, tile_size // 2, move_x, move_y, platform_kind)
 
 
 # class for ice platform
-class IcePlatform(pygame.sprite.Sprite):  # identify this class as a sprite (pygame method)
-    def __init__(self, x, y, move_x, move_y):  # create constructor function with coordinate parameters + movement
-        pygame.sprite.Sprite.__init__(self)  # create a sprite (image) for every instance of this class
-        img = loadify('images/ice_platform.png')  # load the ice platform image
-        self.image = pygame.transform.scale(img, (tile_size, tile_size // 2))  # scale the ice platform image
-        self.rect = self.image.get_rect()  # create collision rectangle around image of ice platform
-        self.rect.x = x  # set rectangle x position to equal the x position of the ice platform
-        self.rect.y = y  # set rectangle y position to equal the y position of the ice platform
-        self.move_direction = 1  # set the move direction to 1 (right)
-        self.move_counter = 0  # set the move counter to 0
-        self.move_x = move_x  # set the move_x variable inside this function equal to the parameter given
-        self.move_y = move_y  # set the move_y variable inside this function equal to the parameter given
-
-    def update(self):  # function to update the position of the ice platform
-        self.rect.x += self.move_direction * self.move_x  # increase collision rectangle in x direction * pixels moved
-        self.rect.y += self.move_direction * self.move_y  # increase collision rectangle in y direction * pixels moved
-        self.move_counter += 1  # increase the move counter by 1
-        if abs(self.move_counter) > 50:  # if the absolute value of the move_counter is above 50
-            self.move_direction *= - 1  # set move_direction to move_direction * -1
-            self.move_counter *= -1  # set move_counter to move_counter * -1
+class IcePlatform(PatrolSprite):  # identify this class as a patrolling sprite (see entities.py)
+    def __init__(self, x, y, move_x, move_y, store):  # constructor function with coordinates + movement
+        # load the ice platform image scaled to half a tile
+        self.image = asset_cache.get('images/ice_platform.png', (tile_size, tile_size // 2))
+        # add the ice platform to the store, moving along the axis given by (move_x, move_y)
+        PatrolSprite.__init__(self, store, x, y, tile_size, tile_size // 2, move_x, move_y, ice_platform_kind)
 
 
 # class for lava
 class Lava(pygame.sprite.Sprite):  # identify this class as a sprite (pygame method)
     def __init__(self, x, y):  # create constructor function with coordinate parameters (x, y)
         pygame.sprite.Sprite.__init__(self)  # create a sprite (image) for every instance of this class
-        image = loadify('images/lava.png')  # load the lava image
-        self.image = pygame.transform.scale(image, (tile_size, tile_size // 2))  # scale the lava image
+        self.image = asset_cache.get('images/lava.png', (tile_size, tile_size // 2))  # load the scaled lava image
         self.rect = self.image.get_rect()  # create a collision rectangle around the image
         self.rect.x = x  # set rectangle x position to equal the x position of the lava
         self.rect.y = y  # set rectangle y position to equal the y position of the lava
@@ -685,8 +761,7 @@ class Lava(pygame.sprite.Sprite):  # identify this class as a sprite (pygame met
 class Water(pygame.sprite.Sprite):  # identify this class as a sprite (pygame method)
     def __init__(self, x, y):  # create constructor function with coordinate parameters (x, y)
         pygame.sprite.Sprite.__init__(self)  # create a sprite (image) for every instance of this class
-        image = loadify('images/water.png')  # load the water image
-        self.image = pygame.transform.scale(image, (tile_size, tile_size // 2))  # scale the water image
+        self.image = asset_cache.get('images/water.png', (tile_size, tile_size // 2))  # load the scaled water image
         self.rect = self.image.get_rect()  # create a collision rectangle around the image
         self.rect.x = x  # set rectangle x position to equal the x position of the water
         self.rect.y = y  # set rectangle y position to equal the y position of the water
@@ -696,8 +771,7 @@ class Water(pygame.sprite.Sprite):  # identify this class as a sprite (pygame me
 class Coin(pygame.sprite.Sprite):  # identify this class as a sprite (pygame method)
     def __init__(self, x, y):  # create constructor function with coordinate parameters (x, y)
         pygame.sprite.Sprite.__init__(self)  # create a sprite (image) for every instance of this class
-        image = loadify('images/coin.png')  # load the coin image
-        self.image = pygame.transform.scale(image, (tile_size // 2, tile_size // 2))  # scale the coin image
+        self.image = asset_cache.get('images/coin.png', (tile_size // 2, tile_size // 2))  # load the scaled coin image
         self.rect = self.image.get_rect()  # create a collision rectangle around the image
         self.rect.center = (x, y)  # set the rectangle's center point to be at the coordinates given in the parameters
 
@@ -706,129 +780,589 @@ class Coin(pygame.sprite.Sprite):  # identify this class as a sprite (pygame met
 class Exit(pygame.sprite.Sprite):  # identify this class as a sprite (pygame method)
     def __init__(self, x, y):  # create constructor function with coordinate parameters (x, y)
         pygame.sprite.Sprite.__init__(self)  # create a sprite (image) for every instance of this class
-        image = loadify('images/exit.png')  # load the exit gate image
-        self.image = pygame.transform.scale(image, (tile_size, int(tile_size * 1.5)))  # scale the exit door image
+        # load the exit gate image scaled to one and a half tiles tall
+        self.image = asset_cache.get('images/exit.png', (tile_size, int(tile_size * 1.5)))
         self.rect = self.image.get_rect()  # create a collision rectangle around the image
         self.rect.x = x  # set rectangle x position to equal the x position of the exit gate
         self.rect.y = y  # set rectangle y position to equal the y position of the exit gate
 
 
-player = Player(100, screen_height - 130)  # create player by calling the Player class with coordinates to spawn
+# Level Prefetching
+'''
+Building a level means reading its data, building the World and creating every one of its sprites. Doing that when the
+player reaches the exit (or clicks restart) makes the game hitch for a moment, so the LevelPrefetcher builds the worlds
+that will be needed next on a background thread while the current level is being played:
+    the next level, for when the player reaches the exit
+    a spare copy of the current level, for when the player dies and restarts
+When one of those levels is needed, the ready-made World is simply swapped in. A World can only be played once (its
+sprites move and its coins get collected), so a new copy is prefetched every time one is taken.
+'''
+
+
+# build a fresh world for a level
+def build_world(level):
+    return World(load_level_data(level))
+
+
+class LevelPrefetcher():
+    executor = None  # the background thread shared by every prefetcher (started the first time it is needed)
+
+    def __init__(self):  # constructor function
+        self.pending = {}  # dictionary that maps a level number to the (future) World being built for it
+
+    def prefetch(self, level):  # start building a level in the background, if it isn't already being built
+        if level in self.pending or level > max_levels:
+            return
+        if not path.exists(level_filename(level)) and not path.exists(f'level{level}_data'):
+            return  # there is no such level to build
+        if LevelPrefetcher.executor is None:
+            LevelPrefetcher.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='level-prefetch')
+        self.pending[level] = LevelPrefetcher.executor.submit(build_world, level)
+
+    def take(self, level):  # get a World for a level: the prefetched one if there is one, otherwise build it now
+        future = self.pending.pop(level, None)
+        if future is None:
+            return build_world(level)
+        return future.result()  # (waits for the background thread if the level isn't quite ready yet)
 
-# creating sprite groups for game objects
-blob_group = pygame.sprite.Group()  # create a sprite group for slime enemies
-platform_group = pygame.sprite.Group()  # create a sprite group for platforms
-ice_platform_group = pygame.sprite.Group()  # create a sprite group for ice platforms
-lava_group = pygame.sprite.Group()  # create a sprite group for lava
-water_group = pygame.sprite.Group()  # create a sprite group for water
-coin_group = pygame.sprite.Group()  # create a sprite group for coins
-exit_group = pygame.sprite.Group()  # create a sprite group for exit gates
+    def discard(self, level):  # forget the world being built for a level (its level file changed)
+        future = self.pending.pop(level, None)
+        if future is not None:
+            future.cancel()
 
-# loading data for the levels / world
-if path.exists(f'level{level}_data'):  # verify if the data file for the level exists
-    pickle_in = open(f'level{level}_data', 'rb')  # process the data file | 'rb' stands for read binary
-    world_data = pickle.load(pickle_in)  # save the processed data in variable 'world_data'
-world = World(world_data)  # process world_data through class World() and store in variable 'world'.
+    def prefetch_around(self, level):  # keep the current and next level ready, and forget about any others
+        for other in list(self.pending):
+            if other not in (level, level + 1):
+                self.pending.pop(other).cancel()
+        self.prefetch(level)  # a spare copy of the current level, for restarting it
+        self.prefetch(level + 1)  # the next level
 
-# create buttons
-restart_button = Button(screen_width // 2 - 50, screen_height // 2 + 100, restart_img)  # create restart button
+
+# Game class
+'''
+The Game class holds everything that changes while the game is being played: the level, the score, the game_over state,
+the player and the world. Keeping it all in one object means the game can be stepped one frame at a time, either by
+the main game loop below or without a window by the headless simulation (headless.py).
+
+update(key) --> runs one frame of the game with the keys being pressed. It is made of two steps, which can also be
+called (and timed) separately:
+    update_sprites() --> moves the enemies and platforms and collects any coins the player is touching
+    update_player(key) --> moves the player and goes on to the next level when the exit is reached (the camera
+    follows the player, see camera.py). It is move_player(key) followed by advance_level(), which can also be called
+    separately to look at the level the player has just finished (environment.py does)
+draw_static() --> points the camera at the player and queues the backgrounds and the level's tiles in render_queue.
+draw() --> queues the moving parts of the game (the score, the sprites, the player and any messages) in render_queue,
+    only drawing the sprites the camera can see. Call it after draw_static().
+'''
+
+
+# the position to draw a moving sprite at, alpha of the way from its previous position to its current one
+def interpolate(sprite, alpha):
+    x, y = sprite.previous_position  # where the sprite was before its last update
+    return round(x + (sprite.rect.x - x) * alpha), round(y + (sprite.rect.y - y) * alpha)
+
+
+# queue sprites to be drawn on a layer, shifted by the camera's offset, interpolating their positions if alpha is given
+def draw_sprites(sprites, layer, alpha=None, offset=(0, 0)):
+    offset_x, offset_y = offset
+    if alpha is None and offset_x == 0 and offset_y == 0:
+        render_queue.add_group(layer, sprites)  # draw every sprite where it is
+        return
+    draws = []
+    for sprite in sprites:
+        # where the sprite is, or between its last two positions
+        x, y = sprite.rect.topleft if alpha is None else interpolate(sprite, alpha)
+        draws.append((sprite.image, (x - offset_x, y - offset_y)))
+    render_queue.extend(layer, draws)
+
+
+class Game():
+    def __init__(self, level=1, prefetch=True):  # constructor function with the level to start on (level 1 by default)
+        self.level = level  # set the current level
+        self.score = 0  # set the score to 0
+        self.game_over = 0  # set game_over to 0, representing that the game is NOT over
+        self.world = build_world(level)  # process the level's data through class World()
+        self.player = Player(100, self.world.pixel_height - 130)  # create the player near the bottom left of the level
+        self.camera = Camera(screen_width, screen_height)  # the part of the level shown on the screen
+        self.levels = LevelPrefetcher() if prefetch else None  # builds the levels we'll need next in the background
+        self.transition_times = []  # how long (in seconds) every switch to a new or restarted level took
+        if self.levels is not None:
+            self.levels.prefetch_around(level)
+
+    def reset_level(self, world=None):  # resetting level function (optionally to a world that was already built)
+        start = time.perf_counter()  # time how long the switch takes
+        if world is not None:
+            self.world = world
+        elif self.levels is not None:
+            self.world = self.levels.take(self.level)  # swap in the fresh world that was built in the background
+        else:
+            self.world = build_world(self.level)  # build a fresh world (with fresh sprites) for the level
+        self.player.reset(100, self.world.pixel_height - 130)  # put the player back near the bottom left of the level
+        self.game_over = 0  # set game_over to 0, representing that the game is NOT over anymore
+        self.transition_times.append(time.perf_counter() - start)  # the switch is done once the world is in place
+
+        if self.levels is not None:
+            self.levels.prefetch_around(self.level)  # start building the worlds we'll need after this one
+
+    def restart(self):  # start the level again from the beginning (the restart button after dying)
+        self.reset_level()  # reset the level (the player, the world and game_over)
+        self.score = 0  # reset player score to 0
+
+    def restart_game(self):  # start the whole game again from level 1 (the restart button after winning)
+        self.level = 1  # set level to 1, resetting the game
+        self.reset_level()  # reset the level (the player, the world and game_over)
+        self.score = 0  # reset score to 0
+
+    def save_snapshot(self):  # the whole state of the game, packed into bytes (see snapshots.py)
+        return take_snapshot(self)
+
+    def load_snapshot(self, data):  # put the game back into the state of a snapshot from save_snapshot()
+        snapshot = Snapshot(data)  # (raises a ValueError, leaving the game as it is, if the snapshot is broken)
+        # (after the last level is finished the level goes past max_levels, but the world is still the last level's)
+        if min(snapshot.level, max_levels) != min(self.level, max_levels):  # the snapshot is of another level
+            world = build_world(min(snapshot.level, max_levels))  # build a world of its level first...
+            check_snapshot(world, snapshot)  # ...and only switch to it if the snapshot fits it
+            self.level = min(snapshot.level, max_levels)
+            self.reset_level(world)
+        else:
+            check_snapshot(self.world, snapshot)
+        restore_snapshot(self, snapshot)
+
+    def reload_level(self, level):
+        '''
+        A level file changed (--hot-reload). Worlds prefetched for that level are thrown away, and if it is the level
+        being played, the world is updated in place (see World.reload) and the static scene is baked again, so the
+        change shows on the next frame with the player where they were. Returns the number of cells that changed in
+        the level being played (None if it isn't the level being played).
+        '''
+        if self.levels is not None:
+            self.levels.discard(level)  # (built from the old file)
+            self.levels.prefetch_around(self.level)
+        if level != min(self.level, max_levels):  # not the level being played
+            return None
+        data = load_level_data(level)
+        if World.own_cells:  # (copied once, as the data may be used to build a new world below)
+            data = own_level_data(data)
+        changed = self.world.reload(data)
+        if changed is None:  # the level changed size: build a new world, but keep the player where they are
+            self.world = World(data)
+            changed = self.world.cells.size
+        static_layer.invalidate()  # the tiles baked into the static scene changed
+        render_queue.invalidate()  # (redraw the whole screen when only drawing what changed)
+        return changed
+
+    def update(self, key):  # run one frame of the game with the keys being pressed
+        self.update_sprites()  # move the sprites and collect coins
+        self.update_player(key)  # move the player
+
+    def update_sprites(self):  # update the sprite groups of the current world
+        world = self.world  # the world of the current level
+
+        if self.game_over == 0:  # if the game_over variable is 0, representing that the game is NOT over:
+            world.patrols.update()  # move every slime enemy, platform and ice platform at once
+
+            # score updater which checks which coins have been collected
+            coins = world.sprites_in(world.coin_group, self.player.rect)  # the coins the player is touching
+            if coins:  # if the player collides with a coin
+                for coin in coins:
+                    coin.kill()  # remove the collected coins from the world
+                    world.coins_left[coin.number] = False
+                self.score += 1  # increase score by 1
+                audio.play_effect('coin')  # play the coin sound effect
+
+    def update_player(self, key):  # update the player with the keys being pressed
+        self.move_player(key)
+        self.advance_level()
+
+    def move_player(self, key):  # move the player with the keys being pressed
+        # send the game_over variable to the .update() function in class Player()
+        self.game_over = self.player.update(self.game_over, self.world, key)
+
+    def advance_level(self):  # go on to the next level if the player reached the exit, and point the camera at them
+        # when player finishes the level, go to the next level (once the last level is finished the game is won)
+        if self.game_over == 1 and self.level <= max_levels:
+            self.level += 1
+            if self.level <= max_levels:
+                self.reset_level()  # clear the world of all data and build the next level
+
+        # keep the camera on the player, and drop the parts of the level that are far away from it
+        self.follow(self.player.rect.topleft)
+        self.world.tile_grid.retain(self.camera.view)
+
+    def follow(self, position):  # centre the camera on the player, drawn at position
+        x, y = position
+        self.camera.follow(x + self.player.width // 2, y + self.player.height // 2,
+                           self.world.pixel_width, self.world.pixel_height)
+
+    def draw_static(self, alpha=None):  # queue the parts of the level that never move (the backgrounds and the tiles)
+        world = self.world  # the world of the current level
+        backgrounds = level_backgrounds(self.level)  # the background images of the level
+        self.follow(self.player.rect.topleft if alpha is None else interpolate(self.player, alpha))
+
+        if not world.scrolls:  # a level that fits on the screen is baked into the static layer with its backgrounds
+            render_queue.add('static', static_layer.prepare(backgrounds, world), (0, 0))
+        else:  # otherwise only the backgrounds are, and the tiles are drawn a chunk at a time under the camera
+            render_queue.add('static', static_layer.prepare(backgrounds), (0, 0))
+            offset_x, offset_y = self.camera.offset
+            render_queue.extend('tiles', [(chunk.image(), (chunk.x - offset_x, chunk.y - offset_y))
+                                          for chunk in world.tile_grid.visible_chunks(self.camera.view)])
+
+    def draw(self, alpha=None):  # queue the moving parts of the game (alpha is the interpolation amount, or None)
+        world = self.world  # the world of the current level
+        offset = self.camera.offset  # how far the camera is scrolled (draw_static() points the camera at the player)
+
+        '''
+        On a level bigger than the screen, only the sprites the camera can see are drawn. The view is made a tile
+        bigger on every side, so sprites that are only just off the screen (and may be drawn between two positions)
+        are still drawn.
+        '''
+        if world.scrolls:
+            view = self.camera.view.inflate(tile_size * 2, tile_size * 2)
+            visible = lambda group: world.sprites_in(group, view)
+        else:
+            visible = lambda group: group
+
+        if self.game_over == 0:  # while the game is NOT over
+            # draw the score in the top left
+            draw_text('X ' + str(self.score), font_score, black, tile_size - 10, 10, 'score')
+
+        # drawing game objects to screen
+        draw_sprites(visible(world.blob_group), 'enemies', alpha, offset)  # draw the slime enemies to the screen
+        draw_sprites(visible(world.platform_group), 'platforms', alpha, offset)  # draw the platforms to the screen
+        draw_sprites(visible(world.lava_group), 'lava', None, offset)  # draw the lava to the screen
+        draw_sprites(visible(world.water_group), 'water', None, offset)  # draw the water to the screen
+        draw_sprites(visible(world.coin_group), 'coins', None, offset)  # draw the coins to the screen
+        draw_sprites(visible(world.exit_group), 'exits', None, offset)  # draw the exit gates to the screen
+        draw_sprites(visible(world.ice_platform_group), 'ice_platforms', alpha, offset)  # draw the ice platforms
+
+        if self.game_over == -1:  # when the player dies, write GAME OVER on the screen
+            draw_text('GAME OVER', font, red, (screen_width // 2) - 200, screen_height // 2)
+
+        self.player.draw(alpha, offset)  # draw the player
+
+        if self.game_over == 1:  # when every level is finished
+            # draw winning message to the screen at the center of the screen
+            draw_text(f'YOU WIN! SCORE: {self.score} ', font, blue, (screen_width // 2) - 280, screen_height // 2,
+                      'overlay')
+
+
+# create buttons (the restart button is created by finish_loading(), once its image has loaded)
 start_button = Button(screen_width // 2 - 350, screen_height // 2, start_img)  # create start button
 exit_button = Button(screen_width // 2 + 150, screen_height // 2, exit_img)  # create exit button
 
-# Main Game Loop
-run = True  # create variable run and assign it a boolean value of True
-
-while run:  # while variable 'run' == True, run the main game loop
+# create the layer that holds the baked backgrounds and tiles of the current level
+static_layer = StaticLayer(screen_width, screen_height)
 
-    clock.tick(frame_rate)  # use pygame .tick() method to limit the game at a specified frame_rate (60)
 
-    # draw the background image(s)
-    screen.blit(bg_img, (0, 0))  # blit the default background image (blue sky) onto the screen
+# choose the background image(s) for a level
+def level_backgrounds(level):
+    backgrounds = [bg_img]  # the default background image (blue sky) is always at the back
 
     if level < 5:  # if level is less than 5
-        screen.blit(forest_img, (0, 0))  # blit the forest background onto the screen
+        backgrounds.append(forest_img)  # draw the forest background over the sky
     elif level < 8:  # if level is less than 8
-        screen.blit(arctic_img, (0, 0))  # blit the arctic background onto the screen
-        change_music()  # call the change_music() function
+        backgrounds.append(arctic_img)  # draw the arctic background over the sky
     elif level < 10:  # if level is less than 10
-        screen.blit(cake_img, (0, 0))  # blit the cake background onto the screen
-        change_music()  # call the change_music() function
+        backgrounds.append(cake_img)  # draw the cake background over the sky
     elif level == 10:  # if level is equal to 10
-        screen.blit(final_img, (0, 0))  # blit the final level background onto the screen
-        change_music()  # call the change_music() function
+        backgrounds.append(final_img)  # draw the final level background over the sky
 
-    if main_menu == True:  # if variable main_menu is equal to True then run the following:
-        if exit_button.draw():  # if the exit button is clicked
-            run = False  # terminate the game loop, ending the program
-        if start_button.draw():  # if the start button is clicked
-            main_menu = False  # set variable main_menu to False which will get rid of the main menu screen
-            display = 'unoriginal'  # set display to 'unoriginal' meaning the game updates the display after it starts
+    return backgrounds
 
-    else:  # else, meaning if the main_menu is not True, start the main part of the game loop
-        world.draw()  # run the draw() function with the world_data stored inside variable 'world'
 
-        if game_over == 0:  # if the game_over variable is 0, representing that the game is NOT over:
-            blob_group.update()  # update the slime enemies positions on the screen as they move
-            platform_group.update()  # update the platforms positions on the screen as they move
-            ice_platform_group.update()  # update the ice platforms positions on the screen as they move
+def finish_loading():  # wait for the assets that are still loading, and put them in their global variables
+    global font_score, font, restart_img, arctic_img, cake_img, final_img, display_coin, restart_button
+    global save_button, load_button
+    loaded = asset_loader.wait()
+    font_score, font = loaded['fonts']
+    restart_img = loaded['restart_img']
+    arctic_img = loaded['arctic_img']
+    cake_img = loaded['cake_img']
+    final_img = loaded['final_img']
+    display_coin = loaded['display_coin']
+    restart_button = Button(screen_width // 2 - 50, screen_height // 2 + 100, restart_img)  # create restart button
+    save_button = Button(screen_width - 190, 10, loaded['save_img'])  # create the save button (top right)
+    load_button = Button(screen_width - 100, 10, loaded['load_img'])  # create the load button (top right)
 
-            # score updater which checks which coins have been collected
-            if pygame.sprite.spritecollide(player, coin_group, True):  # if the player collides with a coin
-                score += 1  # increase score by 1
-                coin_fx.play()  # play the coin_fx sound effect
 
-            draw_text('X ' + str(score), font_score, black, tile_size - 10, 10)  # draw the score counter in top left
+if __name__ != '__main__':
+    finish_loading()  # other modules importing the game get everything loaded, as before
 
-        # drawing game objects to screen
-        blob_group.draw(screen)  # draw the slime enemies to the screen
-        platform_group.draw(screen)  # draw the platforms to the screen
-        lava_group.draw(screen)  # draw the lava to the screen
-        water_group.draw(screen)  # draw the water to the screen
-        coin_group.draw(screen)  # draw the coins to the screen
-        exit_group.draw(screen)  # draw the exit gates to the screen
-        ice_platform_group.draw(screen)  # draw the ice platforms to the screen
-
-        game_over = player.update(game_over)  # send the game_over variable to the .update() function in class Player()
-
-        # when player dies
-        if game_over == -1:  # when the player dies and the game temporarily pauses/ends
-            if restart_button.draw():  # if the restart button is clicked
-                world_data = []  # empty out the world_data list
-                world = reset_level(level)  # reset the level and return the new world_data to variable world
-                game_over = 0  # set game_over to 0, representing that the game is NOT over anymore
-                score = 0  # reset player score to 0
-
-        # when player finishes the level
-        if game_over == 1:
-            # go to next level
-            level += 1
-            if level <= max_levels:
-                # clear the world of all data
-                world_data = []  # empty out the world_data list
-                world = reset_level(level)  # reset the level and return the new world_data to variable world
-                game_over = 0  # set game_over to 0, representing that the game is NOT over anymore
-            else:
-                # draw winning message to the screen at the center of the screen
-                draw_text(f'YOU WIN! SCORE: {score} ', font, blue, (screen_width // 2) - 280, screen_height // 2)
+
+'''
+Main Game Loop
+--------------
+The game loop only runs when main.py is started directly (python main.py). Other modules, such as the headless
+simulation in headless.py, can import this file to use the Game class without opening a game window.
+'''
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Platformer')  # read the launch options
+    parser.add_argument('--fps', type=int, default=frame_rate,
+                        help='how many frames per second to draw (default: 60, 0 for no limit)')
+    parser.add_argument('--interpolate', action='store_true',
+                        help='draw moving sprites between simulation steps (smoother above 60 fps)')
+    parser.add_argument('--profile', nargs='?', const='profile', metavar='DIR',
+                        help='write cProfile stats per level and a CSV of frame timings to DIR (default: profile)')
+    parser.add_argument('--record', metavar='FILE',
+                        help='record the keys pressed during the game to FILE, to replay it with replay.py')
+    parser.add_argument('--startup-stats', action='store_true',
+                        help='print how long the first frame took to appear and the game took to be playable')
+    parser.add_argument('--dirty-rects', action='store_true',
+                        help='only redraw and update the parts of the screen that changed (see render.py)')
+    parser.add_argument('--hot-reload', action='store_true',
+                        help='reload a level as soon as its level file is saved, keeping the player where they are')
+    parser.add_argument('--render-scale', type=float, default=1.0, choices=render_scales,
+                        help='draw the game at this fraction of the window size, scaled up by SDL (see render.py)')
+    args = parser.parse_args()
+    if args.render_scale < 1 and args.dirty_rects:
+        parser.error('--render-scale and --dirty-rects can not be used together')
+    frame_rate = args.fps  # the game itself always runs at sim_rate steps per second, whatever the frame rate
+
+    # Set default music (in start menu)
+    change_music(1)  # start the forest music (it fades in once it has been decoded)
+
+    '''
+    Hot Reloading
+    -------------
+    With --hot-reload the level files are checked every frame, and a level that was saved (levelN.lvl, or levelN_data,
+    see levels.py) is reloaded straight away: only the cells that changed are rebuilt (see Game.reload_level), so the
+    change is on the screen on the next frame and the player stays where they are. The worlds keep their own copy of
+    the level's cells, so a level file can be rewritten while it is being played.
+    '''
+    level_watcher = None  # checks the level files for changes (with --hot-reload)
+    if args.hot_reload:
+        World.own_cells = True
+        level_watcher = LevelWatcher(range(1, max_levels + 1))
+
+    if args.render_scale < 1:  # open the display at the smaller size, for SDL to scale it up to the window
+        render_scale = RenderScale(args.render_scale, screen_size)
+        try:
+            screen = render_scale.display_mode()
+        except pygame.error as error:  # (e.g. the video driver has no renderer to scale it with)
+            print(f'could not scale the display ({error}): drawing at full size')
+            render_scale = None
+            screen = pygame.display.set_mode(screen_size)
+
+    asset_loader.load('game', Game)  # create a new game, starting at level 1 (in the background, see above)
+    game = None  # (the game, once start has been clicked)
+    first_frame = None  # how long after starting the first frame was on the screen (for --startup-stats)
+    start_wait = None  # how long clicking start waited for the assets, and for which ones
+
+    def start_game():  # start was clicked: wait for anything that is still loading, and return the game
+        global start_wait
+        waiting = asset_loader.missing()  # what start has to wait for
+        clicked = time.perf_counter()
+        finish_loading()
+        start_wait = (clicked - startup_start, time.perf_counter() - clicked, waiting)
+        return asset_loader.get('game')
+
+    def print_startup_stats(game_frame):  # print how long everything took, from the moment the game was started
+        loaded = max(asset_loader.finished.values()) - startup_start  # when the game could be played without waiting
+        clicked, waited, waiting = start_wait
+        print(f'startup: first frame after {first_frame * 1000:.1f}ms, playable (everything loaded) after '
+              f'{loaded * 1000:.1f}ms')
+        print(f'startup: start clicked after {clicked * 1000:.1f}ms and waited {waited * 1000:.1f}ms'
+              + (f' for {", ".join(waiting)}' if waiting else ' (everything had already loaded)')
+              + f', first frame of the game after {game_frame * 1000:.1f}ms')
+        for name, finished in sorted(asset_loader.finished.items(), key=lambda item: item[1]):
+            print(f'    {name:<14} loaded after {(finished - startup_start) * 1000:.1f}ms')
+
+    '''
+    Saving, Loading and Rewinding
+    -----------------------------
+    The save button (or F5) packs the state of the game into a snapshot and writes it to quicksave.snap, and the load
+    button (or F9) puts the game back into the saved state. Every step also adds a snapshot to the rewind buffer, and
+    holding backspace runs the game backwards one step at a time instead of forwards (it even undoes dying). While a
+    session is being recorded (--record) loading and rewinding are turned off, since the recording of the keys could
+    no longer be replayed.
+    '''
+    def save_game():  # quick save the game to quicksave.snap
+        with open(quicksave_filename, 'wb') as save_file:
+            save_file.write(game.save_snapshot())
+
+    def load_game():  # quick load the game from quicksave.snap (if there is one, and we aren't recording)
+        if recorder is not None or not path.exists(quicksave_filename):
+            return
+        with open(quicksave_filename, 'rb') as save_file:
+            data = save_file.read()
+        try:
+            game.load_snapshot(data)
+        except ValueError as error:  # (an old or broken save shouldn't crash the game)
+            print(f'could not load {quicksave_filename}: {error}')
+            return
+        rewind.push(game.save_snapshot())  # (so rewinding goes back through the load, not past it)
+
+    timestep = FixedTimestep(sim_rate, max_steps)  # run the game in fixed steps, however fast frames are drawn
+    recorder = None  # records the keys of every step, when launched with --record (see recording.py)
+    rewind = RewindBuffer()  # a snapshot of every step, to run the game backwards (hold backspace)
+    profiler = FrameProfiler()  # times every phase of every frame (press F3 to show the overlay)
+    level_profiles = None  # the cProfile stats of every level, when launched with --profile
+    if args.profile:
+        profiler.record_to(path.join(args.profile, 'frames.csv'))
+        level_profiles = LevelProfiles(args.profile)
+    run = True  # create variable run and assign it a boolean value of True
+
+    while run:  # while variable 'run' == True, run the main game loop
+
+        elapsed = clock.tick(frame_rate) / 1000  # limit the frame rate, and get the seconds since the last frame
+        profiler.start_frame()  # time the frame from here (the time spent waiting for the next frame isn't counted)
+        if level_profiles is not None:
+            level_profiles.track(None if main_menu else game.level)  # profile the level being played
+
+        if level_watcher is not None and game is not None:  # reload any level file that was saved
+            for changed_level in level_watcher.changed():
+                start = time.perf_counter()
+                try:
+                    changed = game.reload_level(changed_level)
+                except (OSError, ValueError) as error:  # (e.g. a half written file: wait for the next save)
+                    print(f'could not reload level {changed_level}: {error}')
+                    continue
+                if changed is not None:
+                    rewind.clear()  # (the snapshots are of the old level)
+                    print(f'reloaded level {changed_level}: {changed} cells changed, '
+                          f'{(time.perf_counter() - start) * 1000:.1f}ms')
+
+        if main_menu == False:  # once the game has started
+            if args.record and recorder is None:  # start recording when the game starts
+                recorder = Recorder(game)
+            key = pygame.key.get_pressed()  # the keys currently being pressed
+            for step in range(timestep.advance(elapsed)):  # run as many fixed steps as the time that has passed needs
+                if key[pygame.K_BACKSPACE] and recorder is None:  # rewinding: go back one step instead
+                    snapshot = rewind.pop()
+                    if snapshot is not None:
+                        game.load_snapshot(snapshot)
+                    continue
+                if recorder is not None:
+                    recorder.step(key)  # record the keys of every step
+                game.update_sprites()  # run one step of the game: move the sprites and collect coins
+                profiler.mark('sprites')
+                game.update_player(key)  # then move the player
+                profiler.mark('player')
+                rewind.push(game.save_snapshot())  # remember the step, to be able to rewind it
+                profiler.mark('snapshot')
+        else:
+            timestep.reset()  # the game doesn't run in the main menu, so don't let time build up
+        alpha = timestep.alpha() if args.interpolate else None  # how far to interpolate the moving sprites
+
+        if game is not None and game.level > 4:  # the forest music plays from the start, later levels switch music
+            change_music(game.level)  # call the change_music() function
+        audio.update()  # start any music that has finished decoding
+
+        '''
+        Draw the static scene (the backgrounds, plus the level's tiles once the game has started) with a single blit.
+        The static layer bakes the scene into one surface and only re-bakes it when the level or its background
+        changes, so the cost of drawing the scene does not depend on how many tiles the level has. Levels bigger than
+        the screen scroll with the camera instead: their tiles are drawn as a few baked chunks (see tilemap.py).
+
+        Nothing is drawn straight to the screen: everything below is queued in render_queue, by layer, and the whole
+        frame is drawn with one batched blit call just before the display is updated.
+        '''
+        if main_menu == True:  # the main menu only shows the backgrounds
+            render_queue.add('static', static_layer.prepare(level_backgrounds(level)), (0, 0))
+        else:  # during the game the tiles of the current world are part of the static scene too
+            game.draw_static(alpha)  # the backgrounds and the level's tiles, under the camera
+        profiler.mark('static')
+
+        if main_menu == True:  # if variable main_menu is equal to True then run the following:
+            if exit_button.draw():  # if the exit button is clicked
+                run = False  # terminate the game loop, ending the program
+            if start_button.draw():  # if the start button is clicked
+                game = start_game()  # (waits for anything that hasn't finished loading yet)
+                main_menu = False  # set variable main_menu to False which will get rid of the main menu screen
+                display = 'unoriginal'  # set display to 'unoriginal' meaning the game has started
+
+        else:  # else, meaning if the main_menu is not True, draw the main part of the game
+            game.draw(alpha)  # draw the sprites, the player and the score
+            profiler.mark('draw')
+
+            # quick save and quick load
+            if save_button.draw():
+                save_game()
+            if load_button.draw():
+                load_game()
+
+            # when player dies
+            if game.game_over == -1:  # when the player dies and the game temporarily pauses/ends
+                if restart_button.draw():  # if the restart button is clicked
+                    game.restart()  # restart the level with a score of 0
+                    if recorder is not None:
+                        recorder.event(restart_level)
+
+            # when player finishes the last level
+            if game.game_over == 1:
                 # restart game
                 if restart_button.draw():
-                    level = 1  # set level to 1, resetting the game
-                    world_data = []  # empty out the world_data list
-                    world = reset_level(level)  # reset the level and return the new world_data to variable world
-                    game_over = 0  # set the game_over variable to 0, representing that the game is NOT over anymore
-                    score = 0  # reset score to 0
-                    change_music()  # run function change_music()
-
-    for event in pygame.event.get():  # loops through all the 'events' pygame supports
-        if event.type == pygame.QUIT:  # if the x button in the top right of the game screen is pressed:
-            run = False  # Set variable 'run' to False, terminating the main game loop.
-
-    # coin beside the score for visual purposes
-    if display != 'original':
-        display_coin = loadify('images/coin.png')  # load and convert image 'coin' and store in new var 'display_coin'
-        display_coin = pygame.transform.scale(display_coin, (tile_size // 2, tile_size // 2))  # scale the coin's image
-        screen.blit(display_coin, (10, 15))  # blit the display_coin to the screen at coordinate (10, 15) from top-left.
-
-    pygame.display.update()  # Updates the display with any new .blit() methods called
-
-pygame.quit()  # Deactivates the initialized modules of the pygame library, terminating the program.
+                    game.restart_game()  # go back to level 1 with a score of 0
+                    if recorder is not None:
+                        recorder.event(restart_game)
+                    change_music(game.level)  # run function change_music()
+
+        profiler.mark('ui')  # the buttons
+
+        for event in pygame.event.get():  # loops through all the 'events' pygame supports
+            if event.type == pygame.QUIT:  # if the x button in the top right of the game screen is pressed:
+                run = False  # Set variable 'run' to False, terminating the main game loop.
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:  # F3 shows or hides the profiler
+                profiler.toggle()
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F5 and game is not None and not main_menu:
+                save_game()  # F5 quick saves
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F9 and game is not None and not main_menu:
+                load_game()  # F9 quick loads
+            elif event.type == pygame.WINDOWEXPOSED:  # the window has to be drawn again (e.g. it was uncovered)
+                render_queue.invalidate()
+        profiler.mark('events')
+
+        # coin beside the score for visual purposes
+        if display != 'original':
+            render_queue.add('ui', display_coin, (10, 15))  # draw the display_coin at (10, 15) from top-left.
+        profiler.mark('ui')
+
+        if profiler.visible:  # the profiler overlay goes in the top right corner, over everything else
+            overlay = profiler.overlay_image()
+            render_queue.add('profiler', overlay, (screen_width - overlay.get_width() - 10, 10))
+            profiler.mark('profiler')
+
+        if render_scale is not None:  # draw the frame smaller (SDL scales it up to the window when it is shown)
+            render_queue.submit_scaled(screen, render_scale)
+            profiler.mark('blit')
+            pygame.display.update()
+        elif args.dirty_rects:  # only redraw and update the parts of the screen that changed since the last frame
+            dirty = render_queue.submit_dirty(screen)
+            profiler.mark('blit')
+            if dirty is None:  # too much changed (or the camera scrolled): update the whole screen
+                pygame.display.update()
+            elif dirty:
+                pygame.display.update(dirty)
+        else:
+            render_queue.submit(screen)  # draw everything queued this frame, back to front, with one batched blit call
+            profiler.mark('blit')
+            pygame.display.update()  # Updates the display with any new .blit() methods called
+        profiler.mark('display')
+        if first_frame is None:
+            first_frame = time.perf_counter() - startup_start
+        if args.startup_stats and start_wait is not None:  # the first frame of the game is on the screen
+            print_startup_stats(time.perf_counter() - startup_start)
+            args.startup_stats = False  # (only once)
+        profiler.end_frame(None if main_menu else game.level)
+
+    # report how long the level transitions took
+    if game is not None and game.transition_times:
+        print(f'level transitions: {len(game.transition_times)}, '
+              f'average {sum(game.transition_times) / len(game.transition_times) * 1000:.2f}ms, '
+              f'slowest {max(game.transition_times) * 1000:.2f}ms')
+
+    audio.stop()  # stop the music and the sound effects
+
+    # save the recording of the session
+    if recorder is not None:
+        recorder.save(args.record)
+        print(f'recorded {recorder.recording.steps} steps to {args.record}')
+
+    # write the profiling results
+    profiler.close()
+    if level_profiles is not None:
+        for filename in level_profiles.save():
+            print(f'wrote {filename}')
+        print(f'wrote {path.join(args.profile, "frames.csv")}')
+
+    pygame.quit()  # Deactivates the initialized modules of the pygame library, terminating the program.
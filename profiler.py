@@ -0,0 +1,158 @@
+'''
+Frame Profiler
+--------------
+When the game stutters we want to know where the frame went, so the main game loop marks the end of every phase of a
+frame (updating the sprites, updating the player, preparing the static layer, queueing the game's drawing, drawing the
+buttons and HUD, event handling, the batched blit and pygame.display.update) and FrameProfiler adds up the time spent
+in each one. The last `capacity` frames are kept in a fixed-size ring buffer (a NumPy array, so recording a frame never
+allocates), which is what the overlay shows: a graph of the recent frame times and the phases that take the longest.
+
+Press F3 during the game to show or hide the overlay.
+
+Launching the game with --profile [DIR] also:
+    - writes the timings of every frame to DIR/frames.csv (one row per frame, times in milliseconds)
+    - runs cProfile while each level is being played, and writes the stats to DIR/levelN.prof when the game exits
+      (view them with: python -m pstats DIR/level1.prof)
+'''
+
+import cProfile
+import csv
+import os
+import time
+
+import numpy
+import pygame
+
+# the phases of a frame, in the order they run in the main game loop
+phases = ['sprites', 'player', 'snapshot', 'static', 'draw', 'ui', 'events', 'profiler', 'blit', 'display']
+
+graph_size = (240, 80)  # size of the frame-time graph in the overlay
+graph_max_ms = 1000 / 30  # frame time at the top of the graph (30 FPS)
+target_ms = 1000 / 60  # frame time the game should stay under (60 FPS), drawn as a line on the graph
+
+
+class FrameProfiler():
+    def __init__(self, capacity=240, phase_names=phases):  # constructor function with the number of frames to keep
+        self.phases = list(phase_names)  # the names of the phases
+        self.columns = {name: column for column, name in enumerate(self.phases)}  # the column of every phase
+        self.times = numpy.zeros((capacity, len(self.phases)))  # seconds spent in every phase, one row per frame
+        self.totals = numpy.zeros(capacity)  # the total seconds of every frame
+        self.frames = 0  # number of frames recorded so far (the newest frame is in row (frames - 1) % capacity)
+        self.frame_start = None  # when the current frame started
+        self.last_mark = None  # when the last phase of the current frame ended
+        self.visible = False  # whether the overlay is shown
+        self.overlay = None  # the overlay surface (only rebuilt every few frames, see overlay_image)
+        self.overlay_frame = -1  # the frame the overlay surface was built on
+        self.font = None  # the overlay's font (created the first time the overlay is shown)
+        self.csv_file = None  # the file every frame is written to, when recording
+        self.csv_writer = None
+
+    @property
+    def capacity(self):  # number of frames the ring buffer holds
+        return len(self.totals)
+
+    def start_frame(self):  # start timing a new frame
+        row = self.frames % self.capacity
+        self.times[row] = 0.0  # clear the row we are about to overwrite
+        self.frame_start = self.last_mark = time.perf_counter()
+
+    def mark(self, phase):  # the named phase just finished: add the time since the last mark to it
+        now = time.perf_counter()
+        self.times[self.frames % self.capacity, self.columns[phase]] += now - self.last_mark
+        self.last_mark = now
+
+    def end_frame(self, level=None):  # finish the current frame, recording its total time
+        row = self.frames % self.capacity
+        self.totals[row] = time.perf_counter() - self.frame_start
+        if self.csv_writer is not None:
+            self.csv_writer.writerow([self.frames, level, round(self.totals[row] * 1000, 4)]
+                                     + [round(value * 1000, 4) for value in self.times[row]])
+        self.frames += 1
+
+    def recent(self):  # the rows of the frames in the ring buffer, oldest first
+        count = min(self.frames, self.capacity)
+        order = (numpy.arange(self.frames - count, self.frames)) % self.capacity
+        return self.totals[order], self.times[order]
+
+    def averages(self):  # the average milliseconds spent in every phase over the frames in the ring buffer
+        totals, times = self.recent()
+        if len(totals) == 0:
+            return {name: 0.0 for name in self.phases}
+        means = times.mean(axis=0) * 1000
+        return {name: float(means[column]) for name, column in self.columns.items()}
+
+    def top(self, count=3):  # the phases that take the longest on average, as (name, milliseconds), slowest first
+        return sorted(self.averages().items(), key=lambda item: item[1], reverse=True)[:count]
+
+    def toggle(self):  # show or hide the overlay
+        self.visible = not self.visible
+
+    def overlay_image(self, refresh=10):  # the overlay surface, rebuilt at most every `refresh` frames
+        if self.overlay is None or self.frames - self.overlay_frame >= refresh:
+            self.overlay = self.build_overlay()
+            self.overlay_frame = self.frames
+        return self.overlay
+
+    def build_overlay(self):  # draw the frame-time graph and the slowest phases onto a new surface
+        if self.font is None:
+            self.font = pygame.font.Font(None, 20)  # pygame's default font, so the overlay works on any system
+        width, height = graph_size
+        line_height = self.font.get_linesize()
+        surface = pygame.Surface((width, height + line_height * 5), pygame.SRCALPHA)
+        surface.fill((0, 0, 0, 170))  # translucent black background
+
+        # the graph: one vertical bar per frame, newest on the right, red for frames slower than 60 FPS
+        totals, _ = self.recent()
+        totals = totals[-width:] * 1000
+        for x, frame_ms in enumerate(totals, width - len(totals)):
+            bar = min(height, int(frame_ms / graph_max_ms * height))
+            colour = (230, 60, 60) if frame_ms > target_ms else (80, 220, 80)
+            pygame.draw.line(surface, colour, (x, height - 1), (x, height - 1 - bar))
+        target_y = height - 1 - int(target_ms / graph_max_ms * height)
+        pygame.draw.line(surface, (255, 255, 255), (0, target_y), (width - 1, target_y))  # the 60 FPS line
+
+        # the text: the average and worst frame times, and the slowest phases
+        average = float(totals.mean()) if len(totals) else 0.0
+        worst = float(totals.max()) if len(totals) else 0.0
+        lines = [f'frame {average:.2f}ms avg, {worst:.2f}ms worst']
+        lines += [f'{name:<8} {ms:.3f}ms' for name, ms in self.top(4)]
+        for number, line in enumerate(lines):
+            surface.blit(self.font.render(line, True, (255, 255, 255)), (4, height + 2 + number * line_height))
+        return surface
+
+    def record_to(self, filename):  # write the timings of every frame from now on to a CSV file
+        os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+        self.csv_file = open(filename, 'w', newline='')
+        self.csv_writer = csv.writer(self.csv_file)
+        self.csv_writer.writerow(['frame', 'level', 'total_ms'] + [name + '_ms' for name in self.phases])
+
+    def close(self):  # stop recording to the CSV file
+        if self.csv_file is not None:
+            self.csv_file.close()
+            self.csv_file = self.csv_writer = None
+
+
+class LevelProfiles():
+    def __init__(self, directory):  # constructor function with the folder the stats are written to
+        self.directory = directory  # where levelN.prof files are written
+        self.profiles = {}  # one cProfile.Profile per level, added to every time the level is played
+        self.level = None  # the level being profiled right now (None when nothing is)
+
+    def track(self, level):  # profile the given level from now on (None to stop profiling, e.g. in the menu)
+        if level == self.level:
+            return
+        if self.level is not None:
+            self.profiles[self.level].disable()
+        if level is not None:
+            self.profiles.setdefault(level, cProfile.Profile()).enable()
+        self.level = level
+
+    def save(self):  # stop profiling and write the stats of every level that was played
+        self.track(None)
+        os.makedirs(self.directory, exist_ok=True)
+        filenames = []
+        for level, profile in sorted(self.profiles.items()):
+            filename = os.path.join(self.directory, f'level{level}.prof')
+            profile.dump_stats(filename)
+            filenames.append(filename)
+        return filenames
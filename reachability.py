@@ -0,0 +1,410 @@
+'''
+Level Reachability
+------------------
+Whether a level can be finished depends on how far the player can jump and fall, which until now could only be found
+out by playing it. This module works it out from the level file instead, by building a movement graph:
+
+    nodes   --> the places the player can stand: (column, row) where the player's feet are on the top of row `row`
+                (on a solid tile, or on a platform somewhere along its path)
+    arcs    --> the moves from one node to another:
+                    walk  --> to the next node along the same floor
+                    fall  --> walking off an edge, holding the arrow key for a while, and landing on another node
+                    jump  --> jumping (standing still, or holding an arrow key for a while) and landing on another node
+                    ride  --> standing on a moving platform while it carries the player along its path
+
+Jumps and falls are found by stepping the same physics as Player.update() in main.py frame by frame (a 45x70 player,
+jumping sets vel_y to -15, gravity adds 1 a frame up to 10, and the arrow keys move 5 pixels a frame) against the
+level's solid tiles, releasing the arrow key after every 10 frames (one tile) and at the end. Every arc remembers the
+coins and exit gates the player touches on the way, and arcs that touch lava or water are dropped (unless they reach
+the exit first).
+
+A level's exit and coins are reachable if they can be touched from a node that can be reached from where the player
+starts (the player falls from (100, level height - 130) at the start of a level).
+
+This is an approximation, not a proof:
+    - slimes are ignored (they can usually be jumped over or waited out)
+    - moving platforms are surfaces the player can land on (from above) anywhere along their path, but they never
+      block the player, and the player is assumed to be able to ride them to either end
+    - the player starts every move from the left edge of a tile, or hanging as far over the edge as possible when
+      walking off or jumping off the end of a floor, and lands on the tile under the middle of the player
+    - the arrow key is only ever held in one direction during a jump or fall
+
+Graphs are cached per level file (in .reachability/, keyed by a hash of the level's cells), so checking levels that
+haven't changed only reads the cache.
+
+Usage:
+    python reachability.py [level numbers or .lvl files ...] [--no-cache]
+The exit status is 1 if the exit of any level checked can't be reached.
+'''
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+
+from levels import level_filename, load_level
+
+model_version = 1  # change this whenever the movement model changes, so old cached graphs are not used
+cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.reachability')
+
+# the physics of Player.update() in main.py
+tile_size = 50
+player_width = 45
+player_height = 70
+jump_speed = -15  # vel_y when jumping
+gravity = 1  # added to vel_y every frame
+terminal_speed = 10  # the most vel_y can be
+walk_speed = 5  # pixels moved a frame while an arrow key is held
+release_every = 10  # frames between the points where a held arrow key can be released (one tile at walk_speed)
+max_frames = 240  # the longest jump or fall that is followed (4 seconds)
+
+# tile numbers
+solid_tiles = {1, 2, 9, 10, 14, 15, 16, 17}  # dirt, grass, tundra, cake and choco cake (and their blank versions)
+hazard_tiles = {6, 13}  # lava and water (the bottom half of the tile)
+coin_tile = 7
+exit_tile = 8
+horizontal_platforms = {4, 11, 21}  # platforms moving left and right
+vertical_platforms = {5, 12, 22}  # platforms moving up and down
+
+
+class LevelGrid():
+    def __init__(self, data):  # constructor function with a level (a LevelData, or a list of lists of tile numbers)
+        self.height = len(data)
+        self.width = len(data[0]) if self.height else 0
+        self.solid = bytearray(self.width * self.height)  # 1 for every solid cell, row by row
+        self.items = {}  # (column, row) --> the (kind, rect) of every coin, exit and hazard overlapping that cell
+        self.coins = []  # the cell of every coin
+        self.exits = []  # the cell of every exit gate
+        self.platforms = []  # the path of every moving platform: a list of the (column, row) cells its top can be in
+        self.empty_below = [0] * self.width  # the row below which nothing is in each column (the player just falls)
+        self.hits = {}  # (first column, last column, first row, last row) --> whether any of those cells is solid
+        self.nearby = {}  # (first column, last column, first row, last row) --> the items in those cells
+        for row, cells in enumerate(data):
+            for column, tile in enumerate(cells):
+                x, y = column * tile_size, row * tile_size
+                if tile in solid_tiles:
+                    self.solid[row * self.width + column] = 1
+                elif tile in hazard_tiles:
+                    self.add_item(column, row, 'hazard', (x, y + tile_size // 2, tile_size, tile_size // 2))
+                elif tile == coin_tile:
+                    size = tile_size // 2  # the coin is centred in its tile (see Coin in main.py)
+                    self.add_item(column, row, column_row(column, row),
+                                  (x + tile_size // 2 - size // 2, y + tile_size // 2 - size // 2, size, size))
+                    self.coins.append((column, row))
+                elif tile == exit_tile:
+                    rect = (x, y - tile_size // 2, tile_size, tile_size + tile_size // 2)  # one and a half tiles tall
+                    self.add_item(column, row, 'exit', rect)
+                    self.add_item(column, row - 1, 'exit', rect)
+                    self.exits.append((column, row))
+                elif tile in horizontal_platforms:
+                    self.platforms.append([(column - 1, row), (column, row), (column + 1, row)])
+                elif tile in vertical_platforms:
+                    self.platforms.append([(column, row - 1), (column, row), (column, row + 1)])
+                if tile:
+                    for cell in range(max(0, column - 1), min(self.width, column + 2)):  # (platforms move sideways)
+                        self.empty_below[cell] = row + 2  # (vertical platforms move down a row)
+
+    def add_item(self, column, row, kind, rect):
+        self.items.setdefault((column, row), []).append((kind, rect))
+
+    def is_solid(self, column, row):  # cells outside the level are empty
+        return 0 <= column < self.width and 0 <= row < self.height and self.solid[row * self.width + column] == 1
+
+    def box_hits(self, x, y):  # whether the player's rectangle at (x, y) overlaps a solid tile
+        cells = (x // tile_size, (x + player_width - 1) // tile_size, y // tile_size,
+                 (y + player_height - 1) // tile_size)  # the columns and rows the rectangle covers
+        hits = self.hits.get(cells)
+        if hits is None:  # the same few cell ranges come up again and again, so remember the answer for each
+            hits = self.hits[cells] = any(self.is_solid(column, row) for row in range(cells[2], cells[3] + 1)
+                                          for column in range(cells[0], cells[1] + 1))
+        return hits
+
+    def falls_out(self, x, y):  # whether there is nothing under the player's rectangle at (x, y) but the bottom
+        row = y // tile_size
+        columns = range(max(0, x // tile_size), min(self.width, (x + player_width - 1) // tile_size + 1))
+        return all(self.empty_below[column] <= row for column in columns)
+
+    def touching(self, x, y):  # the coins, exits and hazards the player's rectangle at (x, y) overlaps
+        cells = (x // tile_size, (x + player_width - 1) // tile_size, y // tile_size,
+                 (y + player_height - 1) // tile_size)
+        items = self.nearby.get(cells)
+        if items is None:  # the items in the cells the rectangle covers
+            items = self.nearby[cells] = [item for row in range(cells[2], cells[3] + 1)
+                                          for column in range(cells[0], cells[1] + 1)
+                                          for item in self.items.get((column, row), ())]
+        return [kind for kind, (left, top, width, height) in items
+                if x < left + width and left < x + player_width and y < top + height and top < y + player_height]
+
+
+def column_row(column, row):  # the name of a coin in a graph (JSON keys have to be strings)
+    return f'{column},{row}'
+
+
+class Simulation():
+    '''
+    The player in the air: steps the vertical movement and the x and y collisions of Player.update() one frame at a
+    time. step() returns the node the player lands on, once they are standing again (on a tile or a platform).
+    '''
+    def __init__(self, grid, x, y, vel_y, surfaces):
+        self.grid = grid
+        self.surfaces = surfaces  # the set of nodes the player can stand on
+        self.x, self.y, self.vel_y = x, y, vel_y
+        self.frames = 0
+        self.landed = False  # whether the player is standing again
+        self.touched = set()  # the coins and exits touched so far
+        self.died = False
+
+    def step(self, direction):  # one frame with the arrow key in direction held (0 for no key); returns a node or None
+        grid = self.grid
+        x, y = self.x, self.y
+        vel_y = self.vel_y = min(self.vel_y + gravity, terminal_speed)
+        dx, dy = direction * walk_speed, vel_y
+        if dx and grid.box_hits(x + dx, y):  # x collision: don't move sideways
+            dx = 0
+        if grid.box_hits(x, y + dy):  # y collision: stop at the tile
+            if vel_y < 0:  # hit a ceiling
+                dy = ((y + dy) // tile_size + 1) * tile_size - y
+            else:  # landed on a tile
+                dy = ((y + dy + player_height) // tile_size) * tile_size - player_height - y
+            vel_y = self.vel_y = 0
+        x = self.x = x + dx
+        y = self.y = y + dy
+        self.frames += 1
+
+        if grid.items:
+            for kind in grid.touching(x, y):
+                if kind == 'hazard':
+                    self.died = True
+                else:
+                    self.touched.add(kind)
+            if self.died:
+                return None
+        if vel_y == 0 and grid.box_hits(x, y + 1):  # standing on a tile
+            self.landed = True
+            return self.node()
+        if dy > 0:  # falling: land on any platform surface the feet passed
+            feet = y + player_height
+            row = feet // tile_size
+            if feet - dy <= row * tile_size:
+                for column in (x // tile_size, (x + player_width - 1) // tile_size):
+                    if (column, row) in self.surfaces and not grid.is_solid(column, row):
+                        self.landed = True
+                        return (column, row)
+        return None
+
+    def node(self):  # the node the player is standing on (the tile under the middle of the player, if there is one)
+        row = (self.y + player_height) // tile_size
+        middle = (self.x + player_width // 2) // tile_size
+        for column in (middle, self.x // tile_size, (self.x + player_width - 1) // tile_size):
+            if (column, row) in self.surfaces:
+                return (column, row)
+        return None
+
+    def finished(self):  # stop following a jump or fall that has died, left the level or gone on for too long
+        return self.died or self.frames >= max_frames or self.y > self.grid.height * tile_size
+
+
+def follow(simulation, direction, release, memo):
+    '''
+    Follow a jump or fall, holding the arrow key in direction, and releasing it after every `release` frames (a
+    separate branch for every release point). Returns a list of (node, touched) for every way it can end.
+    Once the key is released, where the player ends up only depends on their position and vel_y, and the same ones
+    come up from lots of different jumps, so the endings of those are remembered in memo.
+    '''
+    if direction == 0:
+        key = (simulation.x, simulation.y, simulation.vel_y)
+        endings = memo.get(key)
+        if endings is None:
+            fresh = Simulation(simulation.grid, simulation.x, simulation.y, simulation.vel_y, simulation.surfaces)
+            endings = memo[key] = follow_held(fresh, 0, release, memo)
+        return [(node, simulation.touched | touched) for node, touched in endings]
+    return follow_held(simulation, direction, release, memo)
+
+
+def follow_held(simulation, direction, release, memo):  # follow() without looking in memo first
+    endings = []
+    held = 0
+    while not simulation.finished():
+        falling = direction == 0 and simulation.vel_y == terminal_speed
+        if falling and simulation.grid.falls_out(simulation.x, simulation.y):
+            break  # falling straight down past everything in the level
+        if direction and held and held % release == 0:  # also try letting go of the key here
+            endings.extend(follow(simulation, 0, release, memo))
+        node = simulation.step(direction)
+        held += 1
+        if 'exit' in simulation.touched:  # the level is finished as soon as the exit is touched
+            endings.append(('exit', simulation.touched))
+            break
+        if simulation.landed:  # (on a tile the player doesn't fit on, if node is None)
+            if node is not None:
+                endings.append((node, simulation.touched))
+            break
+    return endings
+
+
+def standable(grid, column, row):  # whether the player fits standing with their feet on top of row
+    if not 0 <= column < grid.width:
+        return False
+    top = row * tile_size - player_height
+    return not grid.box_hits(column * tile_size, top)
+
+
+def build_graph(data):
+    '''
+    Build the movement graph of a level (see the top of the file). Returns a dictionary that can be saved as JSON:
+        start   --> the node the player lands on at the start of the level (None if they never land)
+        nodes   --> every node, as [column, row]
+        arcs    --> [from node number, to node number (or -1 for the exit), kind, [coins touched]]
+        touches --> the coins touched while standing on each node, by node number
+        coins   --> every coin, as 'column,row'
+        exits   --> the number of exit gates
+    '''
+    grid = data if isinstance(data, LevelGrid) else LevelGrid(data)
+    surfaces = set()
+    for row in range(grid.height):  # the tops of solid tiles with room to stand above them
+        for column in range(grid.width):
+            if grid.is_solid(column, row) and not grid.is_solid(column, row - 1) and standable(grid, column, row):
+                surfaces.add((column, row))
+    for path in grid.platforms:  # every cell along a platform's path
+        for column, row in path:
+            if standable(grid, column, row) and not grid.is_solid(column, row):
+                surfaces.add((column, row))
+
+    nodes = sorted(surfaces, key=lambda node: (node[1], node[0]))
+    numbers = {node: number for number, node in enumerate(nodes)}
+    arcs = []
+    seen = set()
+    memo = {}  # the endings of jumps and falls after the arrow key is released (see follow())
+
+    def add_arc(source, target, kind, touched):
+        coins = sorted(name for name in touched if name != 'exit')
+        target_number = -1 if target == 'exit' else numbers[target]
+        key = (numbers[source], target_number, tuple(coins))
+        if key not in seen and (target_number != numbers[source] or coins):
+            seen.add(key)
+            arcs.append([numbers[source], target_number, kind, coins])
+
+    for path in grid.platforms:  # riding a platform from one end of its path to the other
+        on_path = [cell for cell in path if cell in surfaces]
+        for source in on_path:
+            for target in on_path:
+                if source != target:
+                    add_arc(source, target, 'ride', ())
+
+    for column, row in nodes:
+        node = (column, row)
+        feet = row * tile_size - player_height
+        for direction in (-1, 1):
+            neighbour = (column + direction, row)
+            if neighbour in surfaces:
+                add_arc(node, neighbour, 'walk', ())
+                continue
+            # the end of a floor: hang as far over the edge as the player can (without going into a wall)
+            x = column * tile_size + (tile_size - 1 if direction == 1 else -(player_width - 1))
+            if grid.box_hits(x, feet):
+                x = column * tile_size + (tile_size - player_width if direction == 1 else 0)
+            for target, touched in follow(Simulation(grid, x, feet, 0, surfaces), direction, release_every, memo):
+                add_arc(node, target, 'fall', touched)
+            jump = Simulation(grid, x, feet, jump_speed, surfaces)
+            for target, touched in follow(jump, direction, release_every, memo):
+                add_arc(node, target, 'jump', touched)
+        for direction in (-1, 0, 1):  # jumping from the middle of the tile
+            simulation = Simulation(grid, column * tile_size, feet, jump_speed, surfaces)
+            for target, touched in follow(simulation, direction, release_every, memo):
+                add_arc(node, target, 'jump', touched)
+
+    # the player's first fall, from where Game puts them at the start of a level
+    start = None
+    start_touches = []
+    landing = follow(Simulation(grid, 100, grid.height * tile_size - 130, 0, surfaces), 0, release_every, memo)
+    if landing and landing[0][0] != 'exit':
+        start = numbers[landing[0][0]]
+        start_touches = sorted(name for name in landing[0][1] if name != 'exit')
+
+    touches = [sorted(name for name in grid.touching(column * tile_size, row * tile_size - player_height)
+                      if name not in ('hazard', 'exit'))
+               for column, row in nodes]
+    if start is not None:
+        touches[start] = sorted(set(touches[start]) | set(start_touches))
+    return {'version': model_version, 'start': start, 'nodes': [list(node) for node in nodes], 'arcs': arcs,
+            'touches': touches, 'coins': [column_row(*coin) for coin in grid.coins], 'exits': len(grid.exits)}
+
+
+def analyse(graph):
+    '''
+    Walk the graph from the start node. Returns a dictionary with whether the exit can be reached, the coins that can
+    and can't be reached, and how many nodes can be reached.
+    '''
+    outgoing = {}
+    for source, target, kind, coins in graph['arcs']:
+        outgoing.setdefault(source, []).append((target, coins))
+    reached = set()
+    coins = set()
+    exit_reached = False
+    stack = [] if graph['start'] is None else [graph['start']]
+    while stack:
+        node = stack.pop()
+        if node in reached:
+            continue
+        reached.add(node)
+        coins.update(graph['touches'][node])
+        for target, arc_coins in outgoing.get(node, ()):
+            coins.update(arc_coins)
+            if target == -1:
+                exit_reached = True
+            elif target not in reached:
+                stack.append(target)
+    return {'exit': exit_reached, 'coins': sorted(coins), 'unreachable_coins': sorted(set(graph['coins']) - coins),
+            'nodes': len(reached), 'total_nodes': len(graph['nodes']), 'arcs': len(graph['arcs'])}
+
+
+def level_graph(filename, use_cache=True):  # the graph of a level file, from the cache if the level hasn't changed
+    data = load_level(filename)
+    key = hashlib.blake2b(bytes(data.cells), digest_size=16)
+    key.update(f'{data.width}x{data.height}/{model_version}'.encode())
+    cache_file = os.path.join(cache_dir, f'{os.path.splitext(os.path.basename(filename))[0]}-{key.hexdigest()}.json')
+    if use_cache and os.path.exists(cache_file):
+        with open(cache_file) as graph_file:
+            return json.load(graph_file), True
+    graph = build_graph(data)
+    if use_cache:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(cache_file, 'w') as graph_file:
+            json.dump(graph, graph_file)
+    return graph, False
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description='Check that the exit and coins of every level can be reached.')
+    parser.add_argument('levels', nargs='*', help='level numbers or .lvl files (default: every levelN.lvl)')
+    parser.add_argument('--no-cache', action='store_true', help="rebuild every graph and don't save them")
+    args = parser.parse_args()
+
+    filenames = []
+    for level in args.levels or [str(number) for number in range(1, 11)]:
+        filenames.append(level_filename(level) if level.isdigit() else level)
+
+    start = time.perf_counter()
+    failed = 0
+    print(f'{"level":<12} {"exit":>5} {"coins":>7} {"nodes":>9} {"arcs":>6}  {"graph":<7}')
+    for filename in filenames:
+        if not os.path.exists(filename):
+            print(f'{filename:<12} missing')
+            failed += 1
+            continue
+        graph, cached = level_graph(filename, not args.no_cache)
+        result = analyse(graph)
+        failed += not result['exit']
+        print(f'{filename:<12} {"yes" if result["exit"] else "NO":>5} '
+              f'{len(result["coins"]):>3}/{len(graph["coins"]):<3} {result["nodes"]:>4}/{result["total_nodes"]:<4} '
+              f'{result["arcs"]:>6}  {"cached" if cached else "built":<7}')
+        if result['unreachable_coins']:
+            print(f'    unreachable coins (column,row): {" ".join(result["unreachable_coins"])}')
+    print(f'checked {len(filenames)} level(s) in {time.perf_counter() - start:.3f}s')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main_cli())
@@ -0,0 +1,129 @@
+'''
+Input Recordings
+----------------
+A recording is everything needed to play a session of the game again exactly: the level and score it started with,
+the random seed, the keys that were held down on every simulation step, and the restarts (clicking the restart
+button). The game is deterministic (it runs in fixed steps, see FixedTimestep in main.py), so feeding the same keys
+into a fresh Game gives the same session, step for step. The final state (the player's position, the score,
+game_over and the level) is saved too, so a replay can check that it ended up in the same place.
+
+The keys of a step are stored as bits (left, right and space), and a run of steps with the same keys is stored as one
+record, so a long session only takes a few kilobytes.
+
+File format (all numbers little-endian):
+    header (see header below): magic b'PREC', format version, start level, start score, random seed,
+        start player x and y, number of steps, final player x and y, final score, final game_over, final level,
+        number of records
+    records, 3 bytes each:
+        uint16 steps, uint8 keys  --> hold these keys (bits: 1 left, 2 right, 4 space) for this many steps
+        0, uint8 event            --> something happened between two steps (1: the level was restarted,
+                                      2: the whole game was restarted from level 1)
+
+Record a session with:    python main.py --record session.rec
+Replay it with:           python replay.py session.rec
+'''
+
+import random
+import struct
+
+import pygame
+
+magic = b'PREC'  # the first 4 bytes of every recording
+version = 1  # the version of the format written by Recording.save()
+header = struct.Struct('<4sHHIIiiIiiIbHI')
+record = struct.Struct('<HB')  # steps (or 0 for an event), keys (or the event)
+max_steps = 65535  # the most steps one record can hold
+
+# the bit of every key in a step's keys
+key_bits = {pygame.K_LEFT: 1, pygame.K_RIGHT: 2, pygame.K_SPACE: 4}
+
+# events (stored in a record with 0 steps)
+restart_level = 1  # the level was restarted (the restart button after dying)
+restart_game = 2  # the game was restarted from level 1 (the restart button after winning)
+
+
+def key_mask(key):  # the bits of the keys being pressed in a key state (pygame.key.get_pressed() or a KeyState)
+    mask = 0
+    for code, bit in key_bits.items():
+        if key[code]:
+            mask |= bit
+    return mask
+
+
+def mask_keys(mask):  # the pygame key codes of the bits in a mask
+    return [code for code, bit in key_bits.items() if mask & bit]
+
+
+class Recording():
+    def __init__(self, level=1, score=0, seed=0, start=(0, 0)):  # constructor function with the starting state
+        self.level = level  # the level the session started on
+        self.score = score  # the score the session started with
+        self.seed = seed  # the seed of the random module (the game doesn't use random numbers yet, but may)
+        self.start = start  # the player's starting position
+        self.records = []  # [steps, keys] runs, and [0, event] events, in order
+        self.steps = 0  # the number of simulation steps recorded
+        self.final = None  # the final state: {'player': (x, y), 'score': ..., 'game_over': ..., 'level': ...}
+
+    def add_step(self, mask):  # one simulation step with the keys in mask held down
+        last = self.records[-1] if self.records else None
+        if last is not None and last[0] != 0 and last[1] == mask and last[0] < max_steps:
+            last[0] += 1  # the same keys as the step before: make the run one step longer
+        else:
+            self.records.append([1, mask])
+        self.steps += 1
+
+    def add_event(self, event):  # something that happened between two steps (restart_level or restart_game)
+        self.records.append([0, event])
+
+    def save(self, filename):  # write the recording to a file
+        final = self.final or {'player': (0, 0), 'score': 0, 'game_over': 0, 'level': self.level}
+        data = header.pack(magic, version, self.level, self.score, self.seed, self.start[0], self.start[1],
+                           self.steps, final['player'][0], final['player'][1], final['score'], final['game_over'],
+                           final['level'], len(self.records))
+        data += b''.join(record.pack(steps, value) for steps, value in self.records)
+        with open(filename, 'wb') as recording_file:
+            recording_file.write(data)
+
+    @classmethod
+    def load(cls, filename):  # read a recording from a file
+        with open(filename, 'rb') as recording_file:
+            data = recording_file.read()
+        if len(data) < header.size:
+            raise ValueError(f'{filename}: too short to be a recording')
+        (file_magic, file_version, level, score, seed, start_x, start_y, steps, final_x, final_y, final_score,
+         final_game_over, final_level, count) = header.unpack_from(data)
+        if file_magic != magic:
+            raise ValueError(f'{filename}: not a recording')
+        if file_version != version:
+            raise ValueError(f'{filename}: unsupported recording version {file_version}')
+        if len(data) < header.size + count * record.size:
+            raise ValueError(f'{filename}: truncated')
+        recording = cls(level, score, seed, (start_x, start_y))
+        recording.records = [list(record.unpack_from(data, header.size + index * record.size))
+                             for index in range(count)]
+        recording.steps = steps
+        recording.final = {'player': (final_x, final_y), 'score': final_score, 'game_over': final_game_over,
+                           'level': final_level}
+        return recording
+
+
+class Recorder():
+    def __init__(self, game, seed=0):  # start recording a game from its current state
+        random.seed(seed)  # seed the random module, so a replay can use the same random numbers
+        self.game = game  # the game being recorded
+        self.recording = Recording(game.level, game.score, seed, game.player.rect.topleft)
+
+    def step(self, key):  # call before every Game.update() with the keys it is given
+        self.recording.add_step(key_mask(key))
+
+    def event(self, event):  # call when the level or the game is restarted
+        self.recording.add_event(event)
+
+    def save(self, filename):  # save the recording, with the game's current state as the final state
+        self.recording.final = final_state(self.game)
+        self.recording.save(filename)
+
+
+def final_state(game):  # the parts of a game's state a replay checks
+    return {'player': tuple(game.player.rect.topleft), 'score': game.score, 'game_over': game.game_over,
+            'level': game.level}
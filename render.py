@@ -0,0 +1,280 @@
+'''
+Rendering Helpers
+-----------------
+The backgrounds and the tiles of a level never change while the level is being played, but the game loop used to draw
+them again every single frame: two full-screen background blits followed by one blit per tile in world.tile_list.
+
+StaticLayer bakes all of that into one cached surface the first time a level is drawn, so every frame after that only
+has to blit a single surface no matter how many tiles the level has. The baked surface is only rebuilt when the
+level (the World object) or its background images change.
+
+RenderQueue collects everything else that is drawn during a frame (sprites, the player, text and buttons) instead of
+blitting each image as it comes, and then draws the whole frame with one call to pygame's batched Surface.fblits (or
+Surface.blits on versions of pygame without it). Every draw is put in a named layer, and the layers are always drawn
+in the same order, so the order things are queued in doesn't change what ends up on top.
+
+Dirty Rectangles
+----------------
+submit() redraws the whole frame, and the game loop then calls pygame.display.update(), which copies the whole screen
+to the window even when only a slime, a platform and the player moved. submit_dirty() draws the same frame but only
+touches the parts of the screen that changed since the last frame:
+    - the draws of the background layers (the baked static scene, and the tile chunks of a scrolling level) have to be
+      exactly the same as last frame (the same surfaces at the same places), otherwise the whole frame is redrawn
+    - every other draw is compared with last frame's: a draw that moved, changed image, appeared or disappeared makes
+      both the rectangle it covered last frame and the one it covers now dirty
+    - in every (merged) dirty rectangle the background is drawn again and then everything on top of it, clipped to the
+      rectangle, so the screen ends up exactly the same as with a full redraw
+It returns the dirty rectangles to pass to pygame.display.update(rects), or None when the whole screen has to be
+updated: on the first frame, when the background changed (a new level, or the camera scrolled), after invalidate(),
+or when the dirty rectangles cover more than full_update_fraction of the screen (updating lots of small rectangles is
+slower than updating the whole screen at once).
+
+Render Scale
+------------
+Every frame is drawn at the size of the window (1000x1000), which is a lot of pixels to fill and to send to the
+window every frame for weak integrated graphics and small virtual machines. With a render scale (python main.py
+--render-scale 0.5) the display surface is made smaller, render_scale times the size of the window, with pygame's
+SCALED display mode: the game draws on the smaller surface, and SDL scales it up to the window on the graphics card
+when the frame is shown, so nothing is scaled up on the CPU. submit_scaled() draws the frame that was queued in window
+coordinates onto the smaller surface, and RenderScale.window_position() turns mouse positions (which SDL reports on
+the smaller surface) back into window coordinates for the buttons. Only the drawing is scaled: positions, collisions
+and the camera are the same at every scale.
+
+Every image drawn is scaled down once, the first time it is drawn, and kept in the RenderScale's cache (the asset
+cache's images never change, and the baked static scene and the tile chunks are new surfaces whenever they are
+rebuilt, so a cached image is never out of date). Positions are rounded down and sizes up, so images that touch (the
+tile chunks) never leave a gap between them. SDL makes the window the biggest whole multiple of the smaller size that
+fits on the desktop, so the scales are fractions that divide the window exactly (render_scales): on a desktop big
+enough for it, the window is still 1000x1000. The HUD (the score, the buttons and any text) is drawn at the smaller
+size too, so it looks as pixelated as the rest of the frame.
+'''
+
+import math
+from collections import OrderedDict
+
+import pygame
+
+
+class StaticLayer():
+    def __init__(self, width, height):  # constructor function with the size of the screen the layer covers
+        self.width = width  # width of the baked surface
+        self.height = height  # height of the baked surface
+        self.surface = None  # the baked surface (built on the first draw)
+        self.key = None  # what the baked surface was built from, so we can tell when it is out of date
+        self.rebuilds = 0  # number of times the surface had to be baked
+
+    def build(self, backgrounds, world):  # bake the background images and the world's tiles into one surface
+        # the baked layer is fully opaque, so convert() it to the screen format without an alpha channel (fast blits)
+        self.surface = pygame.Surface((self.width, self.height)).convert()
+        for background in backgrounds:  # draw the background images in order, back to front
+            self.surface.blit(background, (0, 0))
+        if world is not None:  # draw every tile of the level on top of the backgrounds
+            self.surface.blits(world.tile_list, doreturn=False)
+        self.key = (tuple(backgrounds), world)  # remember what this surface shows
+        self.rebuilds += 1  # count the rebuild
+
+    def prepare(self, backgrounds, world=None):  # return the baked static scene, re-baking it only if it changed
+        if self.surface is None or self.key != (tuple(backgrounds), world):  # if the level or background changed
+            self.build(backgrounds, world)  # bake the new static scene
+        return self.surface
+
+    def draw(self, screen, backgrounds, world=None):  # draw the static scene, re-baking it only if it changed
+        screen.blit(self.prepare(backgrounds, world), (0, 0))  # one blit draws the whole static scene
+
+    def invalidate(self):  # force the layer to be baked again on the next draw
+        self.surface = None
+        self.key = None
+
+
+# the layers of a frame, from the back to the front
+layers = ['static', 'tiles', 'score', 'enemies', 'platforms', 'lava', 'water', 'coins', 'exits', 'ice_platforms', 'message',
+          'player', 'overlay', 'ui', 'profiler']
+
+
+render_scales = [1.0, 0.5, 0.25]  # the render scales that can be used (see Render Scale)
+
+
+# the layers that are the background of a frame (the dirty rectangles are restored from them)
+background_layers = ['static', 'tiles']
+full_update_fraction = 0.5  # update the whole screen when more than this much of it changed
+most_dirty_rects = 32  # update the whole screen when more rectangles than this changed
+
+
+def blit_all(surface, draws):  # draw (image, position) pairs with one batched call
+    blit_many = getattr(surface, 'fblits', None)  # fblits is the fastest, where pygame has it
+    if blit_many is not None:
+        blit_many(draws)
+    else:
+        surface.blits(draws, doreturn=False)
+
+
+def merge_rects(rects):  # merge rectangles that overlap into their union, until none of them overlap
+    merged = []
+    for rect in rects:
+        rect = rect.copy()
+        index = rect.collidelist(merged)
+        while index != -1:  # grow the rectangle over every merged one it touches
+            rect.union_ip(merged.pop(index))
+            index = rect.collidelist(merged)
+        merged.append(rect)
+    return merged
+
+
+class RenderScale():
+    def __init__(self, scale, size, capacity=512):  # constructor function with the scale, window size and capacity
+        self.scale = scale  # the size of the frame the game is drawn at, as a fraction of the window's size
+        self.window_size = size  # the size of the window
+        self.size = (math.ceil(size[0] * scale), math.ceil(size[1] * scale))  # the size of the smaller frame
+        self.capacity = capacity  # how many scaled images to keep
+        self.images = OrderedDict()  # id(image) --> (image, scaled image), least recently used first
+        self.hits = 0  # number of images that were already scaled
+        self.misses = 0  # number of images that had to be scaled
+
+    def image(self, image):  # the image scaled down (cached)
+        cached = self.images.get(id(image))
+        # (the cache holds on to the image, so its id can't be reused by another surface while it is cached)
+        if cached is not None and cached[0] is image:
+            self.hits += 1
+            self.images.move_to_end(id(image))  # the image was just used
+            return cached[1]
+        self.misses += 1
+        size = (max(1, math.ceil(image.get_width() * self.scale)), max(1, math.ceil(image.get_height() * self.scale)))
+        if image.get_bitsize() in (24, 32):
+            scaled = pygame.transform.smoothscale(image, size)
+        else:  # (smoothscale only works on 24 and 32 bit images)
+            scaled = pygame.transform.scale(image, size)
+        self.images[id(image)] = (image, scaled)
+        if len(self.images) > self.capacity:  # forget the image that hasn't been drawn for the longest
+            self.images.popitem(last=False)
+        return scaled
+
+    def position(self, position):  # a position (a point or a rect) in the window, on the smaller frame
+        return (int(position[0] * self.scale), int(position[1] * self.scale))
+
+    def window_position(self, position):  # a position on the smaller frame (e.g. the mouse's), in the window
+        return (int(position[0] / self.scale), int(position[1] / self.scale))
+
+    def draws(self, draws):  # (image, position) draws in the window, as draws on the smaller frame
+        return [(self.image(image), self.position(position)) for image, position in draws]
+
+    def display_mode(self):  # open the display at the smaller size, scaled up to the window by SDL (see the top)
+        return pygame.display.set_mode(self.size, pygame.SCALED)
+
+    def clear(self):  # forget every scaled image
+        self.images.clear()
+
+    def stats(self):  # summary of how well the cache is doing
+        return {'entries': len(self.images), 'hits': self.hits, 'misses': self.misses}
+
+
+class RenderQueue():
+    def __init__(self, layer_names=layers):  # constructor function with the layer names, back to front
+        self.layers = {name: [] for name in layer_names}  # the (image, position) draws queued in every layer
+        self.draw_calls = 0  # number of batched blit calls used to draw the last frame
+        self.blits = 0  # number of images drawn in the last frame
+        self.previous_background = None  # the background draws of the last frame drawn by submit_dirty()
+        self.previous_draws = {}  # (image id, rectangle) --> (image, rectangle) of last frame's other draws
+        self.dirty_area = 0  # pixels redrawn by the last submit_dirty() (the whole screen for a full update)
+        self.full_updates = 0  # frames submit_dirty() had to redraw and update completely
+        self.dirty_updates = 0  # frames submit_dirty() only updated the dirty rectangles of
+
+    def add(self, layer, image, position):  # queue one image to be drawn at a position (a point or a rect)
+        self.layers[layer].append((image, position))
+
+    def extend(self, layer, draws):  # queue a sequence of (image, position) draws
+        self.layers[layer].extend(draws)
+
+    def add_group(self, layer, group):  # queue every sprite in a sprite group, where it is
+        self.layers[layer].extend([(sprite.image, sprite.rect) for sprite in group])
+
+    def submit(self, surface):  # draw everything that was queued, back to front, in one batched call, and clear it
+        draws = []
+        for queued in self.layers.values():
+            draws.extend(queued)
+            queued.clear()
+        self.blits = len(draws)
+        self.draw_calls = 0
+        if draws:
+            blit_all(surface, draws)
+            self.draw_calls = 1
+        self.previous_background = None  # (the next submit_dirty() can't know what this frame changed)
+
+    def submit_scaled(self, surface, render_scale):
+        '''
+        Draw everything that was queued like submit(), but scaled down by render_scale onto its smaller surface (the
+        display opened with RenderScale.display_mode(), see the top of the file), and clear it.
+        '''
+        draws = []
+        for queued in self.layers.values():
+            draws.extend(queued)
+            queued.clear()
+        self.blits = len(draws)
+        self.draw_calls = 0
+        if draws:
+            blit_all(surface, render_scale.draws(draws))
+            self.draw_calls = 1
+        self.previous_background = None  # (the next submit_dirty() can't know what this frame changed)
+
+    def submit_dirty(self, surface):
+        '''
+        Draw what was queued, but only redraw the parts of the surface that changed since the last call (see the top
+        of the file), and clear it. Returns the list of rectangles that changed (empty if nothing did), or None if the
+        whole surface was redrawn and has to be updated.
+        '''
+        background = []
+        for name in background_layers:
+            background.extend(self.layers[name])
+        draws = {}  # (image id, rectangle) --> (image, rectangle) of every other draw
+        order = []  # the other draws, back to front
+        for name, queued in self.layers.items():
+            if name not in background_layers:
+                for image, position in queued:
+                    rect = pygame.Rect(position[0], position[1], image.get_width(), image.get_height())
+                    draws[(id(image), tuple(rect))] = (image, rect)
+                    order.append((image, rect))
+        screen_rect = surface.get_rect()
+
+        full = self.previous_background is None or len(background) != len(self.previous_background) or any(
+            image is not last_image or tuple(position) != tuple(last_position)
+            for (image, position), (last_image, last_position) in zip(background, self.previous_background))
+        dirty = []
+        if not full:
+            for key, (image, rect) in draws.items():  # what appeared or moved...
+                if key not in self.previous_draws:
+                    dirty.append(rect)
+            for key, (image, rect) in self.previous_draws.items():  # ...and what disappeared or moved away
+                if key not in draws:
+                    dirty.append(rect)
+            dirty = [rect.clip(screen_rect) for rect in merge_rects(dirty)]
+            dirty = [rect for rect in dirty if rect.width and rect.height]
+            area = sum(rect.width * rect.height for rect in dirty)
+            full = len(dirty) > most_dirty_rects or area > screen_rect.width * screen_rect.height * full_update_fraction
+
+        self.previous_background = background
+        self.previous_draws = draws
+        if full:  # redraw everything, like submit() does
+            self.submit(surface)
+            self.previous_background = background  # (submit() forgets it)
+            self.dirty_area = screen_rect.width * screen_rect.height
+            self.full_updates += 1
+            return None
+
+        self.blits = 0
+        self.draw_calls = 0
+        for rect in dirty:  # redraw every dirty rectangle from the background up, clipped to it
+            surface.set_clip(rect)
+            redraw = [(image, position) for image, position in background
+                      if rect.colliderect((position[0], position[1], image.get_width(), image.get_height()))]
+            redraw.extend([(image, drawn) for image, drawn in order if rect.colliderect(drawn)])
+            blit_all(surface, redraw)
+            self.blits += len(redraw)
+            self.draw_calls += 1
+        surface.set_clip(None)
+        for queued in self.layers.values():
+            queued.clear()
+        self.dirty_area = sum(rect.width * rect.height for rect in dirty)
+        self.dirty_updates += 1
+        return dirty
+
+    def invalidate(self):  # make the next submit_dirty() redraw and update the whole surface
+        self.previous_background = None
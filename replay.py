@@ -0,0 +1,87 @@
+'''
+Replay
+------
+Plays a recording (see recording.py) back through a fresh Game as fast as possible, without a window, and checks that
+it ends in the same state as the recorded session: the same player position, score, game_over and level. That lets us
+replay a bug report without anyone having to play it again, and use real play sessions as benchmarks and regression
+tests: a replay that no longer matches means a change altered how the game plays.
+
+Usage:
+    python replay.py session.rec [more.rec ...] [--render] [--repeat N]
+The exit status is 1 if any replay didn't match its recording.
+'''
+
+import argparse
+import random
+import sys
+import time
+
+import headless  # selects the dummy video and audio drivers before the game is imported
+import pygame
+import main
+from recording import Recording, final_state, mask_keys, restart_level, restart_game
+
+
+def replay(recording, draw=False):
+    '''
+    Re-simulate a recording from its starting state, drawing every step off-screen if draw is True.
+    Returns a dictionary with the final state, whether it matches the recording, and how fast the replay ran.
+    '''
+    random.seed(recording.seed)  # the same random numbers as the recorded session
+    game = main.Game(recording.level)
+    game.score = recording.score
+    keys = {}  # the KeyState of every key mask, made once
+
+    start = time.perf_counter()
+    for steps, value in recording.records:
+        if steps == 0:  # an event between two steps
+            if value == restart_level:
+                game.restart()
+            elif value == restart_game:
+                game.restart_game()
+            continue
+        key = keys.get(value)
+        if key is None:
+            key = keys[value] = headless.KeyState(mask_keys(value))
+        for _ in range(steps):
+            game.update(key)
+            if draw:
+                headless.render(game)
+    seconds = time.perf_counter() - start
+
+    final = final_state(game)
+    return {
+        'steps': recording.steps,
+        'seconds': seconds,
+        'fps': recording.steps / seconds if seconds > 0 else 0.0,
+        'final': final,
+        'expected': recording.final,
+        'match': final == recording.final,
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description='Replay recorded sessions as fast as possible and check them.')
+    parser.add_argument('recordings', nargs='+', help='recording files (made with python main.py --record FILE)')
+    parser.add_argument('--render', action='store_true', help='also draw every step to an off-screen surface')
+    parser.add_argument('--repeat', type=int, default=1, help='replay every recording this many times')
+    args = parser.parse_args()
+
+    mismatches = 0
+    for filename in args.recordings:
+        recording = Recording.load(filename)
+        for _ in range(args.repeat):
+            result = replay(recording, args.render)
+            status = 'ok' if result['match'] else 'MISMATCH'
+            print(f'{filename}: {status}, {result["steps"]} steps in {result["seconds"]:.3f}s '
+                  f'({result["fps"]:.0f} steps per second)')
+            if not result['match']:
+                mismatches += 1
+                print(f'    expected {result["expected"]}')
+                print(f'    got      {result["final"]}')
+    pygame.quit()
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main_cli())
@@ -0,0 +1,118 @@
+'''
+Asset Cache
+-----------
+Every sprite in the game used to call loadify() for itself, which meant the same PNG file was read from the disk and
+decoded again for every slime, coin, platform and tile in a level (and again every time a level was restarted).
+
+The AssetCache keeps one copy of every surface the game asks for, keyed by (path, size, flip):
+    path --> the image file on disk, e.g. 'images/coin.png'
+    size --> the (width, height) the image is scaled to, or None for the original size
+    flip --> True if the image is mirrored across the y-axis (used for facing-left sprites)
+
+Scaled and flipped surfaces are built from the cached original, so an image is only ever read and decoded once per
+run no matter how many variants of it are used. The surfaces are shared between sprites, so they must never be
+drawn on directly - every sprite in this game only ever blits them, which is safe.
+
+The surfaces can also be put in the cache ahead of time with preload(), e.g. from an asset pack (see assetpack.py), in
+which case the images are never read from the disk at all. Every key asked for through get() is remembered in
+`requested`, which is how the asset pack builder knows which variants the game uses.
+
+The cache can be used from more than one thread at a time (levels are built in the background while the game is being
+played, and the AssetLoader below loads images on a pool of threads at startup), so the dictionary is only touched
+while holding a lock. New variants are built without holding it, so several images can be decoded at once; if two
+threads build the same variant at the same time, they both end up with the one that was stored first.
+
+AssetLoader
+-----------
+Runs loading jobs (loading images, fonts or sounds, or building a level) on a pool of threads, so they can happen while
+the game is already showing something (the main menu), and lets the game wait for just the ones it needs.
+'''
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pygame
+
+
+class AssetCache():
+    def __init__(self):  # constructor function, the cache starts out empty
+        self.surfaces = {}  # dictionary that maps (path, size, flip) keys to loaded surfaces
+        self.hits = 0  # number of requests that were answered from the cache
+        self.misses = 0  # number of requests that had to load, scale or flip a surface
+        self.requested = set()  # every key asked for through get() (not the variants only built to make others)
+        self.lock = threading.RLock()  # only one thread at a time may build and store new variants
+
+    def get(self, path, size=None, flip=False):  # return the surface for path, scaled to size and optionally flipped
+        if size is not None:
+            size = (int(size[0]), int(size[1]))  # store sizes as a tuple of ints so equal sizes share one key
+        key = (path, size, flip)  # the key that identifies this exact variant of the image
+
+        with self.lock:
+            self.requested.add(key)
+        return self.variant(key)  # (without holding the lock, so other threads can load other images meanwhile)
+
+    def variant(self, key):  # return the surface of a key, building (and caching) it if it isn't cached yet
+        path, size, flip = key
+        with self.lock:
+            surface = self.surfaces.get(key)  # look up the variant in the cache
+            if surface is not None:  # if it has been built before
+                self.hits += 1  # count the hit
+                return surface  # hand out the shared surface
+            self.misses += 1  # otherwise count the miss and build it
+
+        # build the variant without holding the lock, so other threads can load other images at the same time
+        if flip:  # flipped variants are built from the (scaled) un-flipped variant
+            surface = pygame.transform.flip(self.variant((path, size, False)), True, False)
+        elif size is not None:  # scaled variants are built from the original image
+            surface = pygame.transform.scale(self.variant((path, None, False)), size)
+        else:  # the original image is the only variant that is read from the disk
+            surface = pygame.image.load(path).convert_alpha()
+
+        with self.lock:  # store the new variant so the next request is a hit
+            return self.surfaces.setdefault(key, surface)  # (if another thread just built it too, share theirs)
+
+    def preload(self, surfaces):  # put ready-made surfaces in the cache: a dictionary of (path, size, flip) --> surface
+        with self.lock:
+            self.surfaces.update(surfaces)
+
+    def bytes_held(self):  # total size of the pixel data held by the cache
+        with self.lock:
+            return sum(surface.get_pitch() * surface.get_height() for surface in self.surfaces.values())
+
+    def stats(self):  # summary of how well the cache is doing
+        return {'entries': len(self.surfaces), 'hits': self.hits, 'misses': self.misses, 'bytes': self.bytes_held()}
+
+    def clear(self):  # drop every cached surface and reset the counters
+        with self.lock:
+            self.surfaces.clear()
+            self.requested.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+class AssetLoader():
+    def __init__(self, workers=4):  # constructor function with the number of loading threads
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='asset-loader')
+        self.pending = {}  # the jobs by name (futures)
+        self.finished = {}  # the time.perf_counter() every job finished at, by name
+
+    def load(self, name, function, *args):  # start a loading job: function(*args), in the background
+        future = self.pending[name] = self.executor.submit(function, *args)
+        future.add_done_callback(lambda _: self.finished.setdefault(name, time.perf_counter()))
+
+    def get(self, name):  # the result of a job (waits for it if it hasn't finished yet)
+        return self.pending[name].result()
+
+    def missing(self):  # the names of the jobs that haven't finished yet
+        return [name for name, future in self.pending.items() if not future.done()]
+
+    def wait(self):  # wait for every job, and return their results by name (raises the error of a job that failed)
+        return {name: future.result() for name, future in self.pending.items()}
+
+    def shutdown(self):  # stop the loading threads (after every job has finished)
+        self.executor.shutdown(wait=True)
+
+
+# the process-wide cache that every part of the game loads its images through
+asset_cache = AssetCache()
@@ -0,0 +1,186 @@
+'''
+Game Snapshots
+--------------
+A snapshot is the whole state of a game at one moment, packed into a few hundred bytes: the level, the score and
+game_over, everything about the player (position, velocity, jumping, direction and walk animation), and the state of
+every slime, platform and ice platform (their positions and patrol counters, straight from the PatrolStore's arrays)
+and of every coin (collected or not). Loading a snapshot puts the game back exactly where it was, so playing on from
+it with the same keys gives the same game, step for step. A snapshot also holds a checksum of the level's cells, so
+one taken before the level file was edited (python main.py --hot-reload) can't be loaded into the edited level.
+
+Snapshots are used for the save and load buttons (quick save to quicksave.snap, see the main game loop), and for
+rewinding: the RewindBuffer keeps a snapshot of every step. To fit lots of them in a fixed amount of memory it only
+keeps the newest snapshot in full, and for every older step the difference (XOR) between it and the step after it,
+compressed. From one step to the next only a few bytes change (the player and the moving entities move a pixel or
+so), so a difference is mostly zeros and compresses to a few dozen bytes. Rewinding one step XORs the newest snapshot
+with the newest difference, however long the buffer is. When the buffer is full the oldest steps are forgotten.
+
+File format (all numbers little-endian):
+    header (see header below): magic b'PSNP', format version, level, score, game_over, player x and y, the player's
+        previous x and y, vertical velocity, jumped, in_air, direction, walk counter, walk index, which image the
+        player is showing (0 walking right, 1 walking left, 2 dead) and its index, number of entities, number of coins,
+        CRC-32 of the level's cells
+    entities    --> the store's x, y, previous_x, previous_y, direction and counter arrays (int32, one after another)
+    coins       --> one bit per coin (in the order they were created), set if the coin hasn't been collected
+'''
+
+import struct
+import zlib
+from collections import deque
+
+import numpy
+
+magic = b'PSNP'  # the first 4 bytes of every snapshot
+version = 2  # the version of the format written by take_snapshot()
+header = struct.Struct('<4sBHIbiiiiiBBbiBBBIII')
+entity_fields = ['x', 'y', 'previous_x', 'previous_y', 'direction', 'counter']  # the store fields that change
+quicksave_filename = 'quicksave.snap'  # where the save button saves to
+
+# which of the player's images it is showing
+walking_right = 0
+walking_left = 1
+dead = 2
+
+
+def player_image(player):  # which image the player is showing, as (walking_right/walking_left/dead, index)
+    if player.image is player.dead_image:
+        return dead, 0
+    for images, code in [(player.images_right, walking_right), (player.images_left, walking_left)]:
+        for index, image in enumerate(images):
+            if player.image is image:
+                return code, index
+    return walking_right, 0
+
+
+def take_snapshot(game):  # pack the state of a game into bytes
+    player = game.player
+    world = game.world
+    store = world.patrols
+    count = store.count
+    image, image_index = player_image(player)
+    parts = [header.pack(magic, version, game.level, game.score, game.game_over, player.rect.x, player.rect.y,
+                         player.previous_position[0], player.previous_position[1], player.vel_y, player.jumped,
+                         player.in_air, player.direction, player.counter, player.index, image, image_index, count,
+                         len(world.coins_left), world.level_hash)]
+    for field in entity_fields:
+        parts.append(getattr(store, field)[:count].astype('<i4', copy=False).tobytes())
+    parts.append(numpy.packbits(world.coins_left).tobytes())
+    return b''.join(parts)
+
+
+class Snapshot():
+    def __init__(self, data):  # unpack the bytes of a snapshot (from take_snapshot() or a quick save)
+        if len(data) < header.size:
+            raise ValueError('too short to be a snapshot')
+        (file_magic, file_version, self.level, self.score, self.game_over, x, y, previous_x, previous_y, self.vel_y,
+         jumped, in_air, self.direction, self.counter, self.index, self.image, self.image_index, count,
+         coins, self.level_hash) = header.unpack_from(data)
+        if file_magic != magic:
+            raise ValueError('not a snapshot')
+        if file_version != version:
+            raise ValueError(f'unsupported snapshot version {file_version}')
+        if len(data) != header.size + len(entity_fields) * count * 4 + (coins + 7) // 8:
+            raise ValueError('truncated snapshot')
+        self.position = (x, y)
+        self.previous_position = (previous_x, previous_y)
+        self.jumped = bool(jumped)
+        self.in_air = bool(in_air)
+        offset = header.size
+        self.entities = {}  # field --> array of every entity's value
+        for field in entity_fields:
+            self.entities[field] = numpy.frombuffer(data, dtype='<i4', count=count, offset=offset)
+            offset += count * 4
+        self.coins_left = numpy.unpackbits(numpy.frombuffer(data, dtype=numpy.uint8, offset=offset),
+                                           count=coins).astype(bool)
+
+
+def check_snapshot(world, snapshot):  # raise a ValueError if a Snapshot can't be restored into a world
+    if snapshot.level_hash != world.level_hash:
+        raise ValueError('the snapshot is of a different level (or the level file has changed since)')
+    if len(snapshot.entities['x']) != world.patrols.count or len(snapshot.coins_left) != len(world.coins_left):
+        raise ValueError('the snapshot is of a different level')
+
+
+def restore_snapshot(game, snapshot):
+    '''
+    Put a game back into the state of a Snapshot. The game's world must already be a world of the snapshot's level
+    (Game.load_snapshot() builds it if it isn't, and checks it with check_snapshot() before switching to it): the
+    entities and coins are put back into it.
+    '''
+    world = game.world
+    store = world.patrols
+    count = len(snapshot.entities['x'])
+    check_snapshot(world, snapshot)
+
+    game.level = snapshot.level
+    game.score = snapshot.score
+    game.game_over = snapshot.game_over
+
+    player = game.player
+    player.rect.topleft = snapshot.position
+    player.previous_position = snapshot.previous_position
+    player.vel_y = snapshot.vel_y
+    player.jumped = snapshot.jumped
+    player.in_air = snapshot.in_air
+    player.direction = snapshot.direction
+    player.counter = snapshot.counter
+    player.index = snapshot.index
+    if snapshot.image == dead:
+        player.image = player.dead_image
+    else:
+        images = player.images_right if snapshot.image == walking_right else player.images_left
+        player.image = images[snapshot.image_index]
+
+    for field in entity_fields:
+        getattr(store, field)[:count] = snapshot.entities[field]
+    store.touch()  # the positions changed in the arrays: the sprites' rects are out of date
+    world.bodies.invalidate()
+
+    for coin, left in zip(world.coins, snapshot.coins_left):  # put back the coins collected after the snapshot
+        if left and not coin.alive():
+            coin.add(world.coin_group)
+        elif not left and coin.alive():
+            coin.kill()
+    world.coins_left[:] = snapshot.coins_left
+
+
+def xor(first, second):  # the XOR of two byte strings of the same length
+    return numpy.bitwise_xor(numpy.frombuffer(first, dtype=numpy.uint8),
+                             numpy.frombuffer(second, dtype=numpy.uint8)).tobytes()
+
+
+class RewindBuffer():
+    def __init__(self, max_bytes=2 * 1024 * 1024):  # constructor function with the most memory the steps may use
+        self.max_bytes = max_bytes  # the most bytes the older steps may take up
+        self.current = None  # the newest snapshot, in full
+        self.steps = deque()  # (full, compressed data) to get from every step to the one before it, oldest first
+        self.size = 0  # bytes used by the older steps
+
+    def push(self, snapshot):  # add the snapshot of the newest step
+        if self.current is not None:
+            if len(snapshot) == len(self.current):  # store the difference from the step before
+                step = (False, zlib.compress(xor(snapshot, self.current), 1))
+            else:  # (a new level has a different number of entities: store the step before in full)
+                step = (True, zlib.compress(self.current, 1))
+            self.steps.append(step)
+            self.size += len(step[1])
+            while self.size > self.max_bytes:  # forget the oldest steps
+                self.size -= len(self.steps.popleft()[1])
+        self.current = snapshot
+
+    def pop(self):  # go back one step, and return its snapshot (None if there are no older steps left)
+        if not self.steps:
+            return None
+        full, data = self.steps.pop()
+        self.size -= len(data)
+        data = zlib.decompress(data)
+        self.current = data if full else xor(self.current, data)
+        return self.current
+
+    def clear(self):  # forget every step
+        self.current = None
+        self.steps.clear()
+        self.size = 0
+
+    def __len__(self):  # the number of steps that can be rewound
+        return len(self.steps)
@@ -0,0 +1,166 @@
+'''
+Chunked Tile Map
+----------------
+World used to turn every tile of a level into an (image, rect) pair up front and bake all of them into the static
+layer. That is fine for a 20x20 level, but a long level (say 2000x40 tiles) has tens of thousands of tiles, and baking
+all of them would take a surface of 100000x2000 pixels.
+
+TileMap splits the level into square chunks of chunk_tiles x chunk_tiles tiles. A chunk's tiles are only created (and
+added to the collision grid) the first time something looks at that part of the level: the player colliding with it,
+or the camera showing it. When a chunk is drawn its tiles are baked into one surface for the chunk, so drawing the
+level costs a handful of chunk blits no matter how big the level is. Chunks that end up far away from the camera are
+dropped again (see retain), and simply rebuilt if the player comes back. When a level file is edited while the game is
+running (--hot-reload), only the chunks with changed cells are dropped, and rebuilt from the new data the same way.
+
+TileMap is a TileGrid, so the player's collision code uses it exactly like before.
+
+SpriteIndex does the same job for sprites that don't move (lava, water, coins and exits): it keeps them in buckets by
+chunk, so finding the ones on the screen (to draw them) or around the player (to collide with them) only looks at the
+nearby buckets.
+'''
+
+import pygame
+
+from collision import TileGrid
+
+chunk_tiles = 8  # width and height of a chunk, in tiles
+chunk_key = (255, 0, 255)  # colour of the empty parts of a baked chunk (the tile images are opaque and never use it)
+
+
+class TileChunk():
+    def __init__(self, column, row, x, y, size, tiles):  # constructor function with the chunk's place and its tiles
+        self.column = column  # the chunk's column and row in the level's grid of chunks
+        self.row = row
+        self.x = x  # level coordinates of the chunk's top left corner
+        self.y = y
+        self.size = size  # width and height of the chunk in pixels
+        self.tiles = tiles  # the chunk's (image, rect) tiles, row by row
+        self.surface = None  # the chunk's tiles baked into one surface (made the first time the chunk is drawn)
+
+    def image(self):  # the baked surface of the chunk
+        if self.surface is None:
+            surface = pygame.Surface((self.size, self.size)).convert()
+            surface.fill(chunk_key)
+            surface.blits([(image, rect.move(-self.x, -self.y)) for image, rect in self.tiles], doreturn=False)
+            surface.set_colorkey(chunk_key, pygame.RLEACCEL)  # the empty parts are see-through (and skipped quickly)
+            self.surface = surface
+        return self.surface
+
+
+class TileMap(TileGrid):
+    def __init__(self, data, tile_images, cell_size, chunk_size=chunk_tiles):
+        '''
+        data is the level (rows of tile numbers), tile_images maps the tile numbers that are solid tiles to their
+        images, and cell_size is the size of one tile in pixels. Nothing is built until it is needed.
+        '''
+        TileGrid.__init__(self, cell_size)
+        self.data = data  # the level's tile numbers
+        self.tile_images = tile_images  # the image of every solid tile number
+        self.height = len(data)  # number of rows of tiles
+        self.width = len(data[0]) if self.height else 0  # number of columns of tiles
+        self.pixel_width = self.width * cell_size  # size of the whole level in pixels
+        self.pixel_height = self.height * cell_size
+        self.chunk_tiles = chunk_size  # width and height of a chunk, in tiles
+        self.chunk_size = chunk_size * cell_size  # width and height of a chunk, in pixels
+        self.chunk_columns = -(-self.width // chunk_size)  # number of chunks across and down the level
+        self.chunk_rows = -(-self.height // chunk_size)
+        self.chunks = {}  # the chunks that are built, by (chunk column, chunk row)
+        self.builds = 0  # number of times a chunk had to be built
+        self.retained = None  # the chunk range kept by the last call to retain()
+
+    def chunk_range(self, rect, margin=0):  # the chunk columns and rows a rectangle (plus margin chunks) overlaps
+        left, top, width, height = rect
+        size = self.chunk_size
+        columns = range(max(0, left // size - margin), min(self.chunk_columns, (left + width - 1) // size + 1 + margin))
+        rows = range(max(0, top // size - margin), min(self.chunk_rows, (top + height - 1) // size + 1 + margin))
+        return columns, rows
+
+    def build(self, column, row):  # create the tiles of one chunk and add them to the collision grid
+        tiles = []
+        first_column = column * self.chunk_tiles
+        last_column = min(self.width, first_column + self.chunk_tiles)
+        for tile_row in range(row * self.chunk_tiles, min(self.height, (row + 1) * self.chunk_tiles)):
+            cells = self.data[tile_row]
+            for tile_column in range(first_column, last_column):
+                image = self.tile_images.get(cells[tile_column])
+                if image is not None:
+                    rect = image.get_rect(topleft=(tile_column * self.cell_size, tile_row * self.cell_size))
+                    tiles.append((image, rect))
+                    self.add(rect)
+        chunk = TileChunk(column, row, column * self.chunk_size, row * self.chunk_size, self.chunk_size, tiles)
+        self.chunks[(column, row)] = chunk
+        self.builds += 1
+        return chunk
+
+    def load_area(self, rect, margin=0):  # make sure every chunk a rectangle overlaps is built, and return them
+        columns, rows = self.chunk_range(rect, margin)
+        chunks = []
+        for row in rows:
+            for column in columns:
+                chunk = self.chunks.get((column, row))
+                if chunk is None:
+                    chunk = self.build(column, row)
+                chunks.append(chunk)
+        return chunks
+
+    def unload(self, column, row):  # drop a chunk, its baked surface and its tiles in the collision grid
+        chunk = self.chunks.pop((column, row))
+        for image, rect in chunk.tiles:
+            self.remove(rect.x // self.cell_size, rect.y // self.cell_size)
+
+    def retain(self, view, margin=1):  # drop the chunks more than margin chunks away from the view
+        kept = self.chunk_range(view, margin)
+        if kept == self.retained:  # the camera hasn't moved into another chunk since last time
+            return
+        self.retained = kept
+        columns, rows = kept
+        for column, row in list(self.chunks):
+            if column not in columns or row not in rows:
+                self.unload(column, row)
+
+    def reload(self, data, cells):  # the level's data changed in the given (row, column) cells: forget their chunks
+        self.data = data
+        for row, column in cells:
+            key = (column // self.chunk_tiles, row // self.chunk_tiles)
+            if key in self.chunks:  # (rebuilt from the new data, with new tiles and a new surface, when next needed)
+                self.unload(*key)
+        self.retained = None
+
+    def visible_chunks(self, view):  # the chunks that can be seen in the view (built if needed)
+        return self.load_area(view)
+
+    def row_tiles(self, row, left, width):  # like TileGrid.row_tiles, building the chunks under the span first
+        self.load_area((left, row * self.cell_size, width, self.cell_size))
+        return TileGrid.row_tiles(self, row, left, width)
+
+    def all_tiles(self):  # every tile of the level as (image, rect), row by row (this builds every chunk)
+        tiles = []
+        for chunk in self.load_area((0, 0, self.pixel_width, self.pixel_height)):
+            tiles.extend(chunk.tiles)
+        tiles.sort(key=lambda tile: (tile[1].y, tile[1].x))
+        return tiles
+
+
+class SpriteIndex():
+    def __init__(self, cell_size):  # constructor function with the size of a bucket in pixels
+        self.cell_size = cell_size  # width and height of a bucket
+        self.cells = {}  # the (order added, sprite) pairs in every bucket, by (column, row)
+        self.count = 0  # number of sprites added (used to give back sprites in the order they were added)
+
+    def add(self, sprite):  # put a sprite in the bucket its top left corner is in
+        key = (sprite.rect.x // self.cell_size, sprite.rect.y // self.cell_size)
+        self.cells.setdefault(key, []).append((self.count, sprite))
+        self.count += 1
+
+    def query(self, rect):  # the live sprites whose rects overlap rect, in the order they were added
+        rect = pygame.Rect(rect)
+        size = self.cell_size
+        found = []
+        # a sprite can stick out of its bucket by up to one bucket, so also look one bucket up and to the left
+        for row in range(rect.top // size - 1, (rect.bottom - 1) // size + 1):
+            for column in range(rect.left // size - 1, (rect.right - 1) // size + 1):
+                for order, sprite in self.cells.get((column, row), ()):
+                    if sprite.alive() and sprite.rect.colliderect(rect):
+                        found.append((order, sprite))
+        found.sort(key=lambda entry: entry[0])
+        return [sprite for order, sprite in found]